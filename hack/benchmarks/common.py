@@ -0,0 +1,68 @@
+"""Helpers shared by the benchmark scripts.
+
+The benchmarks rely on the unit tests assets so they can run without any
+network access. They are meant to be run from the repository root, e.g.:
+
+    $ python hack/benchmarks/job_list_parse.py
+"""
+
+import copy
+import json
+import pathlib
+import re
+import time
+from typing import Any, Callable
+
+ASSETS_DIR = pathlib.Path(__file__).parents[2] / "tests" / "prowjobsscraper"
+
+# Roughly the share of assisted jobs in prow.ci.openshift.org job list
+ASSISTED_RATIO = 0.05
+
+
+def load_asset(path: str) -> bytes:
+    return (ASSETS_DIR / path).read_bytes()
+
+
+def generate_job_list(count: int) -> dict[str, Any]:
+    """Generate a job list based on the prowjob unit tests asset where only
+    ASSISTED_RATIO of the jobs are assisted ones."""
+    template = json.loads(load_asset("prowjob_assets/valid_prow_response.json"))[
+        "items"
+    ][0]
+    assisted_every = int(1 / ASSISTED_RATIO)
+    items = []
+    for i in range(count):
+        item = copy.deepcopy(template)
+        build_id = str(1549300279667593216 + i)
+        item["status"]["build_id"] = build_id
+        item["status"]["url"] = item["status"]["url"].replace(
+            "1549300279667593216", build_id
+        )
+        if i % assisted_every:
+            item["spec"]["job"] = f"pull-ci-openshift-origin-master-e2e-aws-{i}"
+        items.append(item)
+
+    return {"items": items}
+
+
+def generate_junit(copies: int) -> bytes:
+    """Generate a junit file repeating the testcases of the step unit tests
+    asset, the failure of step3 embeds a long log as the real junit files do."""
+    junit = load_asset("step_assets/junit_operator.xml")
+    testcases = re.search(rb"<testcase .*</testcase>", junit, re.DOTALL)
+    assert testcases is not None
+    return (
+        b"<testsuites><testsuite>"
+        + testcases.group(0) * copies
+        + b"</testsuite></testsuites>"
+    )
+
+
+def timeit(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """Return the best wall time of fn over repeat runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
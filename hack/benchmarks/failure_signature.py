@@ -0,0 +1,62 @@
+"""Measure the failure signatures computed per second out of the failure
+details of the step unit tests asset, and compare the signature pipeline with
+a single pass of all its patterns combined and with the normalization of the
+whole failure details."""
+
+import argparse
+import json
+import re
+
+from common import load_asset, timeit
+
+from prowjobsscraper import step
+
+
+def combined_signature(details: str) -> str:
+    """All the patterns but the whitespaces one in a single alternation."""
+    substitutions = step._FAILURE_SIGNATURE_SUBSTITUTIONS
+    pattern = _COMBINED_PATTERN
+    signature = pattern.sub(
+        lambda m: substitutions[int(m.lastgroup[1:])][1],  # type: ignore
+        details[: 4 * step._FAILURE_SIGNATURE_LENGTH],
+    )
+    signature = substitutions[-1][0].sub(" ", signature)
+    return signature.strip()[: step._FAILURE_SIGNATURE_LENGTH]
+
+
+_COMBINED_PATTERN = re.compile(
+    "|".join(
+        f"(?P<g{i}>{p.pattern})"
+        for i, (p, _) in enumerate(step._FAILURE_SIGNATURE_SUBSTITUTIONS[:-1])
+    ),
+    re.I,
+)
+
+
+def whole_details_signature(details: str) -> str:
+    for pattern, replacement in step._FAILURE_SIGNATURE_SUBSTITUTIONS:
+        details = pattern.sub(replacement, details)
+    return details.strip()[: step._FAILURE_SIGNATURE_LENGTH]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--failures", type=int, default=2_000)
+    parser.add_argument("--repeat-details", type=int, default=10)
+    args = parser.parse_args()
+
+    details = json.loads(load_asset("event_assets/jobstep.json"))["details"]
+    details *= args.repeat_details
+    print(f"{args.failures} failures of {len(details) / 1024:.1f} KiB")
+
+    for name, signature in (
+        ("pipeline", step.get_failure_signature),
+        ("combined", combined_signature),
+        ("whole", whole_details_signature),
+    ):
+        elapsed = timeit(lambda: [signature(details) for _ in range(args.failures)])
+        print(f"{name:<10} {args.failures / elapsed:10.0f} signatures/s")
+
+
+if __name__ == "__main__":
+    main()
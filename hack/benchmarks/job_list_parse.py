@@ -0,0 +1,51 @@
+"""Compare the parse time of the prow job list with and without the raw-dict
+prefilter applied before ProwJob validation."""
+
+import argparse
+import json
+
+from common import generate_job_list, timeit
+
+from prowjobsscraper.prowjob import ProwJobs
+from prowjobsscraper.scraper import Scraper
+
+# only the job filters of the scraper are used
+scraper = Scraper(None, None, None, None)  # type: ignore
+
+
+def parse_then_filter(data: bytes) -> ProwJobs:
+    jobs = ProwJobs.create_from_string(data)
+    jobs.items = [j for j in jobs.items if scraper._is_assisted_job(j)]
+    return jobs
+
+
+def prefilter_then_parse(data: bytes) -> ProwJobs:
+    return ProwJobs.create_from_string(data, item_filter=scraper.is_assisted_job_item)
+
+
+def stream_then_parse(data: bytes) -> ProwJobs:
+    chunks = (data[i : i + 64 * 1024] for i in range(0, len(data), 64 * 1024))
+    return ProwJobs.create_from_chunks(chunks, item_filter=scraper.is_assisted_job_item)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=10_000)
+    args = parser.parse_args()
+
+    data = json.dumps(generate_job_list(args.jobs)).encode()
+    print(f"{args.jobs} jobs, {len(data) / 1024 / 1024:.1f} MiB")
+
+    for name, fn in (
+        ("parse then filter", parse_then_filter),
+        ("prefilter then parse", prefilter_then_parse),
+        ("stream then parse", stream_then_parse),
+    ):
+        kept = len(fn(data).items)
+        elapsed = timeit(lambda: fn(data))
+        per_10k = elapsed * 10_000 / args.jobs
+        print(f"{name:<22} {per_10k * 1000:8.1f} ms per 10k jobs ({kept} kept)")
+
+
+if __name__ == "__main__":
+    main()
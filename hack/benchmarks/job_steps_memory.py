@@ -0,0 +1,81 @@
+"""Compare the memory and time needed to hold the steps of a job list as
+pydantic models (the former JobStep representation, embedding a copy of the
+job) and as the slotted JobStep records referencing their job."""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import timedelta
+from typing import Any, Callable, Optional
+
+from common import generate_job_list
+from pydantic import BaseModel
+
+from prowjobsscraper.prowjob import ProwJob, ProwJobs
+from prowjobsscraper.step import JobStep
+
+
+class PydanticJobStep(BaseModel):
+    job: ProwJob
+    name: str
+    state: str
+    duration: timedelta
+    details: Optional[str] = None
+
+
+def create_steps(jobs: list[ProwJob], steps_per_job: int, factory: Callable) -> list:
+    return [
+        factory(
+            job=job,
+            name=f"step{i}",
+            state="success",
+            duration=timedelta(seconds=i),
+            details=None,
+        )
+        for job in jobs
+        for i in range(steps_per_job)
+    ]
+
+
+def measure(fn: Callable[[], Any]) -> tuple[float, int]:
+    """Return the wall time of fn and the memory still allocated by its
+    result, in bytes."""
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=50_000)
+    parser.add_argument("--steps", type=int, default=20, help="steps per job")
+    args = parser.parse_args()
+
+    data = json.dumps(generate_job_list(args.jobs)).encode()
+    jobs = ProwJobs.create_from_string(data).items
+    print(f"{args.jobs} jobs, {args.steps} steps per job")
+
+    for name, factory in (
+        ("pydantic steps", PydanticJobStep),
+        ("slotted steps", JobStep),
+    ):
+        elapsed, size = measure(lambda: create_steps(jobs, args.steps, factory))
+        print(
+            f"{name:<16} {elapsed:6.2f} s, "
+            f"{size / 1024 / 1024:7.1f} MiB ({size / args.jobs:6.0f} B per job)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare the time and peak memory needed to parse a junit file into steps
+with the junitparser DOM (the former parser) and with the streaming parser."""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import timedelta
+from typing import Any, Callable
+
+from common import generate_junit, load_asset
+from junitparser import Failure, JUnitXml  # type: ignore
+
+from prowjobsscraper.prowjob import ProwJobs
+from prowjobsscraper.step import JobStep, iter_junit_steps
+
+
+def parse_with_junitparser(job: Any, junit: bytes) -> list[JobStep]:
+    steps = []
+    for suite in JUnitXml.fromstring(junit):
+        for case in suite:
+            failure = next((r for r in case.result if isinstance(r, Failure)), None)
+            steps.append(
+                JobStep(
+                    job=job,
+                    name=case.name,
+                    state="success" if failure is None else "failure",
+                    duration=timedelta(seconds=case.time or 0),
+                    details=None if failure is None else failure.text,
+                )
+            )
+    return steps
+
+
+def measure(fn: Callable[[], Any]) -> tuple[float, int]:
+    """Return the wall time of fn and its peak memory, in bytes."""
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=2_000)
+    args = parser.parse_args()
+
+    job = ProwJobs.create_from_string(load_asset("step_assets/prowjobs.json")).items[0]
+    junit = generate_junit(args.copies)
+    print(f"{args.copies * 3} testcases, {len(junit) / 2**20:.1f} MiB")
+
+    for name, parse in (
+        ("junitparser", lambda: parse_with_junitparser(job, junit)),
+        ("streaming", lambda: list(iter_junit_steps(job, junit))),
+    ):
+        elapsed, peak = measure(parse)
+        print(f"{name:<12} {elapsed * 1000:8.1f} ms, peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure the steps per second the step extractor parses out of junit files
+already downloaded, with the junit files parsed by the fetch threads and by
+process pools of increasing size."""
+
+import argparse
+import os
+import time
+
+from common import generate_junit, load_asset
+
+from prowjobsscraper import fetch
+from prowjobsscraper.prowjob import ProwJob, ProwJobs
+from prowjobsscraper.step import StepExtractor
+
+
+class _InMemoryBlob:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def download_as_string(self, end=None) -> bytes:
+        return self._data
+
+
+class InMemoryStorageClient:
+    """Storage client serving the same junit file for every job"""
+
+    def __init__(self, junit: bytes):
+        self._blob = _InMemoryBlob(junit)
+
+    def bucket(self, name: str) -> "InMemoryStorageClient":
+        return self
+
+    def blob(self, path: str) -> _InMemoryBlob:
+        return self._blob
+
+
+def generate_jobs(count: int) -> ProwJobs:
+    job = ProwJobs.create_from_string(load_asset("step_assets/prowjobs.json")).items[0]
+    return ProwJobs(items=[ProwJob.parse_obj(job.dict()) for _ in range(count)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    client = InMemoryStorageClient(generate_junit(args.copies))
+    jobs = generate_jobs(args.jobs)
+    print(f"{args.jobs} jobs, {args.copies * 3} steps per job")
+
+    workers = 1
+    while workers <= args.max_workers:
+        extractor = StepExtractor(
+            client,
+            "bucket",
+            fetcher=fetch.Fetcher(concurrency=2 * workers),
+            parse_workers=workers,
+        )
+        # spawn the workers before timing
+        extractor.parse_prow_jobs(ProwJobs(items=jobs.items[:workers]))
+
+        start = time.perf_counter()
+        steps = extractor.parse_prow_jobs(jobs)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>3} workers {len(steps) / elapsed:12.0f} steps/s")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Compare the memory and time needed to hold the jobs of a job list as
+pydantic ProwJob models and as slotted records with the same fields, built
+from the same raw items of Prow's job list.
+
+Only the assisted jobs are built by a run, the other items are dropped before
+validation: the cost of a run is estimated for that share of the list."""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from common import ASSISTED_RATIO, generate_job_list
+
+from prowjobsscraper.prowjob import ProwJob
+
+
+@dataclass(slots=True)
+class JobLabels:
+    cloud: Optional[str]
+    cloudClusterProfile: Optional[str]
+    refsBaseRef: Optional[str]
+    refsOrg: Optional[str]
+    refsPull: Optional[str]
+    refsRepo: Optional[str]
+    variant: Optional[str]
+
+
+@dataclass(slots=True)
+class JobSpec:
+    job: str
+    type: str
+    hidden: Optional[bool]
+
+
+@dataclass(slots=True)
+class JobStatus:
+    state: Optional[str]
+    url: Optional[str]
+    startTime: Optional[datetime]
+    pendingTime: Optional[datetime]
+    completionTime: Optional[datetime]
+    build_id: Optional[str]
+    description: Optional[str]
+
+
+@dataclass(slots=True)
+class JobRecord:
+    labels: JobLabels
+    spec: JobSpec
+    status: JobStatus
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def create_record(item: dict[str, Any]) -> JobRecord:
+    labels = item["metadata"]["labels"]
+    spec = item["spec"]
+    status = item["status"]
+    return JobRecord(
+        labels=JobLabels(
+            cloud=labels.get("ci-operator.openshift.io/cloud"),
+            cloudClusterProfile=labels.get(
+                "ci-operator.openshift.io/cloud-cluster-profile"
+            ),
+            refsBaseRef=labels.get("prow.k8s.io/refs.base_ref"),
+            refsOrg=labels.get("prow.k8s.io/refs.org"),
+            refsPull=labels.get("prow.k8s.io/refs.pull"),
+            refsRepo=labels.get("prow.k8s.io/refs.repo"),
+            variant=labels.get("ci-operator.openshift.io/variant"),
+        ),
+        spec=JobSpec(job=spec["job"], type=spec["type"], hidden=spec.get("hidden")),
+        status=JobStatus(
+            state=status.get("state"),
+            url=status.get("url"),
+            startTime=_parse_datetime(status.get("startTime")),
+            pendingTime=_parse_datetime(status.get("pendingTime")),
+            completionTime=_parse_datetime(status.get("completionTime")),
+            build_id=status.get("build_id"),
+            description=status.get("description"),
+        ),
+    )
+
+
+def measure(fn: Callable[[], Any]) -> tuple[float, int]:
+    """Return the wall time of fn and the memory still allocated by its
+    result, in bytes."""
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=50_000)
+    args = parser.parse_args()
+
+    items = generate_job_list(args.jobs)["items"]
+    for item in items:
+        # the datetimes of Prow's job list end with Z
+        for key in ("startTime", "pendingTime", "completionTime"):
+            if item["status"].get(key):
+                item["status"][key] = item["status"][key].replace("Z", "+00:00")
+    assisted_jobs = int(args.jobs * ASSISTED_RATIO)
+    print(f"{args.jobs} jobs, {assisted_jobs} assisted ones built by a run")
+
+    for name, factory in (
+        ("pydantic ProwJob", ProwJob.parse_obj),
+        ("slotted records", create_record),
+    ):
+        elapsed, size = measure(lambda: [factory(i) for i in items])
+        print(
+            f"{name:<18} {elapsed / args.jobs * 1e6:6.1f} us, "
+            f"{size / args.jobs:6.0f} B per job; per run: "
+            f"{elapsed / args.jobs * assisted_jobs:5.2f} s, "
+            f"{size / args.jobs * assisted_jobs / 1024 / 1024:5.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compare the wall time of a report when the documents read back from
+OpenSearch are validated and when they are decoded in trusted mode.
+
+Both the decoding of the queried documents alone and the whole report are
+timed: the report also includes the computation of the metrics."""
+
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from common import timeit
+from opensearchpy.serializer import JSONSerializer
+
+from jobsautoreport.query import Querier
+from jobsautoreport.report import Reporter
+from prowjobsscraper.equinix_usages import EquinixUsage, EquinixUsageEvent
+from prowjobsscraper.event import JobDetails, JobRefs, StepDetails, StepEvent
+from prowjobsscraper.prowjob import CIResourceMetadata
+
+_FROM_DATE = datetime(2023, 3, 1, tzinfo=timezone.utc)
+_TO_DATE = datetime(2023, 4, 1, tzinfo=timezone.utc)
+
+_JOB_TYPES = ("periodic", "presubmit", "postsubmit")
+_JOB_STATES = ("success", "failure")
+
+
+class InMemoryQuerier(Querier):
+    """Querier serving pre-generated hits instead of scanning OpenSearch"""
+
+    def __init__(self, hits: dict[str, list[dict[str, Any]]], trusted_decode: bool):
+        super().__init__(
+            opensearch_client=None,  # type: ignore
+            jobs_index="jobs",
+            steps_index="steps",
+            usages_index="usages",
+            trusted_decode=trusted_decode,
+        )
+        self._hits = hits
+
+    def _scan(self, query: dict[str, Any], index_name: str) -> list[dict[Any, Any]]:
+        return self._hits[index_name]
+
+
+def _to_hit(document: dict[str, Any]) -> dict[str, Any]:
+    return {"_source": json.loads(JSONSerializer().dumps(document))}
+
+
+def generate_hits(count: int) -> dict[str, list[dict[str, Any]]]:
+    jobs, steps, usages = [], [], []
+    for i in range(count):
+        build_id = str(1640315275049963520 + i)
+        start_time = _FROM_DATE + timedelta(minutes=i % (30 * 24 * 60))
+        job = JobDetails(
+            build_id=build_id,
+            cloud_cluster_profile="packet-assisted",
+            duration=2053,
+            ci_resource_metadata=CIResourceMetadata(provider="equinix", region="da"),
+            name=f"pull-ci-openshift-assisted-service-master-e2e-metal-assisted-{i % 50}",
+            refs=JobRefs(base_ref="master", org="openshift", repo="assisted-service"),
+            start_time=start_time,
+            state=_JOB_STATES[i % 7 == 0],
+            type=_JOB_TYPES[i % len(_JOB_TYPES)],
+            url="https://prow.ci.openshift.org/view/gs/origin-ci-test/logs/job",
+            variant="edge",
+            context=f"e2e-metal-assisted-{i % 50}",
+        )
+        jobs.append(_to_hit({"job": job.dict()}))
+        step = StepEvent(
+            job=job,
+            step=StepDetails(
+                duration=456,
+                name="baremetalds-packet-setup",
+                state=_JOB_STATES[i % 11 == 0],
+            ),
+        )
+        steps.append(_to_hit(step.dict()))
+        usage = EquinixUsageEvent.create_from_equinix_usage(
+            EquinixUsage(
+                description=None,
+                facility="da11",
+                metro="da",
+                name=f"ipi-ci-op-0cdb4jh0-{build_id}",
+                plan="c3.medium.x86",
+                plan_version="c3.medium.x86 v1",
+                price=1.5,
+                quantity=2.0,
+                total=3.0,
+                type="Instance",
+                unit="hour",
+                start_date=start_time,
+                end_date=start_time + timedelta(hours=2),
+            )
+        )
+        usages.append(_to_hit(usage.dict()))
+
+    return {"jobs": jobs, "steps": steps, "usages": usages}
+
+
+def query_all(querier: Querier) -> None:
+    querier.query_jobs(from_date=_FROM_DATE, to_date=_TO_DATE)
+    querier.query_packet_setup_step_events(from_date=_FROM_DATE, to_date=_TO_DATE)
+    querier.query_usage_events(from_date=_FROM_DATE, to_date=_TO_DATE)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=2_000)
+    args = parser.parse_args()
+
+    hits = generate_hits(args.jobs)
+    print(f"{args.jobs} jobs, steps and usages")
+
+    for name, trusted_decode in (("validated", False), ("trusted", True)):
+        querier = InMemoryQuerier(hits, trusted_decode)
+        reporter = Reporter(querier=querier)
+        decode_time = timeit(lambda: query_all(querier))
+        report_time = timeit(
+            lambda: reporter.get_report(from_date=_FROM_DATE, to_date=_TO_DATE)
+        )
+        print(
+            f"{name:<10} decode {decode_time * 1000:8.1f} ms, "
+            f"report {report_time * 1000:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
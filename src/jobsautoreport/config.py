@@ -12,6 +12,8 @@ SLACK_BOT_TOKEN = os.environ["SLACK_BOT_TOKEN"]
 SLACK_CHANNEL_ID = os.environ["SLACK_CHANNEL_ID"]
 REPORT_INTERVAL = ReportInterval(os.environ["REPORT_INTERVAL"])
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+JOB_CLASSIFIER_RULES = os.getenv("JOB_CLASSIFIER_RULES")
+TRUSTED_DECODE = os.getenv("TRUSTED_DECODE", "false") == "true"
 
 # feature flags
 
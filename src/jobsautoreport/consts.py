@@ -23,11 +23,8 @@ PERIODIC_FLAKY_JOBS_TITLE: Final[str] = "Periodic Flaky Jobs"
 TOP_5_MOST_EXPENSIVE_JOBS_TITLE: Final[str] = "Top 5 Most Expensive Jobs"
 COST_BY_MACHINE_TYPE_TITLE: Final[str] = "Cost by Machine Type"
 COST_BY_JOB_TYPE_TITLE: Final[str] = "Cost by Job Type"
-REHEARSE: Final[str] = "rehearse"
 RELEASE: Final[str] = "release"
 OPENSHIFT: Final[str] = "openshift"
-SUBSYSTEM: Final[str] = "subsystem"
-E2E: Final[str] = "e2e"
 ASSISTED_REPOSITORIES: Final[list[str]] = [
     "assisted-service",
     "assisted-installer",
@@ -12,6 +12,7 @@ from jobsautoreport.query import Querier
 from jobsautoreport.report import Reporter
 from jobsautoreport.slack.slack_report import SlackReporter
 from jobsautoreport.trends import TrendDetector
+from prowjobsscraper.classifier import JobClassifier
 
 
 def get_reports_start_date(
@@ -69,6 +70,8 @@ def main() -> None:
 
     jobs_index = config.ES_JOB_INDEX + "-*"
     steps_index = config.ES_STEP_INDEX + "-*"
+    # the steps stored with SLIM_STEP_EVENTS, by this or any former run
+    slim_steps_index = config.ES_STEP_INDEX + "_slim-*"
     usages_index = config.ES_USAGE_INDEX + "-*"
 
     feature_flags = FeatureFlags(
@@ -84,9 +87,14 @@ def main() -> None:
         jobs_index=jobs_index,
         steps_index=steps_index,
         usages_index=usages_index,
+        trusted_decode=config.TRUSTED_DECODE,
+        slim_steps_index=slim_steps_index,
     )
 
-    reporter = Reporter(querier=querier)
+    reporter = Reporter(
+        querier=querier,
+        job_classifier=JobClassifier.create_from_json(config.JOB_CLASSIFIER_RULES),
+    )
 
     current_report = reporter.get_report(
         from_date=current_report_start_time,
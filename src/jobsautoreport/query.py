@@ -1,14 +1,22 @@
+import functools
 import logging
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Final, Optional, TypeVar
 
 from opensearchpy import OpenSearch, helpers
+from pydantic import BaseModel
+from pydantic.datetime_parse import parse_datetime
+from pydantic.fields import SHAPE_SINGLETON, ModelField
 
 from prowjobsscraper.equinix_usages import EquinixUsageEvent
-from prowjobsscraper.event import JobDetails, StepEvent
+from prowjobsscraper.event import JobDetails, SlimStepEvent, StepEvent
 
 logger = logging.getLogger(__name__)
 
+_JOIN_BATCH_SIZE: Final[int] = 1000
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
 
 class Querier:
     """Querier queries data from elasticsearch database and parses it"""
@@ -19,11 +27,22 @@ class Querier:
         jobs_index: str,
         steps_index: str,
         usages_index: str,
+        trusted_decode: bool = False,
+        slim_steps_index: Optional[str] = None,
     ):
+        """
+        When trusted_decode is set, the documents are assumed to be written by
+        prow-jobs-scraper and are decoded without being validated again.
+
+        The steps stored with only the build id of their job, in
+        slim_steps_index, are joined to the full details of their job.
+        """
         self._os_client = opensearch_client
         self._jobs_index = jobs_index
         self._steps_index = steps_index
+        self._slim_steps_index = slim_steps_index
         self._usages_index = usages_index
+        self._trusted_decode = trusted_decode
 
     @staticmethod
     def _get_query_all_jobs(from_date: datetime, to_date: datetime) -> dict:
@@ -108,7 +127,41 @@ class Querier:
         query = self._get_query_steps_by_name(
             from_date=from_date, to_date=to_date, name="baremetalds-packet-setup"
         )
-        return self._query_step_events_and_log(query=query)
+        step_events = self._query_step_events_and_log(query=query)
+        if self._slim_steps_index is not None:
+            slim_step_events = self._query_slim_step_events_and_log(
+                query=query, index_name=self._slim_steps_index
+            )
+            step_events.extend(self._join_jobs(slim_step_events))
+        return step_events
+
+    def _join_jobs(self, step_events: list[SlimStepEvent]) -> list[StepEvent]:
+        """
+        Join the step events to the full details of their job, queried from the
+        jobs index by build id. The steps whose job is not found are skipped.
+        """
+        build_ids = sorted({e.job.build_id for e in step_events if e.job.build_id})
+        jobs: dict[Optional[str], JobDetails] = {}
+        for i in range(0, len(build_ids), _JOIN_BATCH_SIZE):
+            query = {
+                "query": {
+                    "terms": {"job.build_id": build_ids[i : i + _JOIN_BATCH_SIZE]}
+                }
+            }
+            for job_details in self._query_jobs_and_log(query=query):
+                jobs[job_details.build_id] = job_details
+
+        joined_step_events = []
+        for step_event in step_events:
+            if (job := jobs.get(step_event.job.build_id)) is None:
+                logger.warning(
+                    "No job found for step %s of build %s",
+                    step_event.step.name,
+                    step_event.job.build_id,
+                )
+                continue
+            joined_step_events.append(StepEvent(job=job, step=step_event.step))
+        return joined_step_events
 
     def query_usage_events(
         self, from_date: datetime, to_date: datetime
@@ -126,6 +179,16 @@ class Querier:
         elastic_search_steps = self._scan(query=query, index_name=self._steps_index)
         return self._parse_step_events(elastic_search_steps=elastic_search_steps)
 
+    def _query_slim_step_events_and_log(
+        self, query: dict[str, Any], index_name: str
+    ) -> list[SlimStepEvent]:
+        logger.debug("OpenSearch query: %s", query)
+        elastic_search_steps = self._scan(query=query, index_name=index_name)
+        return [
+            self._decode(SlimStepEvent, step_event["_source"])
+            for step_event in elastic_search_steps
+        ]
+
     def _query_usage_events_and_log(
         self, query: dict[str, Any]
     ) -> list[EquinixUsageEvent]:
@@ -162,14 +225,62 @@ class Querier:
             for usage_event in elastic_search_usages
         ]
 
-    @staticmethod
-    def _parse_job(elastic_search_job: dict[Any, Any]) -> JobDetails:
-        return JobDetails.parse_obj(elastic_search_job)
+    def _parse_job(self, elastic_search_job: dict[Any, Any]) -> JobDetails:
+        return self._decode(JobDetails, elastic_search_job)
 
-    @staticmethod
-    def _parse_step_event(elastic_search_step: dict[Any, Any]) -> StepEvent:
-        return StepEvent.parse_obj(elastic_search_step)
+    def _parse_step_event(self, elastic_search_step: dict[Any, Any]) -> StepEvent:
+        return self._decode(StepEvent, elastic_search_step)
 
-    @staticmethod
-    def _parse_usage_event(elastic_search_usage: dict[Any, Any]) -> EquinixUsageEvent:
-        return EquinixUsageEvent.parse_obj(elastic_search_usage)
+    def _parse_usage_event(
+        self, elastic_search_usage: dict[Any, Any]
+    ) -> EquinixUsageEvent:
+        return self._decode(EquinixUsageEvent, elastic_search_usage)
+
+    def _decode(self, model: type[ModelT], document: dict[Any, Any]) -> ModelT:
+        if self._trusted_decode:
+            return trusted_decode(model, document)
+        return model.parse_obj(document)
+
+
+def trusted_decode(model: type[ModelT], document: dict[Any, Any]) -> ModelT:
+    """
+    Build a model from a document without validating it: only the nested models
+    and the datetimes are decoded, every other value is used as is.
+    """
+    values = {}
+    for name, decode in _get_field_decoders(model):
+        if name in document:
+            value = document[name]
+            if decode is not None and value is not None:
+                value = decode(value)
+            values[name] = value
+    return model.construct(**values)
+
+
+def _decode_datetime(value: Any) -> datetime:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return parse_datetime(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_field_decoders(
+    model: type[BaseModel],
+) -> list[tuple[str, Optional[Callable[[Any], Any]]]]:
+    decoders = []
+    for name, field in model.__fields__.items():
+        decoders.append((name, _get_field_decoder(field)))
+    return decoders
+
+
+def _get_field_decoder(field: ModelField) -> Optional[Callable[[Any], Any]]:
+    if field.shape != SHAPE_SINGLETON:
+        return None
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        return functools.partial(trusted_decode, field.type_)
+    if field.type_ is datetime:
+        return _decode_datetime
+    return None
@@ -5,14 +5,7 @@ from typing import Callable, Optional
 
 import numpy as np
 
-from jobsautoreport.consts import (
-    ASSISTED_REPOSITORIES,
-    E2E,
-    OPENSHIFT,
-    REHEARSE,
-    RELEASE,
-    SUBSYSTEM,
-)
+from jobsautoreport.consts import ASSISTED_REPOSITORIES, OPENSHIFT, RELEASE
 from jobsautoreport.models import (
     EquinixCostReport,
     EquinixUsageReport,
@@ -30,6 +23,7 @@ from jobsautoreport.models import (
     StepState,
 )
 from jobsautoreport.query import Querier
+from prowjobsscraper.classifier import JobClass, JobClassifier
 from prowjobsscraper.equinix_usages import EquinixUsageEvent
 from prowjobsscraper.event import JobDetails, StepEvent
 
@@ -39,8 +33,11 @@ logger = logging.getLogger(__name__)
 class Reporter:
     """Reporter computes metrics from the data Querier retrieves, and generates report"""
 
-    def __init__(self, querier: Querier):
+    def __init__(
+        self, querier: Querier, job_classifier: Optional[JobClassifier] = None
+    ):
         self._querier = querier
+        self._job_classifier = job_classifier or JobClassifier()
 
     @staticmethod
     def _get_job_triggers_count(job_name: str, jobs: list[JobDetails]) -> int:
@@ -165,9 +162,9 @@ class Reporter:
         ]
 
     @staticmethod
-    def _is_rehearsal(job: JobDetails) -> bool:
+    def _is_rehearsal(job: JobDetails, job_class: JobClass) -> bool:
         return (
-            REHEARSE in job.name
+            bool(job_class & JobClass.REHEARSAL)
             and job.type == JobType.PRESUBMIT.value
             and job.refs.repo == RELEASE
             and job.refs.org == OPENSHIFT
@@ -178,8 +175,8 @@ class Reporter:
         return job.refs.repo in ASSISTED_REPOSITORIES and job.refs.org == OPENSHIFT
 
     @staticmethod
-    def _is_e2e_or_subsystem_class(job: JobDetails) -> bool:
-        return E2E in job.name or SUBSYSTEM in job.name
+    def _is_e2e_or_subsystem_class(job_class: JobClass) -> bool:
+        return bool(job_class & (JobClass.E2E | JobClass.SUBSYSTEM))
 
     @classmethod
     def _get_machine_metrics(cls, usages: list[EquinixUsageEvent]) -> MachineMetrics:
@@ -381,15 +378,17 @@ class Reporter:
             from_date=from_date, to_date=to_date
         )
         logger.debug("%d step events queried from elasticsearch", len(step_events))
-        rehearsal_jobs = [job for job in jobs if self._is_rehearsal(job=job)]
-        assisted_components_jobs = [
-            job for job in jobs if self._is_assisted_repository(job)
-        ]
-        subsystem_and_e2e_jobs = [
-            job
-            for job in assisted_components_jobs
-            if self._is_e2e_or_subsystem_class(job)
-        ]
+        rehearsal_jobs = []
+        assisted_components_jobs = []
+        subsystem_and_e2e_jobs = []
+        for job in jobs:
+            job_class = self._job_classifier.classify(job.name)
+            if self._is_rehearsal(job=job, job_class=job_class):
+                rehearsal_jobs.append(job)
+            if self._is_assisted_repository(job):
+                assisted_components_jobs.append(job)
+                if self._is_e2e_or_subsystem_class(job_class):
+                    subsystem_and_e2e_jobs.append(job)
         periodic_subsystem_and_e2e_jobs = [
             job for job in subsystem_and_e2e_jobs if job.type == JobType.PERIODIC.value
         ]
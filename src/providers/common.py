@@ -1,15 +1,21 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import Final, Optional
+from typing import Final, Generic, Optional, Sequence, TypeVar
 
-from google.cloud import storage  # type: ignore
+from google.cloud import exceptions, storage  # type: ignore
 from pydantic import BaseModel
 
+from prowjobsscraper import fetch, utils
 from prowjobsscraper.prowjob import ProwJob
 
+logger = logging.getLogger(__name__)
+
 PROVIDER_METADATA_PATH_TEMPLATE: Final[str] = (
     "{}/artifacts/{}/ofcir-gather/artifacts/{}-metadata.json"
 )
 
+M = TypeVar("M", bound=BaseModel)
+
 
 class ProviderMetadata(BaseModel):
     region: str
@@ -17,15 +23,94 @@ class ProviderMetadata(BaseModel):
     os: str
 
 
-class Provider(ABC, BaseModel):
+class Provider(ABC, BaseModel, Generic[M]):
+    """
+    A Provider decodes the metadata of the CI resources it provisions: each
+    provider sets the model of its metadata file and how it maps to
+    ProviderMetadata, downloading and decoding the file are shared.
+    """
+
     _id: str
+    _name: str
+    _metadata_model: type[M]
 
     @property
     def id(self) -> str:
         return self._id
 
+    def get_metadata_path(self, prowjob: ProwJob) -> str:
+        return PROVIDER_METADATA_PATH_TEMPLATE.format(
+            prowjob.gcs_base_path, prowjob.context, self._id
+        )
+
     @abstractmethod
+    def _to_provider_metadata(self, metadata: M) -> ProviderMetadata:
+        pass
+
     def get_provider_metadata_from_prowjob(
         self, prowjob: ProwJob, gcs_client: storage.Client, gcs_bucket_name: str
     ) -> Optional[ProviderMetadata]:
-        pass
+        if (
+            metadata := fetch_and_decode(
+                self._metadata_model,
+                gcs_client,
+                gcs_bucket_name,
+                self.get_metadata_path(prowjob),
+                description=f"{self._name} metadata of job {prowjob.spec.job}",
+            )
+        ) is None:
+            return None
+
+        return self._to_provider_metadata(metadata)
+
+    def get_provider_metadata_batch(
+        self,
+        prowjobs: Sequence[ProwJob],
+        gcs_client: storage.Client,
+        gcs_bucket_name: str,
+        fetcher: Optional[fetch.Fetcher] = None,
+    ) -> list[Optional[ProviderMetadata]]:
+        """
+        Get the metadata of every job, in the order of the jobs. The metadata
+        files are fetched concurrently by fetcher.
+        """
+        return (fetcher or fetch.Fetcher()).map(
+            lambda j: self.get_provider_metadata_from_prowjob(
+                prowjob=j, gcs_client=gcs_client, gcs_bucket_name=gcs_bucket_name
+            ),
+            prowjobs,
+        )
+
+
+def fetch_and_decode(
+    model: type[M],
+    gcs_client: storage.Client,
+    gcs_bucket_name: str,
+    path: str,
+    description: str,
+) -> Optional[M]:
+    """
+    Download the JSON file at path and decode it into model, return None when
+    the file is missing, empty or cannot be decoded.
+    """
+    try:
+        if not (
+            raw_metadata := utils.download_from_gcs_as_string(
+                gcs_client, gcs_bucket_name, path
+            )
+        ):
+            logger.debug("Metadata is empty: %s", path)
+            return None
+        logger.debug("Found metadata: %s", path)
+    except exceptions.ClientError as e:
+        logger.debug("Metadata is missing from %s: %s", path, e)
+        return None
+
+    try:
+        metadata = model.parse_raw(raw_metadata)
+        logger.debug("Decoded successfully metadata in: %s", path)
+    except Exception as e:
+        logger.warning(f"Failed to decode {description}: {e}")
+        return None
+
+    return metadata
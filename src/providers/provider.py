@@ -15,5 +15,8 @@ SUPPORTED_PROVIDERS: tuple[Provider, Provider, Provider] = (
 )
 
 
+PROVIDERS_BY_ID: dict[str, Provider] = {p.id: p for p in SUPPORTED_PROVIDERS}
+
+
 def get_provider_by_id(id: str) -> Optional[Provider]:
-    return next((p for p in SUPPORTED_PROVIDERS if p.id == id), None)
+    return PROVIDERS_BY_ID.get(id)
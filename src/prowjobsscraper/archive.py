@@ -0,0 +1,310 @@
+import gzip
+import json
+import logging
+import pathlib
+from datetime import datetime
+from typing import Any, Callable, Final, Iterable, Iterator, Optional
+
+import requests
+from google.cloud import exceptions, storage  # type: ignore
+
+from prowjobsscraper import equinix_usages, event, prowjob
+
+logger = logging.getLogger(__name__)
+
+
+class Archive:
+    """
+    Archive stores every input used by a scraper run (job list, GCS artifacts
+    and Equinix usages) as compressed files in a local directory, so that the
+    run can later be replayed without any network access.
+    """
+
+    _JOB_LIST_FILENAME: Final[str] = "prowjobs.json.gz"
+    _EQUINIX_USAGES_FILENAME: Final[str] = "equinix_usages.json.gz"
+    _KNOWN_BUILD_IDS_FILENAME: Final[str] = "known_build_ids.json.gz"
+    _KNOWN_USAGES_FILENAME: Final[str] = "known_usages_identifiers.json.gz"
+    _GCS_DIRNAME: Final[str] = "gcs"
+    _CHUNK_SIZE: Final[int] = 64 * 1024
+
+    def __init__(self, directory: str):
+        self._directory = pathlib.Path(directory)
+
+    def fetch_job_list(
+        self, url: str, item_filter: Callable[[dict[str, Any]], bool]
+    ) -> prowjob.ProwJobs:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with requests.get(url, stream=True) as r:
+            r.raise_for_status()
+            chunks = self._record_job_list(r.iter_content(chunk_size=self._CHUNK_SIZE))
+            jobs = prowjob.ProwJobs.create_from_chunks(chunks, item_filter)
+            for _ in chunks:
+                pass
+
+        return jobs
+
+    def load_job_list(
+        self, item_filter: Callable[[dict[str, Any]], bool]
+    ) -> prowjob.ProwJobs:
+        with gzip.open(self._directory / self._JOB_LIST_FILENAME, "rb") as f:
+            chunks = iter(lambda: f.read(self._CHUNK_SIZE), b"")
+            return prowjob.ProwJobs.create_from_chunks(chunks, item_filter)
+
+    def _record_job_list(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        with gzip.open(self._directory / self._JOB_LIST_FILENAME, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+
+    def write_equinix_usages(
+        self, start_time: datetime, end_time: datetime, usages: list[dict[str, Any]]
+    ) -> None:
+        self._write_json(
+            self._EQUINIX_USAGES_FILENAME,
+            {
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "usages": usages,
+            },
+        )
+
+    def read_equinix_usages(self) -> tuple[datetime, datetime, list[dict[str, Any]]]:
+        archived = self._read_json(self._EQUINIX_USAGES_FILENAME)
+
+        return (
+            datetime.fromisoformat(archived["start_time"]),
+            datetime.fromisoformat(archived["end_time"]),
+            archived["usages"],
+        )
+
+    def write_known_build_ids(self, build_ids: set[str]) -> None:
+        self._write_json(self._KNOWN_BUILD_IDS_FILENAME, sorted(build_ids))
+
+    def read_known_build_ids(self) -> set[str]:
+        return set(self._read_json(self._KNOWN_BUILD_IDS_FILENAME))
+
+    def write_known_usages_identifiers(
+        self, identifiers: set[equinix_usages.EquinixUsageIdentifier]
+    ) -> None:
+        self._write_json(
+            self._KNOWN_USAGES_FILENAME,
+            sorted([i.name, i.plan] for i in identifiers),
+        )
+
+    def read_known_usages_identifiers(
+        self,
+    ) -> set[equinix_usages.EquinixUsageIdentifier]:
+        return {
+            equinix_usages.EquinixUsageIdentifier(name, plan)
+            for name, plan in self._read_json(self._KNOWN_USAGES_FILENAME)
+        }
+
+    def _write_json(self, filename: str, data: Any) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self._directory / filename, "wt") as f:
+            json.dump(data, f)
+
+    def _read_json(self, filename: str) -> Any:
+        with gzip.open(self._directory / filename, "rt") as f:
+            return json.load(f)
+
+    def _gcs_path(self, bucket: str, path: str) -> pathlib.Path:
+        return self._directory / self._GCS_DIRNAME / bucket / f"{path}.gz"
+
+    def write_gcs_artifact(self, bucket: str, path: str, data: bytes) -> None:
+        archived_path = self._gcs_path(bucket, path)
+        archived_path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(archived_path, "wb") as f:
+            f.write(data)
+
+    def list_gcs_artifacts(self, bucket: str, prefix: str) -> list[str]:
+        bucket_dir = self._directory / self._GCS_DIRNAME / bucket
+        paths = (
+            str(p.relative_to(bucket_dir))[: -len(".gz")]
+            for p in bucket_dir.rglob("*.gz")
+        )
+        return sorted(p for p in paths if p.startswith(prefix))
+
+    def read_gcs_artifact(self, bucket: str, path: str) -> bytes:
+        try:
+            with gzip.open(self._gcs_path(bucket, path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise exceptions.NotFound(f"{bucket}/{path} is not archived")
+
+
+class _ArchivedBlob:
+    def __init__(
+        self,
+        archive: Archive,
+        bucket: str,
+        path: str,
+        blob: Optional[storage.Blob] = None,
+    ):
+        self._archive = archive
+        self._bucket = bucket
+        self._path = path
+        self._blob = blob
+
+    @property
+    def name(self) -> str:
+        return self._path
+
+    def download_as_string(self, **kwargs) -> bytes:
+        if self._blob is None:
+            return self._archive.read_gcs_artifact(self._bucket, self._path)
+
+        data = self._blob.download_as_string(**kwargs)
+        self._archive.write_gcs_artifact(self._bucket, self._path, data)
+        return data
+
+
+class _ArchivedBucket:
+    def __init__(
+        self,
+        archive: Archive,
+        name: str,
+        bucket: Optional[storage.Bucket] = None,
+    ):
+        self._archive = archive
+        self._name = name
+        self._bucket = bucket
+
+    def blob(self, path: str) -> _ArchivedBlob:
+        blob = self._bucket.blob(path) if self._bucket is not None else None
+        return _ArchivedBlob(self._archive, self._name, path, blob)
+
+
+class RecordingStorageClient:
+    """
+    RecordingStorageClient wraps a GCS client and archives every artifact
+    downloaded through it.
+    """
+
+    def __init__(self, client: storage.Client, archive: Archive):
+        self._client = client
+        self._archive = archive
+
+    def bucket(self, name: str) -> _ArchivedBucket:
+        return _ArchivedBucket(self._archive, name, self._client.bucket(name))
+
+    def list_blobs(self, bucket_or_name: str, **kwargs) -> Iterator[storage.Blob]:
+        # only downloaded artifacts are archived, listings are not
+        return self._client.list_blobs(bucket_or_name, **kwargs)
+
+
+class ReplayStorageClient:
+    """
+    ReplayStorageClient serves GCS artifacts from an archive, artifacts that
+    were not archived are reported as missing.
+    """
+
+    def __init__(self, archive: Archive):
+        self._archive = archive
+
+    def bucket(self, name: str) -> _ArchivedBucket:
+        return _ArchivedBucket(self._archive, name)
+
+    def list_blobs(
+        self, bucket_or_name: str, prefix: str = "", **kwargs
+    ) -> list[_ArchivedBlob]:
+        """
+        List the archived artifacts under prefix, the other filters (such as
+        match_glob) are not applied: callers look for known paths.
+        """
+        return [
+            _ArchivedBlob(self._archive, bucket_or_name, path)
+            for path in self._archive.list_gcs_artifacts(bucket_or_name, prefix)
+        ]
+
+
+class RecordingEquinixUsagesExtractor(equinix_usages.EquinixUsagesExtractor):
+    def __init__(
+        self,
+        archive: Archive,
+        project_id: str,
+        project_token: str,
+        start_time: datetime,
+        end_time: datetime,
+    ):
+        super().__init__(project_id, project_token, start_time, end_time)
+        self._archive = archive
+
+    def _fetch_raw_usages(self) -> list[dict[str, Any]]:
+        usages = super()._fetch_raw_usages()
+        self._archive.write_equinix_usages(self._start_time, self._end_time, usages)
+        return usages
+
+
+class ReplayEquinixUsagesExtractor(equinix_usages.EquinixUsagesExtractor):
+    def __init__(self, archive: Archive):
+        start_time, end_time, self._usages = archive.read_equinix_usages()
+        super().__init__(
+            project_id="",
+            project_token="",
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+    def _fetch_raw_usages(self) -> list[dict[str, Any]]:
+        return self._usages
+
+
+class _ReplayIndex:
+    """Stand-in for an OpenSearch index that builds and counts documents."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self.count = 0
+
+    def index(self, data: Iterator[tuple[dict[str, Any], str]]) -> None:
+        count = sum(1 for _ in data)
+        self.count += count
+        logger.info("%s documents would be pushed to %s", count, self._name)
+
+
+class RecordingEventStore(event.EventStoreElastic):
+    """
+    RecordingEventStore archives what was already stored in OpenSearch, so
+    that a replay processes the same jobs and usages as the archived run.
+    """
+
+    def __init__(self, archive: Archive, **kwargs):
+        super().__init__(**kwargs)
+        self._archive = archive
+
+    def get_known_build_ids(self, build_ids: Iterable[str]) -> set[str]:
+        known_build_ids = super().get_known_build_ids(build_ids)
+        self._archive.write_known_build_ids(known_build_ids)
+        return known_build_ids
+
+    def scan_usages_identifiers(
+        self, start_time: datetime, end_time: datetime
+    ) -> set[equinix_usages.EquinixUsageIdentifier]:
+        identifiers = super().scan_usages_identifiers(start_time, end_time)
+        self._archive.write_known_usages_identifiers(identifiers)
+        return identifiers
+
+
+class ReplayEventStore(event.EventStoreElastic):
+    """
+    ReplayEventStore builds the same documents as EventStoreElastic without
+    pushing them anywhere, what was already stored is read from the archive.
+    """
+
+    def __init__(self, archive: Archive, slim_steps: bool = False):
+        self._archive = archive
+        self._slim_steps = slim_steps
+        self._jobs_index = _ReplayIndex("jobs")  # type: ignore
+        self._steps_index = _ReplayIndex("steps")  # type: ignore
+        self._failure_details_index = _ReplayIndex("failure details")  # type: ignore
+        self._usages_index = _ReplayIndex("usages")  # type: ignore
+        self._build_ids_index = _ReplayIndex("build ids")  # type: ignore
+
+    def get_known_build_ids(self, build_ids: Iterable[str]) -> set[str]:
+        return self._archive.read_known_build_ids().intersection(build_ids)
+
+    def scan_usages_identifiers(
+        self, start_time: datetime, end_time: datetime
+    ) -> set[equinix_usages.EquinixUsageIdentifier]:
+        return self._archive.read_known_usages_identifiers()
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Final, Optional
+
+from google.api_core import exceptions  # type: ignore
+from google.cloud import storage  # type: ignore
+
+from prowjobsscraper import fetch
+from prowjobsscraper.prowjob import ProwJob
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactDiscovery:
+    """
+    ArtifactDiscovery lists, with a single request per job, the artifacts the
+    scraper downloads: the junit file and the CIR and provider metadata files.
+    The CIR metadata extractor checks it before downloading the metadata of the
+    packet jobs, most of which lack some of them, so that they do not cost a
+    failed download each. Other artifacts are only checked against the
+    listings already made: listing the artifacts of a job to download a single
+    one of them would cost a request more than the download.
+    """
+
+    # matches {base}/artifacts/junit_operator.xml and the metadata files
+    # gathered in {base}/artifacts/{context}/ofcir-gather/artifacts/
+    _MATCH_GLOB_TEMPLATE: Final[str] = (
+        "{}/artifacts/{{junit_operator.xml,*/ofcir-gather/artifacts/*.json}}"
+    )
+    _CACHE_SIZE: Final[int] = 4096
+
+    def __init__(self, client: storage.Client, gcs_bucket_name: str):
+        self._client = client
+        self._gcs_bucket_name = gcs_bucket_name
+        # artifacts of completed jobs do not change, the step and CIR metadata
+        # extractors share the listing of each job
+        self._lock = threading.Lock()
+        self._listings: OrderedDict[str, frozenset[str]] = OrderedDict()
+
+    def discover(self, job: ProwJob) -> None:
+        """
+        List the artifacts of job, unless they were already listed.
+        """
+        self._get_artifacts(job)
+
+    def has_artifact(self, job: ProwJob, path: str) -> bool:
+        """
+        Tell whether the artifact at path exists for job. When the artifacts
+        cannot be listed, it is assumed to exist and will be downloaded.
+        """
+        if (artifacts := self._get_artifacts(job)) is None:
+            return True
+
+        return path in artifacts
+
+    def has_listed_artifact(self, job: ProwJob, path: str) -> Optional[bool]:
+        """
+        Same as has_artifact when the artifacts of job were already listed,
+        None otherwise: they are not listed.
+        """
+        with self._lock:
+            artifacts = self._listings.get(job.gcs_base_path)
+        if artifacts is None:
+            return None
+        return path in artifacts
+
+    def _get_artifacts(self, job: ProwJob) -> Optional[frozenset[str]]:
+        try:
+            return self._list_artifacts(job.gcs_base_path)
+        except exceptions.GoogleAPIError as e:
+            if isinstance(e, fetch.THROTTLING_ERRORS):
+                fetch.report_throttling()
+            logger.warning("Failed to list the artifacts of job %s: %s", job, e)
+            return None
+
+    def _list_artifacts(self, base_path: str) -> frozenset[str]:
+        with self._lock:
+            if (artifacts := self._listings.get(base_path)) is not None:
+                self._listings.move_to_end(base_path)
+                return artifacts
+
+        start = time.monotonic()
+        blobs = self._client.list_blobs(
+            self._gcs_bucket_name,
+            prefix=f"{base_path}/artifacts/",
+            match_glob=self._MATCH_GLOB_TEMPLATE.format(base_path),
+        )
+        # the request is sent once the listing is iterated
+        artifacts = frozenset(b.name for b in blobs)
+        fetch.report_latency(time.monotonic() - start)
+        logger.debug("%s artifacts found in %s", len(artifacts), base_path)
+
+        with self._lock:
+            self._listings[base_path] = artifacts
+            if len(self._listings) > self._CACHE_SIZE:
+                self._listings.popitem(last=False)
+        return artifacts
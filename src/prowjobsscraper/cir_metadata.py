@@ -1,10 +1,13 @@
 import logging
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Final, Optional
 
 from google.cloud import exceptions, storage  # type: ignore
 
-from providers.provider import get_provider_by_id
-from prowjobsscraper import utils
+from providers.common import Provider, ProviderMetadata
+from providers.provider import SUPPORTED_PROVIDERS, get_provider_by_id
+from prowjobsscraper import artifacts, fetch, utils
 from prowjobsscraper.prowjob import (
     CIResourceMetadata,
     ProwJob,
@@ -21,13 +24,93 @@ class CIResourceMetadataExtractor:
     )
     _PACKET: Final[str] = "packet"
 
-    def __init__(self, client: storage.Client, gcs_bucket_name: str):
+    def __init__(
+        self,
+        client: storage.Client,
+        gcs_bucket_name: str,
+        fetcher: Optional[fetch.Fetcher] = None,
+        discovery: Optional[artifacts.ArtifactDiscovery] = None,
+        prefetch: bool = False,
+    ):
+        """
+        When prefetch is set, the provider metadata of the jobs are fetched
+        in bulk concurrently with their CIR metadata, before their provider is
+        known: for every supported provider, or only for the providers whose
+        metadata were listed when discovery is set.
+        """
         self._client = client
         self._gcs_bucket_name = gcs_bucket_name
+        self._fetcher = fetcher or fetch.Fetcher()
+        self._discovery = discovery
+        self._prefetch_executor: Optional[ThreadPoolExecutor] = None
+        if prefetch:
+            self._prefetch_executor = ThreadPoolExecutor(
+                # one bulk fetch per provider, their fetches share the
+                # concurrency of the fetcher
+                max_workers=len(SUPPORTED_PROVIDERS),
+                thread_name_prefix="prefetch",
+            )
+
+    def close(self) -> None:
+        """
+        Stop the threads prefetching the provider metadata.
+        """
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(cancel_futures=True)
+            self._prefetch_executor = None
 
     def hydrate(self, jobs: ProwJobs) -> None:
-        for job in jobs.items:
-            self._set_cir_metadata(job)
+        # resolve the provider of every job first, then the provider metadata
+        # of the jobs of each provider in bulk, unless they were prefetched
+        prefetched = self._prefetch_provider_metadata(jobs.items)
+        try:
+            providers: dict[str, Provider] = {}
+            jobs_by_provider: dict[str, list[tuple[ProwJob, CIResourceMetadata]]] = (
+                defaultdict(list)
+            )
+            for index, (job, resolved) in enumerate(
+                zip(jobs.items, self._fetcher.map(self._resolve_provider, jobs.items))
+            ):
+                if resolved is None:
+                    continue
+                cir_metadata, provider = resolved
+                if provider.id in prefetched:
+                    self._set_provider_metadata(
+                        job,
+                        cir_metadata,
+                        provider,
+                        prefetched[provider.id].result().get(index),
+                    )
+                    continue
+                if self._discovery is not None and not self._discovery.has_artifact(
+                    job, provider.get_metadata_path(job)
+                ):
+                    logger.debug(
+                        "No provider metadata found for job %s with %s provider",
+                        job,
+                        provider.id,
+                    )
+                    continue
+                providers[provider.id] = provider
+                jobs_by_provider[provider.id].append((job, cir_metadata))
+        finally:
+            for future in prefetched.values():
+                future.cancel()
+
+        for provider_id, provider_jobs in jobs_by_provider.items():
+            provider = providers[provider_id]
+            all_provider_metadata = provider.get_provider_metadata_batch(
+                [job for job, _ in provider_jobs],
+                gcs_client=self._client,
+                gcs_bucket_name=self._gcs_bucket_name,
+                fetcher=self._fetcher,
+            )
+            for (job, cir_metadata), provider_metadata in zip(
+                provider_jobs, all_provider_metadata
+            ):
+                self._set_provider_metadata(
+                    job, cir_metadata, provider, provider_metadata
+                )
 
     def _get_metadata(self, path: str) -> Optional[str]:
         try:
@@ -45,6 +128,12 @@ class CIResourceMetadataExtractor:
         self, base_path: str, job: ProwJob
     ) -> Optional[CIResourceMetadata]:
         metadata_path = self._CIR_METADATA_PATH_TEMPLATE.format(base_path, job.context)
+        if self._discovery is not None and not self._discovery.has_artifact(
+            job, metadata_path
+        ):
+            logger.info("No metadata found for job %s", job)
+            return None
+
         raw_metadata = self._get_metadata(metadata_path)
 
         if not raw_metadata:
@@ -68,21 +157,102 @@ class CIResourceMetadataExtractor:
             and self._PACKET in job.metadata.labels.cloudClusterProfile
         )
 
+    def _get_provider_metadata(
+        self, provider: Provider, job: ProwJob
+    ) -> Optional[ProviderMetadata]:
+        if self._discovery is not None and not self._discovery.has_artifact(
+            job, provider.get_metadata_path(job)
+        ):
+            return None
+
+        return provider.get_provider_metadata_from_prowjob(
+            prowjob=job,
+            gcs_client=self._client,
+            gcs_bucket_name=self._gcs_bucket_name,
+        )
+
+    def _prefetch_provider_metadata(
+        self, jobs: list[ProwJob]
+    ) -> dict[str, Future[dict[int, Optional[ProviderMetadata]]]]:
+        """
+        Start fetching in bulk, for every supported provider, the provider
+        metadata of the jobs, keyed by the index of the job.
+        """
+        if self._prefetch_executor is None:
+            return {}
+
+        # only the packet jobs have provider metadata, the artifacts of the
+        # other jobs are neither listed nor fetched
+        packet_jobs = [
+            (index, job)
+            for index, job in enumerate(jobs)
+            if self._should_job_have_metadata(job)
+        ]
+        if not packet_jobs:
+            return {}
+
+        if self._discovery is not None:
+            # list the artifacts of each job once, before its CIR and provider
+            # metadata are fetched concurrently out of the listing
+            self._fetcher.map(self._discovery.discover, [job for _, job in packet_jobs])
+
+        return {
+            p.id: self._prefetch_executor.submit(
+                self._get_provider_metadata_batch, p, packet_jobs
+            )
+            for p in SUPPORTED_PROVIDERS
+        }
+
+    def _get_provider_metadata_batch(
+        self, provider: Provider, jobs: list[tuple[int, ProwJob]]
+    ) -> dict[int, Optional[ProviderMetadata]]:
+        if self._discovery is not None:
+            # the jobs whose artifacts could not be listed are fetched
+            jobs = [
+                (index, job)
+                for index, job in jobs
+                if self._discovery.has_listed_artifact(
+                    job, provider.get_metadata_path(job)
+                )
+                is not False
+            ]
+
+        all_provider_metadata = provider.get_provider_metadata_batch(
+            [job for _, job in jobs],
+            gcs_client=self._client,
+            gcs_bucket_name=self._gcs_bucket_name,
+            fetcher=self._fetcher,
+        )
+        return {
+            index: provider_metadata
+            for (index, _), provider_metadata in zip(jobs, all_provider_metadata)
+        }
+
     def _set_cir_metadata(self, job: ProwJob) -> None:
+        if (resolved := self._resolve_provider(job)) is None:
+            return
+
+        cir_metadata, provider = resolved
+        self._set_provider_metadata(
+            job, cir_metadata, provider, self._get_provider_metadata(provider, job)
+        )
+
+    def _resolve_provider(
+        self, job: ProwJob
+    ) -> Optional[tuple[CIResourceMetadata, Provider]]:
         if not self._should_job_have_metadata(job=job):
             logger.debug(
                 "Job %s is not a packet job, skipping CIR metadata collection", job
             )
-            return
+            return None
 
-        base_path = utils.get_gcs_base_path_from_job_url(job.status.url)
-        if (cir_metadata := self._get_cir_metadata(base_path, job)) is None:
+        if (cir_metadata := self._get_cir_metadata(job.gcs_base_path, job)) is None:
             logger.debug("No CIR metadata found for job %s", job)
-            return
+            return None
 
         if not cir_metadata.provider:
             logger.debug("No provider found in CIR metadata for job %s", job)
-            return
+            return None
 
         if cir_metadata.provider == "ibmcloud":
             cir_metadata.provider = "ibm-classic"
@@ -93,15 +263,18 @@ class CIResourceMetadataExtractor:
                 cir_metadata.provider,
                 job,
             )
-            return
+            return None
 
-        if (
-            provider_metadata := provider.get_provider_metadata_from_prowjob(
-                prowjob=job,
-                gcs_client=self._client,
-                gcs_bucket_name=self._gcs_bucket_name,
-            )
-        ) is None:
+        return cir_metadata, provider
+
+    def _set_provider_metadata(
+        self,
+        job: ProwJob,
+        cir_metadata: CIResourceMetadata,
+        provider: Provider,
+        provider_metadata: Optional[ProviderMetadata],
+    ) -> None:
+        if provider_metadata is None:
             logger.debug(
                 "No provider metadata found for job %s with %s provider",
                 job,
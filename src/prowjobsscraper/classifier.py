@@ -0,0 +1,62 @@
+import enum
+import functools
+import json
+import re
+from typing import Final, Mapping, Optional
+
+
+class JobClass(enum.IntFlag):
+    """
+    JobClass is a bitset of the classes a job belongs to, based on its name.
+    """
+
+    NONE = 0
+    ASSISTED = enum.auto()
+    FAST_FORWARD = enum.auto()
+    REHEARSAL = enum.auto()
+    E2E = enum.auto()
+    SUBSYSTEM = enum.auto()
+
+
+# Regular expressions searched in job names, per class
+DEFAULT_RULES: Final[dict[str, str]] = {
+    JobClass.ASSISTED.name: "openshift.*assisted",
+    JobClass.FAST_FORWARD.name: "openshift-release-fast-forward",
+    JobClass.REHEARSAL.name: "rehearse",
+    JobClass.E2E.name: "e2e",
+    JobClass.SUBSYSTEM.name: "subsystem",
+}
+
+# Job names repeat heavily between runs, a few thousands of them cover
+# every job of interest
+_CACHE_SIZE: Final[int] = 8192
+
+
+class JobClassifier:
+    """
+    JobClassifier classifies jobs by name with precompiled rules in a single
+    pass, results are memoized by job name.
+    """
+
+    def __init__(self, rules: Mapping[str, str] = DEFAULT_RULES):
+        self._rules = [
+            (JobClass[name], re.compile(pattern)) for name, pattern in rules.items()
+        ]
+        self.classify = functools.lru_cache(maxsize=_CACHE_SIZE)(self._classify)
+
+    @classmethod
+    def create_from_json(cls, raw_rules: Optional[str]) -> "JobClassifier":
+        """
+        Create a classifier from a JSON object mapping class names to
+        regular expressions, overriding the default rules.
+        """
+        if not raw_rules:
+            return cls()
+        return cls({**DEFAULT_RULES, **json.loads(raw_rules)})
+
+    def _classify(self, job_name: str) -> JobClass:
+        job_class = JobClass.NONE
+        for rule_class, pattern in self._rules:
+            if pattern.search(job_name):
+                job_class |= rule_class
+        return job_class
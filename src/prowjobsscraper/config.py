@@ -11,3 +11,29 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 EQUINIX_PROJECT_ID = os.environ["EQUINIX_PROJECT_ID"]
 EQUINIX_PROJECT_TOKEN = os.environ["EQUINIX_PROJECT_TOKEN"]
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "test-platform-results")
+GCS_FETCH_CONCURRENCY = int(os.getenv("GCS_FETCH_CONCURRENCY", "8"))
+GCS_FETCH_MAX_CONCURRENCY = int(os.getenv("GCS_FETCH_MAX_CONCURRENCY", "32"))
+GCS_ARTIFACT_DISCOVERY = os.getenv("GCS_ARTIFACT_DISCOVERY", "true")
+CIR_METADATA_PREFETCH = os.getenv("CIR_METADATA_PREFETCH", "true")
+JUNIT_MAX_SIZE_BYTES = int(os.getenv("JUNIT_MAX_SIZE_BYTES", "16777216"))
+JUNIT_PARSE_WORKERS = int(os.getenv("JUNIT_PARSE_WORKERS", "1"))
+GCS_CACHE_DIR = os.getenv("GCS_CACHE_DIR")
+GCS_CACHE_MAX_SIZE_BYTES = int(os.getenv("GCS_CACHE_MAX_SIZE_BYTES", "1073741824"))
+GCS_CACHE_MISSING_TTL_SECONDS = int(os.getenv("GCS_CACHE_MISSING_TTL_SECONDS", "21600"))
+JOB_LIST_STREAMING = os.getenv("JOB_LIST_STREAMING", "true")
+JOB_LIST_SNAPSHOT_DIR = os.getenv("JOB_LIST_SNAPSHOT_DIR")
+DAEMON_POLL_INTERVAL_SECONDS = int(os.getenv("DAEMON_POLL_INTERVAL_SECONDS", "60"))
+DAEMON_USAGES_INTERVAL_SECONDS = int(
+    os.getenv("DAEMON_USAGES_INTERVAL_SECONDS", "3600")
+)
+DAEMON_RESYNC_INTERVAL_SECONDS = int(
+    os.getenv("DAEMON_RESYNC_INTERVAL_SECONDS", "86400")
+)
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+# defaults to the pod index of an Indexed Job
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", os.getenv("JOB_COMPLETION_INDEX", "0")))
+SHARD_LEASE_TTL_SECONDS = int(os.getenv("SHARD_LEASE_TTL_SECONDS", "3600"))
+SCRAPE_BATCH_SIZE = int(os.getenv("SCRAPE_BATCH_SIZE", "100"))
+SCRAPE_INDEX_QUEUE_SIZE = int(os.getenv("SCRAPE_INDEX_QUEUE_SIZE", "2"))
+SLIM_STEP_EVENTS = os.getenv("SLIM_STEP_EVENTS", "false")
+JOB_CLASSIFIER_RULES = os.getenv("JOB_CLASSIFIER_RULES")
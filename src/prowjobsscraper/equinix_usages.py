@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime
-from typing import Any, Final, Optional
+from typing import Any, Final, NamedTuple, Optional
 
 import requests
 from pydantic import BaseModel
@@ -8,23 +8,10 @@ from pydantic import BaseModel
 logger = logging.getLogger(__name__)
 
 
-class EquinixUsageIdentifier(BaseModel):
+class EquinixUsageIdentifier(NamedTuple):
     name: str
     plan: str
 
-    def __hash__(self) -> int:
-        return hash((self.name, self.plan))
-
-    def __eq__(self, other: Any) -> bool:
-        return (
-            isinstance(other, self.__class__)
-            and self.name == other.name
-            and self.plan == self.plan
-        )
-
-    def __ne__(self, other: Any) -> bool:
-        return not self.__eq__(other)
-
 
 class EquinixUsage(BaseModel):
     description: Optional[str]
@@ -88,10 +75,29 @@ class EquinixUsagesExtractor:
         self._start_time = start_time
         self._end_time = end_time
 
+    @property
+    def start_time(self) -> datetime:
+        return self._start_time
+
+    @property
+    def end_time(self) -> datetime:
+        return self._end_time
+
+    def set_time_window(self, start_time: datetime, end_time: datetime) -> None:
+        self._start_time = start_time
+        self._end_time = end_time
+
     def get_project_usages(
         self,
     ) -> list[EquinixUsage]:
-        equinix_project_usages = requests.get(
+        equinix_project_usages = self._fetch_raw_usages()
+        logger.info("%s usages retrieved successfully", len(equinix_project_usages))
+        return self._process_usages(
+            [EquinixUsage.parse_obj(usage) for usage in equinix_project_usages]
+        )
+
+    def _fetch_raw_usages(self) -> list[dict[str, Any]]:
+        return requests.get(
             url=self._EQUINIX_METAL_ENDPOINT.format(
                 self._project_id,
                 self._start_time.strftime(self._USAGES_TIME_FORMAT),
@@ -99,10 +105,6 @@ class EquinixUsagesExtractor:
             ),
             headers={self._EQUINIX_ENDPOINT_HEADER: self._project_token},
         ).json()["usages"]
-        logger.info("%s usages retrieved successfully", len(equinix_project_usages))
-        return self._process_usages(
-            [EquinixUsage.parse_obj(usage) for usage in equinix_project_usages]
-        )
 
     def _is_usage_in_interval(self, usage: EquinixUsage) -> bool:
         """Usage is considered to be within the time interval
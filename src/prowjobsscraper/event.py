@@ -1,5 +1,6 @@
+import hashlib
 from datetime import datetime, timedelta
-from typing import Any, Iterator, Optional
+from typing import Any, Final, Iterable, Iterator, Optional
 
 import pkg_resources
 from opensearchpy import OpenSearch, helpers
@@ -11,7 +12,7 @@ from prowjobsscraper.equinix_usages import (
     EquinixUsageIdentifier,
 )
 from prowjobsscraper.prowjob import CIResourceMetadata, ProwJob
-from prowjobsscraper.step import JobStep
+from prowjobsscraper.step import JobStep, get_failure_signature
 from prowjobsscraper.utils import generate_hash_from_strings
 
 
@@ -38,6 +39,8 @@ class JobDetails(BaseModel):
     context: Optional[str]
     duration: int
     ci_resource_metadata: Optional[CIResourceMetadata]
+    # the steps of the job are missing, its junit file was too large
+    junit_truncated: bool = False
     name: str
     refs: JobRefs
     start_time: Optional[datetime]
@@ -64,6 +67,7 @@ class JobEvent(BaseModel):
                 context=job.context,
                 duration=job_duration.seconds,
                 ci_resource_metadata=job.cirMetadata,
+                junit_truncated=job.junitTruncated,
                 name=job.spec.job,
                 refs=JobRefs.create_from_prow_job(job),
                 start_time=job.status.startTime,
@@ -75,53 +79,177 @@ class JobEvent(BaseModel):
         )
 
 
+# failure details are kept in full in the failure details index, steps only
+# embed their beginning
+_DETAILS_PREVIEW_LENGTH: Final[int] = 1024
+
+
+def get_details_hash(details: str) -> str:
+    return hashlib.sha256(details.encode()).hexdigest()
+
+
 class StepDetails(BaseModel):
     details: Optional[str]
+    details_hash: Optional[str]
     duration: int
+    failure_signature: Optional[str]
     name: str
     state: str
 
+    @classmethod
+    def create_from_job_step(cls, step: JobStep) -> "StepDetails":
+        details, details_hash, failure_signature = None, None, None
+        if step.details is not None:
+            details = step.details[:_DETAILS_PREVIEW_LENGTH]
+            details_hash = get_details_hash(step.details)
+            failure_signature = get_failure_signature(step.details)
+        return cls(
+            details=details,
+            details_hash=details_hash,
+            failure_signature=failure_signature,
+            duration=step.duration.seconds,
+            name=step.name,
+            state=step.state,
+        )
+
+
+class FailureDetails(BaseModel):
+    hash: str
+    details: str
+
 
 class StepEvent(BaseModel):
     job: JobDetails
     step: StepDetails
 
     @classmethod
-    def create_from_job_step(cls, step: JobStep) -> "StepEvent":
+    def create_from_job_step(
+        cls, step: JobStep, job_details: Optional[JobDetails] = None
+    ) -> "StepEvent":
+        if job_details is None:
+            job_details = JobEvent.create_from_prow_job(step.job).job
+        return cls(job=job_details, step=StepDetails.create_from_job_step(step))
+
+
+class StepJobDetails(BaseModel):
+    """
+    The job fields embedded in slim step documents: the build id joining them
+    back to the jobs index, and the fields the steps are filtered on.
+    """
+
+    build_id: Optional[str]
+    name: str
+    start_time: Optional[datetime]
+    type: str
+
+    @classmethod
+    def create_from_prow_job(cls, job: ProwJob) -> "StepJobDetails":
+        return cls(
+            build_id=job.status.build_id,
+            name=job.spec.job,
+            start_time=job.status.startTime,
+            type=job.spec.type,
+        )
+
+
+class SlimStepEvent(BaseModel):
+    job: StepJobDetails
+    step: StepDetails
+
+    @classmethod
+    def create_from_job_step(cls, step: JobStep) -> "SlimStepEvent":
         return cls(
-            job=JobEvent.create_from_prow_job(step.job).job,
-            step=StepDetails(
-                details=step.details,
-                duration=step.duration.seconds,
-                name=step.name,
-                state=step.state,
-            ),
+            job=StepJobDetails.create_from_prow_job(step.job),
+            step=StepDetails.create_from_job_step(step),
         )
 
 
 class EventStoreElastic:
     def __init__(
-        self, client, job_index_basename, step_index_basename, usage_index_basename
+        self,
+        client,
+        job_index_basename,
+        step_index_basename,
+        usage_index_basename,
+        slim_steps=False,
     ):
+        """
+        When slim_steps is set, the steps only embed the job fields of
+        StepJobDetails instead of the full job details, which are joined back
+        from the jobs index by build id when needed. They are stored in their
+        own indices, the mappings of both kinds of steps differ.
+        """
         self._jobs_index = _EsIndex(client, job_index_basename)
-        self._steps_index = _EsIndex(client, step_index_basename)
+        self._slim_steps = slim_steps
+        if slim_steps:
+            self._steps_index = _EsIndex(
+                client, f"{step_index_basename}_slim", schema_name="slim_steps"
+            )
+        else:
+            self._steps_index = _EsIndex(client, step_index_basename)
+        self._failure_details_index = _EsIndex(
+            client,
+            f"{step_index_basename}_failure_details",
+            schema_name="failure_details",
+        )
         self._usages_index = _EsIndex(client, usage_index_basename)
+        self._build_ids_index = _EsBuildIdsIndex(
+            client, f"{job_index_basename}_build_ids"
+        )
 
     def index_job_steps(self, steps: list[JobStep]):
+        # All the steps of a job embed the same job details: build and
+        # serialize them once per job rather than once per step.
+        jobs_details: dict[Optional[str], dict] = {}
+        # the details of a failure are hashed once, for both its step and the
+        # failure details index
+        steps_details = [StepDetails.create_from_job_step(s) for s in steps]
+
+        def _create_step_event(step: JobStep, step_details: StepDetails) -> dict:
+            build_id = step.job.status.build_id
+            if build_id not in jobs_details:
+                job_details: BaseModel = (
+                    StepJobDetails.create_from_prow_job(step.job)
+                    if self._slim_steps
+                    else JobEvent.create_from_prow_job(step.job).job
+                )
+                jobs_details[build_id] = job_details.dict()
+            return {
+                "job": jobs_details[build_id],
+                "step": step_details.dict(),
+            }
+
         step_events = (
             (
-                StepEvent.create_from_job_step(s).dict(),
+                _create_step_event(s, d),
                 generate_hash_from_strings(s.job.status.build_id, s.name),
             )
-            for s in steps
+            for s, d in zip(steps, steps_details)
         )
         self._steps_index.index(step_events)
 
+        # identical failure details are shared by many steps, store them once
+        failures_details = {
+            d.details_hash: s.details
+            for s, d in zip(steps, steps_details)
+            if s.details is not None and d.details_hash is not None
+        }
+        if failures_details:
+            self._failure_details_index.index(
+                ({"failure": FailureDetails(hash=h, details=d).dict()}, h)
+                for h, d in failures_details.items()
+            )
+
     def index_prow_jobs(self, jobs: list[ProwJob]):
         job_events = (
             (JobEvent.create_from_prow_job(j).dict(), j.status.build_id) for j in jobs
         )
         self._jobs_index.index(job_events)
+        self._build_ids_index.index(
+            ({"build_id": j.status.build_id}, j.status.build_id)
+            for j in jobs
+            if j.status.build_id
+        )
 
     def index_equinix_usages(self, usages: list[EquinixUsage]):
         equinix_usages = (
@@ -133,37 +261,152 @@ class EventStoreElastic:
         )
         self._usages_index.index(equinix_usages)
 
-    def scan_build_ids(self) -> set[str]:
-        results = self._jobs_index.scan({"_source": ["job.build_id"]})
-        return {r["_source"]["job"]["build_id"] for r in results}
-
-    def scan_usages_identifiers(self) -> set[EquinixUsageIdentifier]:
-        results = self._usages_index.scan({"query": {"match_all": {}}})
+    def get_known_build_ids(self, build_ids: Iterable[str]) -> set[str]:
+        """
+        Return the build ids, among the given ones, of the jobs already stored.
+        """
+        candidates = sorted(set(build_ids))
+        known_build_ids = self._build_ids_index.lookup(candidates)
+
+        # jobs stored before the build ids index existed are only found in
+        # the jobs indices, register them for the next lookups
+        unregistered_build_ids = [b for b in candidates if b not in known_build_ids]
+        if unregistered_build_ids:
+            stored_build_ids = self._search_jobs_build_ids(unregistered_build_ids)
+            if stored_build_ids:
+                self._build_ids_index.index(
+                    ({"build_id": b}, b) for b in sorted(stored_build_ids)
+                )
+                known_build_ids |= stored_build_ids
+
+        return known_build_ids
+
+    def _search_jobs_build_ids(self, build_ids: list[str]) -> set[str]:
+        # the job list only holds recent jobs, they can only be stored in the
+        # jobs indices of the current and previous weeks
+        found: set[str] = set()
+        for batch in _batched(build_ids, _LOOKUP_BATCH_SIZE):
+            results = self._jobs_index.scan(
+                {
+                    "_source": ["job.build_id"],
+                    "query": {"terms": {"job.build_id": batch}},
+                }
+            )
+            found.update(r["_source"]["job"]["build_id"] for r in results)
+        return found
+
+    def scan_usages_identifiers(
+        self, start_time: datetime, end_time: datetime
+    ) -> set[EquinixUsageIdentifier]:
+        """
+        Return the identifiers of the stored usages overlapping the given time
+        window, which contains the usages fetched from Equinix.
+        """
+        results = self._usages_index.scan_all(
+            {
+                "_source": ["usage.name", "usage.plan"],
+                "query": {
+                    "bool": {
+                        "filter": [
+                            {"range": {"usage.start_date": {"lte": end_time}}},
+                            {"range": {"usage.end_date": {"gte": start_time}}},
+                        ]
+                    }
+                },
+            }
+        )
         return {
             EquinixUsageIdentifier(
-                name=r["_source"]["usage"]["name"], plan=r["_source"]["usage"]["plan"]
+                r["_source"]["usage"]["name"], r["_source"]["usage"]["plan"]
             )
             for r in results
         }
 
 
-class _EsIndex:
-    def __init__(self, client: OpenSearch, index_prefix: str):
+_LOOKUP_BATCH_SIZE: Final[int] = 1000
+
+
+def _batched(items: list[str], size: int) -> Iterator[list[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class _EsBuildIdsIndex:
+    """
+    Index holding one document per stored job, with the build id as document
+    id, so that known jobs are looked up by id instead of scanned.
+    """
+
+    def __init__(self, client: OpenSearch, index_name: str):
         self._client = client
+        self._index_name = index_name
 
+        if not self._client.indices.exists(index=self._index_name):
+            self._client.indices.create(
+                index=self._index_name,
+                body=pkg_resources.resource_string(
+                    __name__, "indices/build_ids_schema.json"
+                ),
+            )
+
+    def index(self, data: Iterator[tuple[dict[str, Any], str]]) -> None:
+        helpers.bulk(
+            self._client,
+            (
+                {
+                    "_index": self._index_name,
+                    "_op_type": "index",
+                    "_id": id,
+                    "_source": d,
+                }
+                for d, id in data
+            ),
+        )
+
+    def lookup(self, build_ids: list[str]) -> set[str]:
+        found: set[str] = set()
+        for batch in _batched(build_ids, _LOOKUP_BATCH_SIZE):
+            res = self._client.mget(
+                index=self._index_name, body={"ids": batch}, _source=False
+            )
+            found.update(d["_id"] for d in res["docs"] if d.get("found"))
+        return found
+
+
+class _EsIndex:
+    def __init__(
+        self, client: OpenSearch, index_prefix: str, schema_name: Optional[str] = None
+    ):
+        self._client = client
+        self._index_prefix = index_prefix
+        self._index_schema = pkg_resources.resource_string(
+            __name__, f"indices/{schema_name or index_prefix}_schema.json"
+        )
+        self._index_name = ""
+        self._previous_index_name = ""
+        self._roll_over()
+
+    def _roll_over(self) -> None:
+        """
+        Point to the index of the current week, creating it if needed.
+        Long-running processes call this before each operation so that they
+        follow the weekly indices.
+        """
         # Let's create one index per week
         now = datetime.now()
-        self._index_name = self._format_index_name(index_prefix, now)
+        index_name = self._format_index_name(self._index_prefix, now)
+        if index_name == self._index_name:
+            return
 
+        self._index_name = index_name
         a_week_ago = now - timedelta(weeks=1)
-        self._previous_index_name = self._format_index_name(index_prefix, a_week_ago)
+        self._previous_index_name = self._format_index_name(
+            self._index_prefix, a_week_ago
+        )
 
         # apply the index template
-        index_schema = pkg_resources.resource_string(
-            __name__, f"indices/{index_prefix}_schema.json"
-        )
         if not self._client.indices.exists(index=self._index_name):
-            self._client.indices.create(index=self._index_name, body=index_schema)
+            self._client.indices.create(index=self._index_name, body=self._index_schema)
 
     @staticmethod
     def _format_index_name(prefix: str, date: datetime) -> str:
@@ -184,14 +427,27 @@ class _EsIndex:
             }
 
     def index(self, data: Iterator[tuple[dict[str, Any], str]]) -> None:
+        self._roll_over()
         helpers.bulk(self._client, self._gen_documents(data))
 
         self._client.indices.refresh(index=self._index_name)
 
-    def scan(self, query: str) -> Iterator[Any]:
+    def scan(self, query: dict[str, Any]) -> Iterator[Any]:
+        self._roll_over()
         return helpers.scan(
             self._client,
             index=f"{self._index_name},{self._previous_index_name}",
             ignore_unavailable=True,
             query=query,
         )
+
+    def scan_all(self, query: dict[str, Any]) -> Iterator[Any]:
+        """
+        Same as scan, over all the weekly indices instead of the last two.
+        """
+        return helpers.scan(
+            self._client,
+            index=f"{self._index_prefix}-*",
+            ignore_unavailable=True,
+            query=query,
+        )
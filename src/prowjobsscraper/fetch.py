@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Final, Iterable, Optional, TypeVar
+
+from google.api_core import exceptions  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# errors returned by GCS when it throttles the client
+THROTTLING_ERRORS: Final = (exceptions.TooManyRequests, exceptions.ServiceUnavailable)
+
+_local = threading.local()
+
+
+def report_latency(latency: float) -> None:
+    """
+    Report, from a fetch, the latency of a GCS request it completed: a fetch
+    may issue several requests, or none when its artifacts are known to be
+    missing, so the requests rather than the fetches are measured.
+    """
+    if (controller := getattr(_local, "controller", None)) is not None:
+        controller.on_success(latency)
+
+
+def report_throttling() -> None:
+    """
+    Report, from a fetch, that GCS throttled one of its requests: the fetches
+    usually handle the errors of their item, so the fetcher running them could
+    not notice it.
+    """
+    if (controller := getattr(_local, "controller", None)) is not None:
+        controller.on_throttling()
+
+
+class _AimdController:
+    """
+    _AimdController sets the concurrency of the fetches with an additive
+    increase, multiplicative decrease policy: the concurrency grows by one
+    every time as many GCS requests as the current concurrency succeed, and
+    is halved when GCS throttles a request or when the average latency of
+    the requests rises above twice its baseline (and above 50ms: requests
+    answered from the local cache are faster). Once decreased, the
+    concurrency is not decreased again before as many requests complete, so
+    that the requests already started with the former concurrency do not
+    decrease it further.
+
+    The baseline is the lowest average latency, it is reset for every batch
+    of fetches and drifts towards the average latency while the latency stays
+    elevated: a sustained change of latency becomes the new baseline instead
+    of keeping the concurrency down.
+    """
+
+    _LATENCY_FACTOR: Final[float] = 2.0
+    _LATENCY_SMOOTHING: Final[float] = 0.2
+    _BASELINE_DRIFT: Final[float] = 0.05
+    _MIN_RISEN_LATENCY: Final[float] = 0.05
+
+    def __init__(self, initial: int, maximum: int):
+        self._lock = threading.Lock()
+        self._limit = initial
+        self._maximum = maximum
+        self._completed_since_change = 0
+        self._holdoff = 0
+        self._latency: Optional[float] = None
+        self._baseline_latency: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def reset_latency(self) -> None:
+        """
+        Forget the latencies measured so far, the concurrency is kept.
+        """
+        with self._lock:
+            self._latency = None
+            self._baseline_latency = None
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency += self._LATENCY_SMOOTHING * (latency - self._latency)
+            if self._baseline_latency is None or self._latency < self._baseline_latency:
+                self._baseline_latency = self._latency
+            else:
+                self._baseline_latency += self._BASELINE_DRIFT * (
+                    self._latency - self._baseline_latency
+                )
+
+            self._holdoff = max(0, self._holdoff - 1)
+            if self._latency > max(
+                self._LATENCY_FACTOR * self._baseline_latency, self._MIN_RISEN_LATENCY
+            ):
+                self._decrease("latency rose to %.3fs" % self._latency)
+
+            self._completed_since_change += 1
+            if self._completed_since_change >= self._limit:
+                self._completed_since_change = 0
+                if self._limit < self._maximum:
+                    self._limit += 1
+                    logger.debug("Fetch concurrency increased to %s", self._limit)
+
+    def on_throttling(self) -> None:
+        with self._lock:
+            self._decrease("GCS throttled a request")
+
+    def _decrease(self, reason: str) -> None:
+        if self._holdoff > 0:
+            return
+
+        self._limit = max(1, self._limit // 2)
+        self._completed_since_change = 0
+        self._holdoff = self._limit
+        logger.info("Fetch concurrency decreased to %s: %s", self._limit, reason)
+
+
+class Fetcher:
+    """
+    Fetcher runs blocking fetches, such as GCS downloads, on a bounded pool of
+    threads. Network latency rather than CPU dominates these fetches, so
+    running them concurrently shortens the runs with many jobs.
+
+    When max_concurrency is above concurrency, the concurrency adapts: it
+    starts at concurrency and grows up to max_concurrency while the fetches
+    stay healthy, and backs off when GCS throttles them or they slow down.
+
+    The maps running at the same time from several threads share the
+    concurrency: it bounds the fetches of the fetcher, not of each map. A
+    fetch must not call map on its own fetcher, it would wait for itself.
+    """
+
+    def __init__(self, concurrency: int = 1, max_concurrency: Optional[int] = None):
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be positive, got {concurrency}")
+        max_concurrency = max_concurrency or concurrency
+        if max_concurrency < concurrency:
+            raise ValueError(
+                f"max_concurrency {max_concurrency} is below concurrency {concurrency}"
+            )
+        self._concurrency = concurrency
+        self._max_concurrency = max_concurrency
+        self._controller: Optional[_AimdController] = None
+        if max_concurrency > concurrency:
+            self._controller = _AimdController(concurrency, max_concurrency)
+        self._slots = threading.Condition()
+        self._in_flight = 0
+        self._running_maps = 0
+
+    @property
+    def concurrency(self) -> int:
+        """
+        The current concurrency of the fetches.
+        """
+        if self._controller is not None:
+            return self._controller.limit
+        return self._concurrency
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> list[R]:
+        """
+        Apply fn to every item, at most concurrency at a time, and return the
+        results in the order of the items. fn is expected to handle the
+        errors of a single item, any exception raised is propagated.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        start = time.monotonic()
+        with self._slots:
+            if self._controller is not None and self._running_maps == 0:
+                # the items of a batch differ from the former ones (e.g. junit
+                # files after metadata files), so do their latencies
+                self._controller.reset_latency()
+            self._running_maps += 1
+        try:
+            results = self._map(fn, items)
+        finally:
+            with self._slots:
+                self._running_maps -= 1
+
+        elapsed = time.monotonic() - start
+        logger.info(
+            "Fetched %s items in %.1fs (%.1f items/s), concurrency: %s",
+            len(items),
+            elapsed,
+            len(items) / elapsed if elapsed > 0 else float("inf"),
+            self.concurrency,
+        )
+        return results
+
+    def _map(self, fn: Callable[[T], R], items: list[T]) -> list[R]:
+        def run(item: T) -> R:
+            # the GCS requests of fn report to the controller
+            _local.controller = self._controller
+            try:
+                return fn(item)
+            finally:
+                _local.controller = None
+                self._release_slot()
+
+        if self._max_concurrency == 1 or len(items) == 1:
+            inline_results = []
+            for item in items:
+                self._acquire_slot()
+                inline_results.append(run(item))
+            return inline_results
+
+        results: list[R] = [None] * len(items)  # type: ignore[list-item]
+        pending: dict[Future[R], int] = {}
+        with ThreadPoolExecutor(
+            max_workers=min(self._max_concurrency, len(items)),
+            thread_name_prefix="fetch",
+        ) as executor:
+            for index, item in enumerate(items):
+                self._acquire_slot()
+                pending[executor.submit(run, item)] = index
+                # collect the completed fetches, their errors stop the map
+                for future in [f for f in pending if f.done()]:
+                    results[pending.pop(future)] = future.result()
+
+            for future, index in pending.items():
+                results[index] = future.result()
+
+        return results
+
+    def _acquire_slot(self) -> None:
+        with self._slots:
+            # the concurrency may have decreased below the fetches in flight
+            while self._in_flight >= self.concurrency:
+                self._slots.wait()
+            self._in_flight += 1
+
+    def _release_slot(self) -> None:
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Final, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CachedArtifact(NamedTuple):
+    data: bytes
+    generation: Optional[int]
+
+
+class GcsCache:
+    """
+    GcsCache keeps the GCS artifacts downloaded by the scraper in a local
+    directory, so that re-runs, backfills and restarts after a crash do not
+    download them again. A cached artifact is returned along with the
+    generation of the object it was downloaded from, so that callers only
+    download it again when the object was overwritten since.
+
+    Contents are stored once per digest and indexed by bucket, path and object
+    generation in a SQLite database, along with a ledger of the paths known to
+    be missing which expire after missing_ttl seconds. The total size of the
+    contents is bounded by max_size bytes, the least recently used artifacts are
+    evicted first.
+    """
+
+    _INDEX_FILENAME: Final[str] = "index.sqlite"
+    _OBJECTS_DIRNAME: Final[str] = "objects"
+
+    def __init__(self, directory: str, max_size: int, missing_ttl: float):
+        self._directory = pathlib.Path(directory)
+        self._objects_dir = self._directory / self._OBJECTS_DIRNAME
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        self._max_size = max_size
+        self._missing_ttl = missing_ttl
+
+        # the cache is shared by the fetch threads
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self._directory / self._INDEX_FILENAME, check_same_thread=False
+        )
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " bucket TEXT, path TEXT, generation INTEGER, digest TEXT,"
+                " size INTEGER, accessed_at REAL, PRIMARY KEY (bucket, path))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS missing ("
+                " bucket TEXT, path TEXT, recorded_at REAL,"
+                " PRIMARY KEY (bucket, path))"
+            )
+            # contents are looked up by digest on every put and eviction
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)"
+            )
+            # size of the stored contents, kept up to date by put and _evict
+            self._size = self._get_size()
+
+    def get(
+        self, bucket: str, path: str, generation: Optional[int] = None
+    ) -> Optional[CachedArtifact]:
+        """
+        Return the cached artifact at path, when generation is set only if it
+        was downloaded from that generation of the object.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, generation FROM entries WHERE bucket = ? AND path = ?",
+                (bucket, path),
+            ).fetchone()
+            if row is None or (generation is not None and row[1] != generation):
+                return None
+            digest, cached_generation = row
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE bucket = ? AND path = ?",
+                    (time.time(), bucket, path),
+                )
+
+        try:
+            data = self._object_path(digest).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self._delete_entry(bucket, path)
+            return None
+        return CachedArtifact(data, cached_generation)
+
+    def put(
+        self, bucket: str, path: str, data: bytes, generation: Optional[int] = None
+    ) -> None:
+        if len(data) > self._max_size:
+            return
+
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        # the contents are written without holding the lock, so that the
+        # downloads of the fetch threads are not serialized; the rename is
+        # atomic and all the writers of a digest write the same contents
+        if not object_path.exists():
+            object_path.parent.mkdir(exist_ok=True)
+            # write then rename, so that a crash never leaves a partial object
+            fd, tmp_path = tempfile.mkstemp(dir=object_path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, object_path)
+
+        with self._lock:
+            if not self._is_referenced(digest):
+                self._size += len(data)
+            previous = self._db.execute(
+                "SELECT digest, size FROM entries WHERE bucket = ? AND path = ?",
+                (bucket, path),
+            ).fetchone()
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (bucket, path, generation, digest, len(data), time.time()),
+                )
+                self._db.execute(
+                    "DELETE FROM missing WHERE bucket = ? AND path = ?",
+                    (bucket, path),
+                )
+            if previous is not None:
+                self._release(*previous)
+            self._evict()
+
+    def is_missing(self, bucket: str, path: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT recorded_at FROM missing WHERE bucket = ? AND path = ?",
+                (bucket, path),
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self._missing_ttl
+
+    def record_missing(self, bucket: str, path: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO missing VALUES (?, ?, ?)",
+                (bucket, path, time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM missing WHERE recorded_at < ?",
+                (time.time() - self._missing_ttl,),
+            )
+
+    def _object_path(self, digest: str) -> pathlib.Path:
+        return self._objects_dir / digest[:2] / digest
+
+    def _is_referenced(self, digest: str) -> bool:
+        return (
+            self._db.execute(
+                "SELECT 1 FROM entries WHERE digest = ?", (digest,)
+            ).fetchone()
+            is not None
+        )
+
+    def _release(self, digest: str, size: int) -> None:
+        # contents are shared by all the entries with the same digest
+        if not self._is_referenced(digest):
+            self._object_path(digest).unlink(missing_ok=True)
+            self._size -= size
+
+    def _delete_entry(self, bucket: str, path: str) -> None:
+        with self._db:
+            row = self._db.execute(
+                "SELECT digest, size FROM entries WHERE bucket = ? AND path = ?",
+                (bucket, path),
+            ).fetchone()
+            self._db.execute(
+                "DELETE FROM entries WHERE bucket = ? AND path = ?", (bucket, path)
+            )
+        if row is not None:
+            self._release(*row)
+
+    def _get_size(self) -> int:
+        row = self._db.execute(
+            "SELECT SUM(size) FROM"
+            " (SELECT digest, MAX(size) AS size FROM entries GROUP BY digest)"
+        ).fetchone()
+        return row[0] or 0
+
+    def _evict(self) -> None:
+        if self._size <= self._max_size:
+            return
+
+        evicted = 0
+        for bucket, path in self._db.execute(
+            "SELECT bucket, path FROM entries ORDER BY accessed_at"
+        ).fetchall():
+            self._delete_entry(bucket, path)
+            evicted += 1
+            if self._size <= self._max_size:
+                break
+        logger.debug("%s artifacts evicted from the GCS cache", evicted)
@@ -1,66 +1,346 @@
+import argparse
 import logging
+import signal
 import sys
-from datetime import datetime, timezone
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
 
+import requests
 from dateutil.relativedelta import relativedelta
 from google.cloud import storage  # type: ignore
 from opensearchpy import OpenSearch
 
 from prowjobsscraper import (
+    archive,
+    artifacts,
     cir_metadata,
+    classifier,
     config,
     equinix_usages,
     event,
+    fetch,
+    gcs_cache,
     prowjob,
     scraper,
+    shard,
     step,
+    utils,
 )
 
+logger = logging.getLogger(__name__)
 
-def main() -> None:
-    logging.basicConfig(stream=sys.stdout, level=config.LOG_LEVEL)
 
-    es_client = OpenSearch(
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="prow-jobs-scraper",
+        description="Scrape Prow for assisted jobs and push them to OpenSearch",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--archive",
+        metavar="DIR",
+        help="archive the job list, GCS artifacts and Equinix usages used by the run into DIR",
+    )
+    mode.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="run offline from an archive created with --archive, nothing is pushed to OpenSearch",
+    )
+    return parser.parse_args(argv)
+
+
+def replay(run_archive: archive.Archive) -> None:
+    storage_client = archive.ReplayStorageClient(run_archive)
+    scrape = scraper.Scraper(
+        archive.ReplayEventStore(
+            run_archive, slim_steps=config.SLIM_STEP_EVENTS == "true"
+        ),
+        step.StepExtractor(
+            client=storage_client, gcs_bucket_name=config.GCS_BUCKET_NAME
+        ),
+        cir_metadata.CIResourceMetadataExtractor(
+            client=storage_client, gcs_bucket_name=config.GCS_BUCKET_NAME
+        ),
+        archive.ReplayEquinixUsagesExtractor(run_archive),
+        job_classifier=classifier.JobClassifier.create_from_json(
+            config.JOB_CLASSIFIER_RULES
+        ),
+        batch_size=config.SCRAPE_BATCH_SIZE,
+        index_queue_size=config.SCRAPE_INDEX_QUEUE_SIZE,
+    )
+    try:
+        scrape.execute(
+            run_archive.load_job_list(item_filter=scrape.is_assisted_job_item)
+        )
+    finally:
+        scrape.close()
+
+
+def _get_usages_time_window() -> tuple[datetime, datetime]:
+    usages_scrape_end_time = datetime.now(tz=timezone.utc)
+    usages_scrape_start_time = usages_scrape_end_time - relativedelta(weeks=1)
+    return usages_scrape_start_time, usages_scrape_end_time
+
+
+def _create_equinix_usages_extractor(
+    run_archive: Optional[archive.Archive],
+) -> equinix_usages.EquinixUsagesExtractor:
+    usages_scrape_start_time, usages_scrape_end_time = _get_usages_time_window()
+    if run_archive:
+        return archive.RecordingEquinixUsagesExtractor(
+            archive=run_archive,
+            project_id=config.EQUINIX_PROJECT_ID,
+            project_token=config.EQUINIX_PROJECT_TOKEN,
+            start_time=usages_scrape_start_time,
+            end_time=usages_scrape_end_time,
+        )
+
+    return equinix_usages.EquinixUsagesExtractor(
+        project_id=config.EQUINIX_PROJECT_ID,
+        project_token=config.EQUINIX_PROJECT_TOKEN,
+        start_time=usages_scrape_start_time,
+        end_time=usages_scrape_end_time,
+    )
+
+
+def _create_es_client() -> OpenSearch:
+    return OpenSearch(
         config.ES_URL,
         http_auth=(config.ES_USER, config.ES_PASSWORD),
         verify_certs=False,
         ssl_show_warn=False,
     )
-    event_store = event.EventStoreElastic(
+
+
+def _get_job_shard() -> Optional[shard.Shard]:
+    # an invalid configuration is rejected at startup
+    job_shard = shard.Shard(index=config.SHARD_INDEX, count=config.SHARD_COUNT)
+    if job_shard.count == 1:
+        return None
+    return job_shard
+
+
+def _create_shard_lease(
+    es_client: OpenSearch, job_shard: Optional[shard.Shard]
+) -> Optional[shard.ShardLease]:
+    if job_shard is None:
+        return None
+    return shard.ShardLease(
         client=es_client,
-        job_index_basename=config.ES_JOB_INDEX,
-        step_index_basename=config.ES_STEP_INDEX,
-        usage_index_basename=config.ES_USAGE_INDEX,
+        index_name=f"{config.ES_JOB_INDEX}_leases",
+        shard=job_shard,
+        ttl=timedelta(seconds=config.SHARD_LEASE_TTL_SECONDS),
     )
 
+
+def _create_scraper(
+    run_archive: Optional[archive.Archive],
+    equinix_usages_extractor: equinix_usages.EquinixUsagesExtractor,
+    es_client: OpenSearch,
+    job_shard: Optional[shard.Shard],
+    lease: Optional[shard.ShardLease],
+) -> scraper.Scraper:
+    event_store_params: dict[str, Any] = {
+        "client": es_client,
+        "job_index_basename": config.ES_JOB_INDEX,
+        "step_index_basename": config.ES_STEP_INDEX,
+        "usage_index_basename": config.ES_USAGE_INDEX,
+        "slim_steps": config.SLIM_STEP_EVENTS == "true",
+    }
+    if run_archive:
+        event_store: event.EventStoreElastic = archive.RecordingEventStore(
+            archive=run_archive, **event_store_params
+        )
+    else:
+        event_store = event.EventStoreElastic(**event_store_params)
+
     gcloud_client = storage.Client.create_anonymous_client()
-    step_extractor = step.StepExtractor(
-        client=gcloud_client, gcs_bucket_name=config.GCS_BUCKET_NAME
+    if run_archive:
+        gcloud_client = archive.RecordingStorageClient(gcloud_client, run_archive)
+
+    # the artifacts served by the cache would be missing from the archive
+    if config.GCS_CACHE_DIR and not run_archive:
+        utils.set_gcs_cache(
+            gcs_cache.GcsCache(
+                directory=config.GCS_CACHE_DIR,
+                max_size=config.GCS_CACHE_MAX_SIZE_BYTES,
+                missing_ttl=config.GCS_CACHE_MISSING_TTL_SECONDS,
+            )
+        )
+
+    fetcher = fetch.Fetcher(
+        concurrency=config.GCS_FETCH_CONCURRENCY,
+        max_concurrency=max(
+            config.GCS_FETCH_CONCURRENCY, config.GCS_FETCH_MAX_CONCURRENCY
+        ),
     )
+    discovery = None
+    if config.GCS_ARTIFACT_DISCOVERY == "true":
+        discovery = artifacts.ArtifactDiscovery(
+            client=gcloud_client, gcs_bucket_name=config.GCS_BUCKET_NAME
+        )
 
-    cir_metadata_extractor = cir_metadata.CIResourceMetadataExtractor(
+    step_extractor = step.StepExtractor(
         client=gcloud_client,
         gcs_bucket_name=config.GCS_BUCKET_NAME,
+        fetcher=fetcher,
+        discovery=discovery,
+        junit_max_size=config.JUNIT_MAX_SIZE_BYTES,
+        parse_workers=config.JUNIT_PARSE_WORKERS,
     )
 
-    usages_scrape_end_time = datetime.now(tz=timezone.utc)
-    usages_scrape_start_time = usages_scrape_end_time - relativedelta(weeks=1)
-
-    equinix_usages_extractor = equinix_usages.EquinixUsagesExtractor(
-        project_id=config.EQUINIX_PROJECT_ID,
-        project_token=config.EQUINIX_PROJECT_TOKEN,
-        start_time=usages_scrape_start_time,
-        end_time=usages_scrape_end_time,
+    cir_metadata_extractor = cir_metadata.CIResourceMetadataExtractor(
+        client=gcloud_client,
+        gcs_bucket_name=config.GCS_BUCKET_NAME,
+        fetcher=fetcher,
+        discovery=discovery,
+        prefetch=config.CIR_METADATA_PREFETCH == "true",
     )
 
-    jobs = prowjob.ProwJobs.create_from_url(config.JOB_LIST_URL)
-    scrape = scraper.Scraper(
+    return scraper.Scraper(
         event_store,
         step_extractor,
         cir_metadata_extractor,
         equinix_usages_extractor,
+        job_shard,
+        classifier.JobClassifier.create_from_json(config.JOB_CLASSIFIER_RULES),
+        batch_size=config.SCRAPE_BATCH_SIZE,
+        index_queue_size=config.SCRAPE_INDEX_QUEUE_SIZE,
+        job_lease=lease,
     )
-    scrape.execute(jobs)
+
+
+def _fetch_jobs(
+    item_filter: Callable[[dict[str, Any]], bool],
+    run_archive: Optional[archive.Archive],
+    snapshot: Optional[prowjob.ProwJobsSnapshot],
+    session: Optional[requests.Session] = None,
+) -> prowjob.ProwJobs:
+    if run_archive:
+        # the archive needs the whole job list, bypass the snapshot
+        return run_archive.fetch_job_list(config.JOB_LIST_URL, item_filter=item_filter)
+
+    if config.JOB_LIST_STREAMING == "true":
+        return prowjob.ProwJobs.stream_from_url(
+            config.JOB_LIST_URL,
+            item_filter=item_filter,
+            snapshot=snapshot,
+            session=session,
+        )
+
+    return prowjob.ProwJobs.create_from_url(
+        config.JOB_LIST_URL,
+        item_filter=item_filter,
+        snapshot=snapshot,
+        session=session,
+    )
+
+
+def main() -> None:
+    logging.basicConfig(stream=sys.stdout, level=config.LOG_LEVEL)
+    args = parse_args()
+
+    if args.replay:
+        replay(archive.Archive(args.replay))
+        return
+
+    run_archive = archive.Archive(args.archive) if args.archive else None
+    es_client = _create_es_client()
+    job_shard = _get_job_shard()
+    lease = _create_shard_lease(es_client, job_shard)
+    scrape = _create_scraper(
+        run_archive,
+        _create_equinix_usages_extractor(run_archive),
+        es_client,
+        job_shard,
+        lease,
+    )
+
+    try:
+        if lease and not lease.acquire():
+            logger.warning("Another run is processing this shard, skipping")
+            return
+
+        snapshot = None
+        if config.JOB_LIST_SNAPSHOT_DIR and not run_archive:
+            snapshot = prowjob.ProwJobsSnapshot(config.JOB_LIST_SNAPSHOT_DIR)
+
+        jobs = _fetch_jobs(scrape.is_assisted_job_item, run_archive, snapshot)
+        scrape.execute(jobs)
+
+        if snapshot:
+            snapshot.commit()
+    finally:
+        if lease:
+            lease.release()
+        scrape.close()
+
+
+def daemon() -> None:
+    """
+    Poll the job list every DAEMON_POLL_INTERVAL_SECONDS and only process the
+    jobs completed since the previous poll. Clients, connection pools and the
+    known build ids are kept warm between polls.
+    """
+    logging.basicConfig(stream=sys.stdout, level=config.LOG_LEVEL)
+
+    equinix_usages_extractor = _create_equinix_usages_extractor(None)
+    es_client = _create_es_client()
+    job_shard = _get_job_shard()
+    lease = _create_shard_lease(es_client, job_shard)
+    scrape = _create_scraper(
+        None, equinix_usages_extractor, es_client, job_shard, lease
+    )
+    session = requests.Session()
+
+    snapshot = None
+    if config.JOB_LIST_SNAPSHOT_DIR:
+        snapshot = prowjob.ProwJobsSnapshot(config.JOB_LIST_SNAPSHOT_DIR)
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    last_usages_run: Optional[float] = None
+    last_resync = time.monotonic()
+    while not stop.is_set():
+        tick_start = time.monotonic()
+        try:
+            if tick_start - last_resync >= config.DAEMON_RESYNC_INTERVAL_SECONDS:
+                scrape.reset_known_build_ids()
+                last_resync = tick_start
+
+            # the lease is renewed on every poll
+            if lease and not lease.acquire():
+                logger.warning("Another worker is processing this shard, waiting")
+                stop.wait(config.DAEMON_POLL_INTERVAL_SECONDS)
+                continue
+
+            jobs = _fetch_jobs(scrape.is_assisted_job_item, None, snapshot, session)
+            scrape.execute_jobs(jobs)
+            if snapshot:
+                snapshot.commit()
+
+            # usages are not sharded, let the first shard handle them
+            if (job_shard is None or job_shard.index == 0) and (
+                last_usages_run is None
+                or tick_start - last_usages_run >= config.DAEMON_USAGES_INTERVAL_SECONDS
+            ):
+                equinix_usages_extractor.set_time_window(*_get_usages_time_window())
+                scrape.execute_usages()
+                last_usages_run = tick_start
+        except Exception:
+            logger.exception("Scraping failed, retrying on the next poll")
+
+        elapsed = time.monotonic() - tick_start
+        logger.info("Poll done in %.1fs", elapsed)
+        stop.wait(max(0.0, config.DAEMON_POLL_INTERVAL_SECONDS - elapsed))
+
+    if lease:
+        lease.release()
+    scrape.close()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import codecs
+import gzip
+import json
 import logging
+import os
+import pathlib
 from datetime import datetime
-from typing import Final, Optional
+from http import HTTPStatus
+from typing import Any, Callable, Final, Iterable, Iterator, Mapping, Optional
 
 import requests
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr
+
+from prowjobsscraper import utils
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +28,11 @@ _TYPE_PREFIX: Final[dict[str, str]] = {
 
 _JOB_REHEARSE_PREFIX: Final[str] = "rehearse-"
 
+# Size of the chunks read from Prow's response when streaming the job list
+_STREAM_CHUNK_SIZE: Final[int] = 64 * 1024
+
+_JSON_WHITESPACE: Final[str] = " \t\n\r"
+
 # Base prefix for a job name
 # e.g.: {branch-ci}-{openshift}-{assisted-service}-{master}-
 _JOB_PREFIX_TEMPLATE: Final[str] = "{type}-{org}-{repo}-{branch}-"
@@ -100,13 +113,39 @@ class ProwJobStatus(BaseModel):
 
 
 class ProwJob(BaseModel):
+    """
+    ProwJob is a job of Prow's job list. Unlike JobStep, it stays a pydantic
+    model through the scraper: the job list is prefiltered on its raw items so
+    only the assisted jobs are ever built (about 5% of the list), and the model
+    is what the extractors, the event builders and the archive read from.
+    hack/benchmarks/prowjob_memory.py measures what a slotted record would save.
+    """
+
     cirMetadata: Optional[CIResourceMetadata] = None
+    # set when the junit file of the job is too large to be parsed
+    junitTruncated: bool = False
     metadata: ProwJobMetadata
     spec: ProwJobSpec
     status: ProwJobStatus
 
+    # values derived from the fields above, computed once per job
+    _context: Optional[str] = PrivateAttr(default=None)
+    _gcs_base_path: Optional[str] = PrivateAttr(default=None)
+
     @property
     def context(self) -> str:
+        if self._context is None:
+            self._context = self._get_context()
+        return self._context
+
+    @property
+    def gcs_base_path(self) -> str:
+        """Path of the job's artifacts in Prow's GCS bucket"""
+        if self._gcs_base_path is None:
+            self._gcs_base_path = utils.get_gcs_base_path_from_job_url(self.status.url)
+        return self._gcs_base_path
+
+    def _get_context(self) -> str:
         if self.spec.job.startswith(_JOB_REHEARSE_PREFIX):
             job_prefix = self._get_job_rehearse_prefix()
         else:
@@ -179,11 +218,291 @@ class ProwJobs(BaseModel):
     items: list[ProwJob]
 
     @classmethod
-    def create_from_url(cls, url: str) -> "ProwJobs":
-        r = requests.get(url)
-        return cls.create_from_string(r.text)
+    def create_from_url(
+        cls,
+        url: str,
+        item_filter: Optional[Callable[[dict[str, Any]], bool]] = None,
+        snapshot: Optional[ProwJobsSnapshot] = None,
+        session: Optional[requests.Session] = None,
+    ) -> "ProwJobs":
+        headers = snapshot.conditional_headers() if snapshot else {}
+        get = session.get if session else requests.get
+        r = get(url, headers=headers)
+        if snapshot is None:
+            return cls.create_from_string(r.text, item_filter)
+
+        if r.status_code == HTTPStatus.NOT_MODIFIED:
+            logger.info("Job list is unchanged since the last snapshot")
+            return cls(items=[])
+
+        r.raise_for_status()
+        data = b"".join(snapshot.record(r.headers, [r.content]))
+        jobs = cls.create_from_string(data, item_filter)
+        jobs.items = snapshot.filter_new_jobs(jobs.items)
+        return jobs
+
+    @classmethod
+    def create_from_string(
+        cls,
+        data: str | bytes,
+        item_filter: Optional[Callable[[dict[str, Any]], bool]] = None,
+    ) -> "ProwJobs":
+        """
+        When item_filter is set, the job list is parsed in two phases: items
+        are first filtered as plain dicts and only the remaining ones are
+        validated into ProwJob models.
+        """
+        if item_filter is None:
+            return cls.parse_raw(data)
+
+        raw = json.loads(data)
+        if isinstance(raw, dict) and isinstance(raw.get("items"), list):
+            raw = {**raw, "items": [i for i in raw["items"] if item_filter(i)]}
+
+        return cls.parse_obj(raw)
 
     @classmethod
-    def create_from_string(cls, data: str) -> "ProwJobs":
-        jobs = cls.parse_raw(data)
+    def stream_from_url(
+        cls,
+        url: str,
+        item_filter: Callable[[dict[str, Any]], bool],
+        snapshot: Optional[ProwJobsSnapshot] = None,
+        session: Optional[requests.Session] = None,
+    ) -> "ProwJobs":
+        """
+        Decode the job list one item at a time from the response body and
+        only validate the items accepted by item_filter, so that memory and
+        CPU usage scale with the number of kept jobs instead of the size of
+        the whole Prow instance.
+        """
+        headers = snapshot.conditional_headers() if snapshot else {}
+        get = session.get if session else requests.get
+        with get(url, headers=headers, stream=True) as r:
+            if snapshot is None:
+                chunks = r.iter_content(chunk_size=_STREAM_CHUNK_SIZE)
+                return cls.create_from_chunks(chunks, item_filter)
+
+            if r.status_code == HTTPStatus.NOT_MODIFIED:
+                logger.info("Job list is unchanged since the last snapshot")
+                return cls(items=[])
+
+            r.raise_for_status()
+            chunks = snapshot.record(
+                r.headers, r.iter_content(chunk_size=_STREAM_CHUNK_SIZE)
+            )
+            jobs = cls.create_from_chunks(chunks, item_filter)
+            # the decoder stops at the end of the document, make sure the
+            # snapshot records the whole payload
+            for _ in chunks:
+                pass
+
+        jobs.items = snapshot.filter_new_jobs(jobs.items)
         return jobs
+
+    @classmethod
+    def create_from_chunks(
+        cls,
+        chunks: Iterable[bytes],
+        item_filter: Callable[[dict[str, Any]], bool],
+    ) -> "ProwJobs":
+        kept = []
+        total = 0
+        for item in _iter_items(chunks):
+            total += 1
+            if item_filter(item):
+                kept.append(item)
+
+        logger.info("%s jobs kept out of %s streamed from prow", len(kept), total)
+        return cls.parse_obj({"items": kept})
+
+
+class ProwJobsSnapshot:
+    """
+    ProwJobsSnapshot keeps on disk a gzip compressed copy of the last fetched
+    job list, along with its ETag/Last-Modified validators and the
+    (build_id, state) pairs of the jobs that were kept from it.
+
+    An unchanged job list then costs a single conditional request, and only
+    the jobs that are new since the previous snapshot get processed.
+    A snapshot is only persisted once commit() is called, so that a failed
+    run is retried entirely on the next one.
+    """
+
+    _PAYLOAD_FILENAME: Final[str] = "prowjobs.json.gz"
+    _STATE_FILENAME: Final[str] = "state.json"
+
+    def __init__(self, directory: str):
+        self._directory = pathlib.Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._state = self._load_state()
+        self._pending_state: Optional[dict[str, Any]] = None
+
+    @property
+    def payload_path(self) -> pathlib.Path:
+        return self._directory / self._PAYLOAD_FILENAME
+
+    @property
+    def _state_path(self) -> pathlib.Path:
+        return self._directory / self._STATE_FILENAME
+
+    @property
+    def _pending_payload_path(self) -> pathlib.Path:
+        return self.payload_path.with_suffix(".tmp")
+
+    def _load_state(self) -> dict[str, Any]:
+        try:
+            return json.loads(self._state_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning("Ignoring corrupted job list snapshot state: %s", e)
+            return {}
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if etag := self._state.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := self._state.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def record(
+        self, headers: Mapping[str, str], chunks: Iterable[bytes]
+    ) -> Iterator[bytes]:
+        """Compress the payload to a pending snapshot while passing it through."""
+        with gzip.open(self._pending_payload_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+
+        self._pending_state = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "jobs": [],
+        }
+
+    def filter_new_jobs(self, jobs: list[ProwJob]) -> list[ProwJob]:
+        """Keep the jobs whose (build_id, state) was not in the previous snapshot."""
+        known = {tuple(pair) for pair in self._state.get("jobs", [])}
+        if self._pending_state is not None:
+            self._pending_state["jobs"] = [
+                [j.status.build_id, j.status.state] for j in jobs
+            ]
+
+        new_jobs = [j for j in jobs if (j.status.build_id, j.status.state) not in known]
+        logger.info(
+            "%s jobs out of %s are new since the last snapshot",
+            len(new_jobs),
+            len(jobs),
+        )
+        return new_jobs
+
+    def commit(self) -> None:
+        if self._pending_state is None:
+            return
+
+        os.replace(self._pending_payload_path, self.payload_path)
+        pending_state_path = self._state_path.with_suffix(".tmp")
+        pending_state_path.write_text(json.dumps(self._pending_state))
+        os.replace(pending_state_path, self._state_path)
+
+        self._state, self._pending_state = self._pending_state, None
+
+
+class _StreamDecoder:
+    """
+    Incremental decoder for a JSON document of the form {"items": [...]}.
+    Only the element being decoded is held in memory, along with at most one
+    chunk of lookahead.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buffer = self._buffer[self._pos :] + self._decoder.decode(
+                b"", final=True
+            )
+            self._pos = 0
+            return False
+
+        self._buffer = self._buffer[self._pos :] + self._decoder.decode(chunk)
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in _JSON_WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("unexpected end of prow job list")
+
+    def expect(self, char: str) -> None:
+        if (found := self.peek()) != char:
+            raise ValueError(f"expected {char!r} in prow job list, found {found!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more chunks as long as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # a number could be cut at the end of the buffer
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+
+def _iter_items(chunks: Iterable[bytes]) -> Iterator[dict[str, Any]]:
+    decoder = _StreamDecoder(chunks)
+    decoder.expect("{")
+    found_items = False
+    while decoder.peek() != "}":
+        key = decoder.value()
+        decoder.expect(":")
+        if key == "items" and decoder.peek() == "[":
+            found_items = True
+            decoder.expect("[")
+            if decoder.peek() != "]":
+                while True:
+                    yield decoder.value()
+                    if decoder.peek() != ",":
+                        break
+                    decoder.expect(",")
+            decoder.expect("]")
+        else:
+            decoder.value()
+
+        if decoder.peek() != ",":
+            break
+        decoder.expect(",")
+
+    decoder.expect("}")
+    if not found_items:
+        raise ValueError("no items found in prow job list")
@@ -1,44 +1,170 @@
 import logging
-import re
-
-from prowjobsscraper import cir_metadata, equinix_usages, event, prowjob, step
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Final, Iterator, Optional
+
+from prowjobsscraper import (
+    cir_metadata,
+    classifier,
+    equinix_usages,
+    event,
+    prowjob,
+    shard,
+    step,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class Scraper:
+    """
+    Scraper processes the jobs in batches streamed through two stages: the
+    fetch stage hydrates the CI resource metadata of a batch and parses its
+    steps, then hands the batch over to the index stage which stores its jobs
+    and steps while the next batches are fetched. At most index_queue_size
+    batches wait for the index stage, the fetch stage blocks beyond that, so
+    that the steps held in memory do not grow with the number of jobs to
+    process.
+    """
+
+    _DEFAULT_BATCH_SIZE: Final[int] = 100
+    _DEFAULT_INDEX_QUEUE_SIZE: Final[int] = 2
+
     def __init__(
         self,
         event_store: event.EventStoreElastic,
         step_extractor: step.StepExtractor,
         cir_metadata_extractor: cir_metadata.CIResourceMetadataExtractor,
         equinix_usages_extractor: equinix_usages.EquinixUsagesExtractor,
+        job_shard: Optional[shard.Shard] = None,
+        job_classifier: Optional[classifier.JobClassifier] = None,
+        batch_size: int = _DEFAULT_BATCH_SIZE,
+        index_queue_size: int = _DEFAULT_INDEX_QUEUE_SIZE,
+        job_lease: Optional[shard.ShardLease] = None,
     ):
+        """
+        When job_lease is set, the lease of the shard is renewed between the
+        batches, processing stops if another worker took it over.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        if index_queue_size < 1:
+            raise ValueError(
+                f"index_queue_size must be positive, got {index_queue_size}"
+            )
         self._event_store = event_store
         self._step_extractor = step_extractor
         self._cir_metadata_extractor = cir_metadata_extractor
         self._equinix_usages_extractor = equinix_usages_extractor
+        self._job_shard = job_shard
+        self._job_classifier = job_classifier or classifier.JobClassifier()
+        self._known_build_ids: set[str] = set()
+        self._batch_size = batch_size
+        self._index_queue_size = index_queue_size
+        self._job_lease = job_lease
+
+    def close(self) -> None:
+        """
+        Release the resources held by the extractors, the scraper cannot be
+        used afterwards.
+        """
+        self._cir_metadata_extractor.close()
+        self._step_extractor.close()
 
     def execute(self, jobs: prowjob.ProwJobs):
+        self.execute_jobs(jobs)
+
+        # usages are not sharded, let the first shard handle them
+        if self._job_shard is None or self._job_shard.index == 0:
+            self.execute_usages()
+
+    def execute_jobs(self, jobs: prowjob.ProwJobs):
         logger.info("%s jobs will be processed", len(jobs.items))
 
         # filter out non-assisted jobs
         jobs.items = [j for j in jobs.items if self._is_assisted_job(j)]
 
+        # filter out jobs owned by other shards
+        if self._job_shard is not None:
+            jobs.items = [
+                j for j in jobs.items if self._job_shard.owns(j.status.build_id)
+            ]
+            logger.info(
+                "%s jobs belong to shard %s", len(jobs.items), self._job_shard.name
+            )
+
         # filter out jobs already stored
-        known_jobs_build_ids = self._event_store.scan_build_ids()
+        known_jobs_build_ids = self._get_known_build_ids(
+            [j.status.build_id for j in jobs.items if j.status.build_id]
+        )
         jobs.items = [
             j for j in jobs.items if j.status.build_id not in known_jobs_build_ids
         ]
 
-        # Set CI resource metadata for each job
-        self._cir_metadata_extractor.hydrate(jobs)
+        logger.info("%s jobs will be pushed to ES", len(jobs.items))
+        pushed_steps = 0
+        # a single index worker keeps the batches stored in order
+        index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")
+        pending: deque[tuple[Future[None], list[prowjob.ProwJob]]] = deque()
+        try:
+            for batch in self._iter_batches(jobs.items):
+                if self._job_lease is not None:
+                    self._job_lease.renew()
+                batch_jobs = prowjob.ProwJobs.construct(items=batch)
+
+                # Set CI resource metadata for each job
+                self._cir_metadata_extractor.hydrate(batch_jobs)
+
+                # Retrieve executed steps for each job
+                steps = self._step_extractor.parse_prow_jobs(batch_jobs)
+                pushed_steps += len(steps)
+
+                # wait for the index stage when it lags behind
+                while len(pending) >= self._index_queue_size:
+                    self._wait_for_indexing(*pending.popleft())
+                pending.append(
+                    (index_executor.submit(self._index_batch, batch, steps), batch)
+                )
+
+            while pending:
+                self._wait_for_indexing(*pending.popleft())
+        finally:
+            # the batches still pending are dropped when a stage failed
+            index_executor.shutdown(cancel_futures=True)
+
+        logger.info("%s steps were pushed to ES", pushed_steps)
+        if truncated_jobs := sum(1 for j in jobs.items if j.junitTruncated):
+            logger.warning(
+                "%s jobs were pushed to ES without steps, their junit file is too large",
+                truncated_jobs,
+            )
+
+    def _iter_batches(
+        self, jobs: list[prowjob.ProwJob]
+    ) -> Iterator[list[prowjob.ProwJob]]:
+        for i in range(0, len(jobs), self._batch_size):
+            yield jobs[i : i + self._batch_size]
+
+    def _index_batch(self, jobs: list[prowjob.ProwJob], steps: list[step.JobStep]):
+        # Store jobs and steps into their respective indices
+        logger.debug("%s jobs and %s steps will be pushed to ES", len(jobs), len(steps))
+        self._event_store.index_prow_jobs(jobs)
+        self._event_store.index_job_steps(steps)
 
-        # Retrieve executed steps for each job
-        steps = self._step_extractor.parse_prow_jobs(jobs)
+    def _wait_for_indexing(
+        self, future: Future[None], jobs: list[prowjob.ProwJob]
+    ) -> None:
+        future.result()
+        self._known_build_ids.update(
+            j.status.build_id for j in jobs if j.status.build_id
+        )
 
+    def execute_usages(self):
         # Retrieve equinix machines usages not already stored
-        known_usages_identifiers = self._event_store.scan_usages_identifiers()
+        known_usages_identifiers = self._event_store.scan_usages_identifiers(
+            start_time=self._equinix_usages_extractor.start_time,
+            end_time=self._equinix_usages_extractor.end_time,
+        )
         unfiltered_usages = self._equinix_usages_extractor.get_project_usages()
         usages = [
             usage
@@ -46,16 +172,28 @@ class Scraper:
             if self._should_index_usage(usage, known_usages_identifiers)
         ]
 
-        # Store jobs and steps into their respective indices
-        logger.info("%s jobs will be pushed to ES", len(jobs.items))
-        self._event_store.index_prow_jobs(jobs.items)
-
-        logger.info("%s steps will be pushed to ES", len(steps))
-        self._event_store.index_job_steps(steps)
-
         logger.info("%s equinix usages will be pushed to ES", len(usages))
         self._event_store.index_equinix_usages(usages)
 
+    def reset_known_build_ids(self) -> None:
+        """
+        Drop the known build ids kept in memory, they will be looked up again
+        in the event store on the next execution.
+        """
+        self._known_build_ids = set()
+
+    def _get_known_build_ids(self, build_ids: list[str]) -> set[str]:
+        """
+        Only the build ids not already known to be stored are looked up in the
+        event store, so that a long-running scraper only checks new jobs.
+        """
+        unknown_build_ids = [b for b in build_ids if b not in self._known_build_ids]
+        if unknown_build_ids:
+            self._known_build_ids.update(
+                self._event_store.get_known_build_ids(unknown_build_ids)
+            )
+        return self._known_build_ids
+
     def _should_index_usage(
         self,
         usage: equinix_usages.EquinixUsage,
@@ -63,18 +201,47 @@ class Scraper:
     ) -> bool:
         return usage.to_identifier() not in known_usages_identifiers
 
-    @staticmethod
-    def _is_assisted_job(j: prowjob.ProwJob) -> bool:
-        if j.spec.hidden:
+    def _is_assisted_job(self, j: prowjob.ProwJob) -> bool:
+        return self._is_assisted(
+            job_name=j.spec.job,
+            hidden=j.spec.hidden,
+            state=j.status.state,
+            description=j.status.description,
+        )
+
+    def is_assisted_job_item(self, item: dict[str, Any]) -> bool:
+        """
+        Same filter as _is_assisted_job, applied on a raw item of Prow's job
+        list so that non-assisted jobs can be dropped before model validation.
+        """
+        spec = item.get("spec") or {}
+        status = item.get("status") or {}
+        return self._is_assisted(
+            job_name=spec.get("job") or "",
+            hidden=spec.get("hidden"),
+            state=status.get("state"),
+            description=status.get("description"),
+        )
+
+    def _is_assisted(
+        self,
+        job_name: str,
+        hidden: Optional[bool],
+        state: Optional[str],
+        description: Optional[str],
+    ) -> bool:
+        if hidden:
             return False
-        if j.status.state not in ("success", "failure"):
+        if state not in ("success", "failure"):
             return False
-        elif not re.search("openshift.*assisted", j.spec.job):
+
+        job_class = self._job_classifier.classify(job_name)
+        if not job_class & classifier.JobClass.ASSISTED:
             return False
-        elif "openshift-release-fast-forward" in j.spec.job:
+        elif job_class & classifier.JobClass.FAST_FORWARD:
             # exclude fast-forward jobs
             return False
-        elif j.status.description and "Overridden" in j.status.description:
+        elif description and "Overridden" in description:
             # exclude overridden builds
             # the url points to github instead of prow
             return False
@@ -0,0 +1,161 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Final, Optional
+
+import mmh3
+import pkg_resources
+from opensearchpy import OpenSearch
+from opensearchpy.exceptions import ConflictError, NotFoundError
+from pydantic import BaseModel, root_validator
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when another worker took over the lease of the shard being processed."""
+
+
+class Shard(BaseModel):
+    """
+    Shard represents the partition of jobs owned by a worker: a job belongs to
+    the shard matching the hash of its build_id.
+    """
+
+    index: int
+    count: int
+
+    @root_validator(skip_on_failure=True)
+    def _check_index(cls, values: dict[str, Any]) -> dict[str, Any]:
+        # a shard out of range would silently own no job
+        if values["count"] < 1:
+            raise ValueError(f"shard count must be positive, got {values['count']}")
+        if not 0 <= values["index"] < values["count"]:
+            raise ValueError(
+                f"shard index must be in [0, {values['count']}), got {values['index']}"
+            )
+        return values
+
+    @property
+    def name(self) -> str:
+        return f"{self.index}-of-{self.count}"
+
+    def owns(self, build_id: Optional[str]) -> bool:
+        if build_id is None:
+            return self.index == 0
+        return mmh3.hash(build_id, signed=False) % self.count == self.index
+
+
+class ShardLease:
+    """
+    ShardLease is a lease stored in OpenSearch, it prevents overlapping or
+    concurrent runs from processing the same shard. An expired lease (e.g.
+    left behind by a crashed run) can be taken over by any worker.
+    Updates rely on optimistic concurrency control, so only one worker can
+    win a race for the same lease.
+    """
+
+    _SCHEMA_PATH: Final[str] = "indices/leases_schema.json"
+
+    def __init__(
+        self,
+        client: OpenSearch,
+        index_name: str,
+        shard: Shard,
+        ttl: timedelta,
+        owner: Optional[str] = None,
+    ):
+        self._client = client
+        self._index_name = index_name
+        self._shard = shard
+        self._ttl = ttl
+        self._owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        self._acquired_at: Optional[float] = None
+
+        if not self._client.indices.exists(index=self._index_name):
+            self._client.indices.create(
+                index=self._index_name,
+                body=pkg_resources.resource_string(__name__, self._SCHEMA_PATH),
+            )
+
+    def acquire(self) -> bool:
+        """Acquire or renew the lease, return False if it is held by someone else."""
+        now = datetime.now(tz=timezone.utc)
+        body = {
+            "owner": self._owner,
+            "shard_index": self._shard.index,
+            "shard_count": self._shard.count,
+            "expires_at": (now + self._ttl).isoformat(),
+        }
+
+        current = self._get()
+        try:
+            if current is None:
+                self._client.create(
+                    index=self._index_name, id=self._shard.name, body=body
+                )
+            else:
+                lease = current["_source"]
+                expires_at = datetime.fromisoformat(lease["expires_at"])
+                if lease["owner"] != self._owner and expires_at > now:
+                    logger.warning(
+                        "Shard %s is leased by %s until %s",
+                        self._shard.name,
+                        lease["owner"],
+                        lease["expires_at"],
+                    )
+                    return False
+
+                self._client.index(
+                    index=self._index_name,
+                    id=self._shard.name,
+                    body=body,
+                    if_seq_no=current["_seq_no"],
+                    if_primary_term=current["_primary_term"],
+                )
+        except ConflictError:
+            logger.warning("Lost the race for the lease of shard %s", self._shard.name)
+            return False
+
+        self._acquired_at = time.monotonic()
+        logger.info("Shard %s is leased by %s", self._shard.name, self._owner)
+        return True
+
+    def renew(self) -> None:
+        """
+        Renew the lease once a quarter of its ttl elapsed since it was last
+        acquired, so that runs longer than the ttl keep their shard. Raise
+        LeaseLostError when another worker took it over meanwhile.
+        """
+        if (
+            self._acquired_at is not None
+            and time.monotonic() - self._acquired_at < self._ttl.total_seconds() / 4
+        ):
+            return
+        if not self.acquire():
+            raise LeaseLostError(f"Lost the lease of shard {self._shard.name}")
+
+    def release(self) -> None:
+        current = self._get()
+        if current is None or current["_source"]["owner"] != self._owner:
+            return
+
+        try:
+            self._client.delete(
+                index=self._index_name,
+                id=self._shard.name,
+                if_seq_no=current["_seq_no"],
+                if_primary_term=current["_primary_term"],
+            )
+        except (ConflictError, NotFoundError):
+            logger.warning("Lease of shard %s changed before release", self._shard.name)
+        finally:
+            self._acquired_at = None
+
+    def _get(self) -> Optional[dict[str, Any]]:
+        try:
+            return self._client.get(index=self._index_name, id=self._shard.name)
+        except NotFoundError:
+            return None
@@ -1,20 +1,30 @@
+import json
 import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import timedelta
-from typing import Optional
+from typing import Final, Iterator, NamedTuple, Optional, Union
+from xml.etree import ElementTree
 
 from google.cloud import exceptions, storage  # type: ignore
-from junitparser import Failure, JUnitXml, TestCase  # type: ignore
-from pydantic import BaseModel, HttpUrl
 
-from prowjobsscraper import utils
+from prowjobsscraper import artifacts, fetch, utils
 from prowjobsscraper.prowjob import ProwJob, ProwJobs
 
 logger = logging.getLogger(__name__)
 
 
-class JobStep(BaseModel):
+@dataclass(slots=True)
+class JobStep:
     """
     A JobStep represents a step in a ProwJob.
+
+    A job has many steps and they never leave the scraper as is (they are
+    converted into StepEvents to be indexed): they are kept as a slotted record
+    referencing their job instead of a validated pydantic model embedding a
+    copy of it.
     """
 
     job: ProwJob
@@ -24,77 +34,241 @@ class JobStep(BaseModel):
     details: Optional[str] = None
 
     @classmethod
-    def create_from_junit_testcase(cls, job: ProwJob, case: TestCase) -> "JobStep":
-        state = "success"
-        details = None
-        for res in case.result:
-            if isinstance(res, Failure):
-                state = "failure"
-                details = res.text
-                break
-
-        duration = timedelta(0)
-        try:
-            if case.time:
-                duration = timedelta(seconds=float(case.time))
-        except ValueError:
+    def create_from_string(cls, data: Union[str, bytes]) -> "JobStep":
+        raw = json.loads(data)
+        return cls(
+            job=ProwJob.parse_obj(raw["job"]),
+            name=raw["name"],
+            state=raw["state"],
+            duration=timedelta(seconds=raw["duration"]),
+            details=raw.get("details"),
+        )
+
+    @classmethod
+    def create_from_junit_testcase(
+        cls, job: ProwJob, case: "JunitTestCase"
+    ) -> "JobStep":
+        if case.duration is None:
             logger.warning(
                 "Cannot parse duration in junit because it is malformed, job: %s", job
             )
         return cls(
             job=job,
             name=case.name,
-            state=state,
-            duration=duration,
-            details=details,
+            state=case.state,
+            duration=timedelta(seconds=case.duration or 0),
+            details=case.details,
         )
 
 
+class JunitTestCase(NamedTuple):
+    """
+    A JunitTestCase is the compact outcome of a junit testcase, it can be
+    shipped from the processes parsing junit files. duration is None when it
+    is malformed in the junit file.
+    """
+
+    name: str
+    state: str
+    duration: Optional[float]
+    details: Optional[str]
+
+
+# size of the chunks of a junit file fed to the parser
+_JUNIT_CHUNK_SIZE: Final[int] = 64 * 1024
+
+
+def iter_junit_testcases(junit: Union[str, bytes]) -> Iterator[JunitTestCase]:
+    """
+    Parse the testcases of a junit file incrementally: a testcase is emitted as
+    soon as its element closes, and the element is freed right away, so the
+    whole document is never held as a tree.
+    """
+    parser = ElementTree.XMLPullParser(events=("end",))
+    for offset in range(0, len(junit), _JUNIT_CHUNK_SIZE):
+        parser.feed(junit[offset : offset + _JUNIT_CHUNK_SIZE])
+        yield from _read_junit_testcases(parser)
+    parser.close()
+    yield from _read_junit_testcases(parser)
+
+
+def parse_junit_testcases(junit: Union[str, bytes]) -> list[JunitTestCase]:
+    return list(iter_junit_testcases(junit))
+
+
+def iter_junit_steps(job: ProwJob, junit: Union[str, bytes]) -> Iterator[JobStep]:
+    for case in iter_junit_testcases(junit):
+        yield JobStep.create_from_junit_testcase(job, case)
+
+
+def _read_junit_testcases(
+    parser: ElementTree.XMLPullParser,
+) -> Iterator[JunitTestCase]:
+    # only end events are requested, they all hold the closed element
+    events: Iterator[tuple[str, ElementTree.Element]]
+    events = parser.read_events()  # type: ignore[assignment]
+    for _, element in events:
+        if element.tag == "testcase":
+            yield _create_junit_testcase(element)
+            element.clear()
+        elif element.tag == "testsuite":
+            # its testcases are cleared already, drop the other children
+            element.clear()
+
+
+def _create_junit_testcase(element: ElementTree.Element) -> JunitTestCase:
+    state = "success"
+    details = None
+    if (failure := element.find("failure")) is not None:
+        state = "failure"
+        details = failure.text
+
+    duration: Optional[float] = 0
+    try:
+        if time := element.get("time"):
+            duration = float(time)
+    except ValueError:
+        duration = None
+
+    return JunitTestCase(
+        name=element.get("name", ""), state=state, duration=duration, details=details
+    )
+
+
+# failure details are normalized into signatures by these substitutions,
+# applied in order, so that the failures of different runs with the same cause
+# share the same signature
+_FAILURE_SIGNATURE_SUBSTITUTIONS: Final[tuple[tuple[re.Pattern[str], str], ...]] = (
+    # ANSI escape sequences, their escape character is sometimes mangled
+    (re.compile(r"(?:\x1b|\ufffd)\[[0-9;]*[A-Za-z]"), ""),
+    (
+        re.compile(
+            r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+        ),
+        "<timestamp>",
+    ),
+    (
+        re.compile(
+            r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I
+        ),
+        "<uuid>",
+    ),
+    # clock times, before the IPv6 addresses they look like
+    (re.compile(r"(?<![:.])\b\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?\b(?!:)"), "<time>"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b"), "<ip>"),
+    # IPv6 addresses, "::" compresses groups of zeros: either it or a hex
+    # letter tells them from other colon separated numbers
+    (
+        re.compile(
+            r"\b(?=[0-9a-f:]*(?:::|[a-f]))[0-9a-f]{1,4}(?::[0-9a-f]{0,4}){2,7}\b",
+            re.I,
+        ),
+        "<ip>",
+    ),
+    # build ids and other long numeric ids
+    (re.compile(r"\b\d{10,}\b"), "<id>"),
+    (re.compile(r"\s+"), " "),
+)
+_FAILURE_SIGNATURE_LENGTH: Final[int] = 512
+
+
+def get_failure_signature(details: str) -> str:
+    """
+    Normalize failure details into a signature, stripped of the timestamps,
+    clock times, IPs, UUIDs and build ids that differ from one run to another.
+    """
+    # the signature only keeps the beginning of the details: do not normalize
+    # multi-megabyte logs
+    signature = details[: 4 * _FAILURE_SIGNATURE_LENGTH]
+    for pattern, replacement in _FAILURE_SIGNATURE_SUBSTITUTIONS:
+        signature = pattern.sub(replacement, signature)
+    return signature.strip()[:_FAILURE_SIGNATURE_LENGTH]
+
+
 class StepExtractor:
     """
     StepExtractor allows to parse ProwJobs into JobSteps.
     """
 
-    def __init__(self, client: storage.Client, gcs_bucket_name: str):
+    def __init__(
+        self,
+        client: storage.Client,
+        gcs_bucket_name: str,
+        fetcher: Optional[fetch.Fetcher] = None,
+        discovery: Optional[artifacts.ArtifactDiscovery] = None,
+        junit_max_size: Optional[int] = None,
+        parse_workers: int = 1,
+    ):
+        """
+        When parse_workers is above 1, the junit files are parsed by as many
+        processes rather than by the fetch threads, which share a single core.
+        """
         self._client = client
         self._gcs_bucket_name = gcs_bucket_name
+        self._fetcher = fetcher or fetch.Fetcher()
+        self._discovery = discovery
+        self._junit_max_size = junit_max_size
+        self._parse_executor: Optional[ProcessPoolExecutor] = None
+        if parse_workers > 1:
+            # workers are spawned rather than forked from the threaded scraper
+            self._parse_executor = ProcessPoolExecutor(
+                max_workers=parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def close(self) -> None:
+        """
+        Stop the processes parsing the junit files.
+        """
+        if self._parse_executor is not None:
+            self._parse_executor.shutdown(cancel_futures=True)
+            self._parse_executor = None
 
     def parse_prow_jobs(self, jobs: ProwJobs) -> list[JobStep]:
         """
         For each ProwJob in ProwJob, retrieve the resulting junit file stored in Prow's GCS bucket and parse it in order to produce JobSteps.
-        TODO: see if returning a generator would be benefic on memory consumption
+        The junit files of the jobs are downloaded and parsed concurrently by the fetcher.
+        The scraper calls it on batches of jobs, so that the returned steps do not grow with the number of jobs.
+        The jobs whose junit file exceeds junit_max_size are skipped and marked with junitTruncated.
         """
         steps = []
-        for j in jobs.items:
-            steps.extend(self._create_job_steps(j))
+        for job_steps in self._fetcher.map(self._create_job_steps, jobs.items):
+            steps.extend(job_steps)
         return steps
 
-    def _get_bucket_and_path_to_junit(self, url: HttpUrl) -> tuple[str, str]:
-        base_path = utils.get_gcs_base_path_from_job_url(url)
-        junit_path = "/".join([base_path, "artifacts", "junit_operator.xml"])
+    def _get_bucket_and_path_to_junit(self, job: ProwJob) -> tuple[str, str]:
+        junit_path = "/".join([job.gcs_base_path, "artifacts", "junit_operator.xml"])
         return self._gcs_bucket_name, junit_path
 
     def _download_junit(self, job: ProwJob) -> str:
-        if job.status.url is None:
-            raise ValueError("job.status.url is not set")
-
-        bucket_name, blob_path = self._get_bucket_and_path_to_junit(job.status.url)
-        return utils.download_from_gcs_as_string(self._client, bucket_name, blob_path)
-
-    def _parse_junit_suite_into_steps(self, job: ProwJob, junit: str) -> list[JobStep]:
-        steps = []
-        xml = JUnitXml.fromstring(junit)
-        for suite in xml:
-            for case in suite:
-                steps.append(JobStep.create_from_junit_testcase(job, case))
-
-        return steps
+        bucket_name, blob_path = self._get_bucket_and_path_to_junit(job)
+        return utils.download_from_gcs_as_string(
+            self._client, bucket_name, blob_path, max_size=self._junit_max_size
+        )
 
     def _create_job_steps(self, job: ProwJob) -> list[JobStep]:
+        if self._discovery is not None:
+            # only the listings made for the CIR metadata of the packet jobs are
+            # reused, the download of a missing junit file fails as fast as a
+            # listing would
+            _, junit_path = self._get_bucket_and_path_to_junit(job)
+            if self._discovery.has_listed_artifact(job, junit_path) is False:
+                logger.info("No junit file found for job: %s", job)
+                return []
+
         try:
             junit = self._download_junit(job)
         except exceptions.ClientError as e:
             logger.info("No junit file found for job: %s %s", job, e)
             return []
+        except utils.ArtifactTooLargeError as e:
+            # truncated junit files cannot be parsed, the job is skipped
+            logger.warning("Skipping junit file of job %s: %s", job, e)
+            job.junitTruncated = True
+            return []
+
+        if self._parse_executor is None:
+            return list(iter_junit_steps(job, junit))
 
-        return self._parse_junit_suite_into_steps(job, junit)
+        testcases = self._parse_executor.submit(parse_junit_testcases, junit).result()
+        return [JobStep.create_from_junit_testcase(job, case) for case in testcases]
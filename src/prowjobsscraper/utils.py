@@ -1,9 +1,16 @@
+import time
 from typing import Optional
 
 import mmh3
+from google.api_core import exceptions  # type: ignore
 from google.cloud import storage  # type: ignore
 from pydantic import HttpUrl
 
+from prowjobsscraper import fetch
+from prowjobsscraper.gcs_cache import GcsCache
+
+_gcs_cache: Optional[GcsCache] = None
+
 
 def get_gcs_base_path_from_job_url(
     url: Optional[HttpUrl],
@@ -15,10 +22,70 @@ def get_gcs_base_path_from_job_url(
     return "/".join(base_path)
 
 
-def download_from_gcs_as_string(client: storage.Client, bucket: str, path: str) -> str:
-    gcs_bucket = client.bucket(bucket)
-    gcs_blob = gcs_bucket.blob(path)
-    return gcs_blob.download_as_string()
+def set_gcs_cache(cache: Optional[GcsCache]) -> None:
+    """
+    Set the local cache checked by download_from_gcs_as_string, None disables it.
+    """
+    global _gcs_cache
+    _gcs_cache = cache
+
+
+class ArtifactTooLargeError(ValueError):
+    pass
+
+
+def download_from_gcs_as_string(
+    client: storage.Client, bucket: str, path: str, max_size: Optional[int] = None
+) -> str:
+    """
+    Download the artifact at path. When max_size is set, at most max_size + 1
+    bytes are downloaded and ArtifactTooLargeError is raised if the artifact
+    is larger than max_size.
+
+    When the artifact is cached, it is only downloaded again if the object was
+    overwritten since: the request fails with NotModified otherwise.
+    """
+    cached = None
+    if _gcs_cache is not None:
+        if _gcs_cache.is_missing(bucket, path):
+            raise exceptions.NotFound(f"{bucket}/{path} is known to be missing")
+        cached = _gcs_cache.get(bucket, path)
+
+    conditions = {}
+    if cached is not None and cached.generation is not None:
+        conditions["if_generation_not_match"] = cached.generation
+
+    gcs_blob = client.bucket(bucket).blob(path)
+    start = time.monotonic()
+    try:
+        # the range end is inclusive
+        data = gcs_blob.download_as_string(end=max_size, **conditions)
+    except exceptions.NotModified:
+        fetch.report_latency(time.monotonic() - start)
+        if cached is None:
+            raise
+        _check_size(bucket, path, cached.data, max_size)
+        # like download_as_string, the cache actually returns bytes
+        return cached.data  # type: ignore[return-value]
+    except exceptions.NotFound:
+        fetch.report_latency(time.monotonic() - start)
+        if _gcs_cache is not None:
+            _gcs_cache.record_missing(bucket, path)
+        raise
+    except fetch.THROTTLING_ERRORS:
+        fetch.report_throttling()
+        raise
+    fetch.report_latency(time.monotonic() - start)
+
+    _check_size(bucket, path, data, max_size)
+    if _gcs_cache is not None:
+        _gcs_cache.put(bucket, path, data, generation=gcs_blob.generation)
+    return data
+
+
+def _check_size(bucket: str, path: str, data: bytes, max_size: Optional[int]) -> None:
+    if max_size is not None and len(data) > max_size:
+        raise ArtifactTooLargeError(f"{bucket}/{path} is larger than {max_size} bytes")
 
 
 def generate_hash_from_strings(*strings) -> str:
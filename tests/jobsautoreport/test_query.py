@@ -0,0 +1,140 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from opensearchpy.serializer import JSONSerializer
+
+from jobsautoreport.query import Querier
+from prowjobsscraper.equinix_usages import EquinixUsage, EquinixUsageEvent
+from prowjobsscraper.event import (
+    JobDetails,
+    JobRefs,
+    SlimStepEvent,
+    StepDetails,
+    StepEvent,
+    StepJobDetails,
+)
+from prowjobsscraper.prowjob import CIResourceMetadata
+
+_JOB = JobDetails(
+    build_id="1640315275049963520",
+    cloud_cluster_profile="packet-assisted",
+    duration=2053,
+    ci_resource_metadata=CIResourceMetadata(provider="equinix", region="da"),
+    name="pull-ci-openshift-assisted-installer-agent-master-edge-e2e-metal-assisted",
+    refs=JobRefs(base_ref="master", org="openshift", repo="assisted-installer-agent"),
+    start_time=datetime(2023, 3, 27, 10, 30, 12, tzinfo=timezone.utc),
+    state="success",
+    type="presubmit",
+    url="test",
+    variant="edge",
+    context="e2e-metal-assisted",
+)
+
+_STEP_EVENT = StepEvent(
+    job=_JOB,
+    step=StepDetails(duration=456, name="baremetalds-packet-setup", state="success"),
+)
+
+_SLIM_STEP_EVENT = SlimStepEvent(
+    job=StepJobDetails(
+        build_id=_JOB.build_id,
+        name=_JOB.name,
+        start_time=_JOB.start_time,
+        type=_JOB.type,
+    ),
+    step=_STEP_EVENT.step,
+)
+
+_USAGE_EVENT = EquinixUsageEvent.create_from_equinix_usage(
+    EquinixUsage(
+        description=None,
+        facility="da11",
+        metro="da",
+        name="ipi-ci-op-0cdb4jh0-1640315275049963520",
+        plan="c3.medium.x86",
+        plan_version="c3.medium.x86 v1",
+        price=1.5,
+        quantity=1.0,
+        total=1.5,
+        type="Instance",
+        unit="hour",
+        start_date=datetime(2023, 3, 27, 10, 32, 0, tzinfo=timezone.utc),
+        end_date=None,
+    )
+)
+
+
+def _to_hit(document: dict) -> dict:
+    """Round-trip a document through the OpenSearch serializer, as it is when
+    read back from OpenSearch."""
+    return {"_source": json.loads(JSONSerializer().dumps(document))}
+
+
+@pytest.mark.parametrize("trusted_decode", [False, True])
+@patch("opensearchpy.helpers.scan")
+def test_querier_should_decode_documents(scan, trusted_decode):
+    querier = Querier(
+        opensearch_client=MagicMock(),
+        jobs_index="jobs-*",
+        steps_index="steps-*",
+        usages_index="usages-*",
+        trusted_decode=trusted_decode,
+    )
+    from_date = datetime(2023, 3, 20, tzinfo=timezone.utc)
+    to_date = datetime(2023, 3, 28, tzinfo=timezone.utc)
+
+    scan.return_value = [_to_hit({"job": _JOB.dict()})]
+    jobs = querier.query_jobs(from_date=from_date, to_date=to_date)
+    assert jobs == [_JOB]
+    assert jobs[0].start_time == _JOB.start_time
+
+    scan.return_value = [_to_hit(_STEP_EVENT.dict())]
+    assert querier.query_packet_setup_step_events(
+        from_date=from_date, to_date=to_date
+    ) == [_STEP_EVENT]
+
+    scan.return_value = [_to_hit(_USAGE_EVENT.dict())]
+    usages = querier.query_usage_events(from_date=from_date, to_date=to_date)
+    assert usages == [_USAGE_EVENT]
+    assert usages[0].usage.job_build_id == "1640315275049963520"
+
+
+@patch("opensearchpy.helpers.scan")
+def test_querier_should_join_slim_step_events_to_their_job(scan):
+    querier = Querier(
+        opensearch_client=MagicMock(),
+        jobs_index="jobs-*",
+        steps_index="steps-*",
+        usages_index="usages-*",
+        slim_steps_index="steps_slim-*",
+    )
+    orphan_step_event = _SLIM_STEP_EVENT.copy(
+        update={"job": _SLIM_STEP_EVENT.job.copy(update={"build_id": "1"})}
+    )
+    hits = {
+        "steps-*": [_to_hit(_STEP_EVENT.dict())],
+        "steps_slim-*": [
+            _to_hit(_SLIM_STEP_EVENT.dict()),
+            _to_hit(orphan_step_event.dict()),
+        ],
+        "jobs-*": [_to_hit({"job": _JOB.dict()})],
+    }
+    scan.side_effect = lambda client, query, index: hits[index]
+
+    step_events = querier.query_packet_setup_step_events(
+        from_date=datetime(2023, 3, 20, tzinfo=timezone.utc),
+        to_date=datetime(2023, 3, 28, tzinfo=timezone.utc),
+    )
+
+    # the step of the orphan job is skipped
+    assert step_events == [_STEP_EVENT, _STEP_EVENT]
+    assert [c.kwargs["index"] for c in scan.call_args_list] == [
+        "steps-*",
+        "steps_slim-*",
+        "jobs-*",
+    ]
+    assert scan.call_args.kwargs["query"] == {
+        "query": {"terms": {"job.build_id": ["1", _JOB.build_id]}}
+    }
@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pkg_resources
+import pytest
+from google.cloud import exceptions
+from pytest_httpserver import HTTPServer
+
+from prowjobsscraper import archive, cir_metadata, scraper, step
+from prowjobsscraper.equinix_usages import (
+    EquinixUsageIdentifier,
+    EquinixUsagesExtractor,
+)
+
+_USAGE = {
+    "description": None,
+    "facility": "da11",
+    "metro": "da",
+    "name": "ipi-ci-op-0wirr6qy-185f0-1638673073035022336",
+    "plan": "c3.medium.x86",
+    "plan_version": "c3.medium.x86 v1",
+    "price": 1.5,
+    "quantity": 1.0,
+    "total": 1.5,
+    "type": "Instance",
+    "unit": "hour",
+    "start_date": "2023-03-22T22:49:10Z",
+    "end_date": "2023-03-23T00:45:42Z",
+}
+
+
+def test_archived_job_list_should_be_replayed(httpserver: HTTPServer, tmp_path):
+    response = pkg_resources.resource_string(
+        __name__, "prowjob_assets/valid_prow_response.json"
+    )
+    httpserver.expect_oneshot_request("/jobs").respond_with_data(response)
+    run_archive = archive.Archive(str(tmp_path))
+
+    fetched = run_archive.fetch_job_list(
+        httpserver.url_for("/jobs"), item_filter=lambda i: True
+    )
+    replayed = run_archive.load_job_list(item_filter=lambda i: True)
+
+    assert len(fetched.items) == 1
+    assert replayed == fetched
+
+
+def test_archived_gcs_artifacts_should_be_replayed(tmp_path):
+    run_archive = archive.Archive(str(tmp_path))
+    gcs_client = MagicMock()
+    blob = gcs_client.bucket.return_value.blob.return_value
+    blob.download_as_string.return_value = b"<testsuites/>"
+
+    recording_client = archive.RecordingStorageClient(gcs_client, run_archive)
+    data = recording_client.bucket("bucket").blob("path/junit.xml").download_as_string()
+    assert data == b"<testsuites/>"
+    gcs_client.bucket.assert_called_once_with("bucket")
+    gcs_client.bucket.return_value.blob.assert_called_once_with("path/junit.xml")
+
+    replay_client = archive.ReplayStorageClient(run_archive)
+    replay_bucket = replay_client.bucket("bucket")
+    assert replay_bucket.blob("path/junit.xml").download_as_string() == data
+    with pytest.raises(exceptions.NotFound):
+        replay_bucket.blob("path/cir.json").download_as_string()
+
+
+def test_archived_equinix_usages_should_be_replayed(tmp_path):
+    run_archive = archive.Archive(str(tmp_path))
+    start_time = datetime(2023, 3, 20, tzinfo=timezone.utc)
+    end_time = datetime(2023, 3, 27, tzinfo=timezone.utc)
+
+    recording_extractor = archive.RecordingEquinixUsagesExtractor(
+        archive=run_archive,
+        project_id="id",
+        project_token="token",
+        start_time=start_time,
+        end_time=end_time,
+    )
+    with patch.object(
+        EquinixUsagesExtractor, "_fetch_raw_usages", return_value=[_USAGE]
+    ):
+        usages = recording_extractor.get_project_usages()
+
+    replay_extractor = archive.ReplayEquinixUsagesExtractor(run_archive)
+
+    assert len(usages) == 1
+    assert replay_extractor.get_project_usages() == usages
+
+
+def test_replay_should_run_the_scraper_from_the_archive(tmp_path):
+    run_archive = archive.Archive(str(tmp_path))
+    run_archive._write_json(
+        run_archive._JOB_LIST_FILENAME,
+        {
+            "items": [
+                json.loads(
+                    step.JobStep.create_from_string(_jobstep()).job.json(by_alias=True)
+                )
+            ]
+        },
+    )
+    job = run_archive.load_job_list(item_filter=lambda i: True).items[0]
+    junit_path = step.StepExtractor(
+        MagicMock(), "bucket"
+    )._get_bucket_and_path_to_junit(job)[1]
+    run_archive.write_gcs_artifact(
+        "test-platform-results",
+        junit_path,
+        pkg_resources.resource_string(__name__, "step_assets/junit_operator.xml"),
+    )
+    run_archive.write_equinix_usages(
+        datetime(2023, 3, 20, tzinfo=timezone.utc),
+        datetime(2023, 3, 27, tzinfo=timezone.utc),
+        [_USAGE],
+    )
+    run_archive.write_known_build_ids(set())
+    run_archive.write_known_usages_identifiers(
+        {EquinixUsageIdentifier(name=_USAGE["name"], plan=_USAGE["plan"])}
+    )
+
+    storage_client = archive.ReplayStorageClient(run_archive)
+    event_store = archive.ReplayEventStore(run_archive)
+    scrape = scraper.Scraper(
+        event_store,
+        step.StepExtractor(storage_client, "test-platform-results"),
+        cir_metadata.CIResourceMetadataExtractor(
+            storage_client, "test-platform-results"
+        ),
+        archive.ReplayEquinixUsagesExtractor(run_archive),
+    )
+    scrape.execute(run_archive.load_job_list(item_filter=scrape.is_assisted_job_item))
+
+    assert event_store._jobs_index.count == 1
+    assert event_store._steps_index.count == 3
+    assert event_store._usages_index.count == 0
+
+
+def _jobstep() -> bytes:
+    return pkg_resources.resource_string(__name__, "scraper_assets/jobstep.json")
+
+
+def test_replay_storage_client_should_list_archived_artifacts(tmp_path):
+    run_archive = archive.Archive(str(tmp_path))
+    run_archive.write_gcs_artifact("bucket", "job/1/artifacts/junit_operator.xml", b"")
+    run_archive.write_gcs_artifact("bucket", "job/2/artifacts/junit_operator.xml", b"")
+
+    blobs = archive.ReplayStorageClient(run_archive).list_blobs(
+        "bucket", prefix="job/1/artifacts/"
+    )
+
+    assert [b.name for b in blobs] == ["job/1/artifacts/junit_operator.xml"]
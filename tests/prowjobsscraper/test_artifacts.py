@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pkg_resources
+from google.api_core import exceptions
+
+from prowjobsscraper import artifacts, step
+from prowjobsscraper.prowjob import ProwJobs
+
+_BASE_PATH = "pr-logs/pull/openshift_assisted-service/4121/pull-ci-openshift-assisted-service-master-edge-e2e-metal-assisted/1549300279667593216"
+
+
+def _jobs() -> ProwJobs:
+    return ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, "step_assets/prowjobs.json")
+    )
+
+
+def test_artifacts_should_be_listed_once_per_job():
+    job = _jobs().items[0]
+    client = MagicMock()
+    client.list_blobs.return_value = [
+        SimpleNamespace(name=f"{_BASE_PATH}/artifacts/junit_operator.xml")
+    ]
+    discovery = artifacts.ArtifactDiscovery(client, "origin-ci-test")
+
+    assert discovery.has_artifact(job, f"{_BASE_PATH}/artifacts/junit_operator.xml")
+    assert not discovery.has_artifact(
+        job, f"{_BASE_PATH}/artifacts/ctx/ofcir-gather/artifacts/cir.json"
+    )
+
+    client.list_blobs.assert_called_once_with(
+        "origin-ci-test",
+        prefix=f"{_BASE_PATH}/artifacts/",
+        match_glob=f"{_BASE_PATH}/artifacts/{{junit_operator.xml,*/ofcir-gather/artifacts/*.json}}",
+    )
+
+
+def test_artifacts_should_be_assumed_present_when_listing_fails():
+    job = _jobs().items[0]
+    client = MagicMock()
+    client.list_blobs.side_effect = exceptions.ServiceUnavailable("test")
+    discovery = artifacts.ArtifactDiscovery(client, "origin-ci-test")
+
+    assert discovery.has_artifact(job, f"{_BASE_PATH}/artifacts/junit_operator.xml")
+
+
+def test_step_extractor_should_not_download_missing_listed_junit():
+    jobs = _jobs()
+    client = MagicMock()
+    client.list_blobs.return_value = []
+    discovery = artifacts.ArtifactDiscovery(client, "origin-ci-test")
+    # listed for the CIR metadata of the job
+    discovery.has_artifact(jobs.items[0], f"{_BASE_PATH}/artifacts/cir.json")
+    step_extractor = step.StepExtractor(client, "origin-ci-test", discovery=discovery)
+
+    assert step_extractor.parse_prow_jobs(jobs) == []
+    client.bucket.assert_not_called()
+
+
+def test_step_extractor_should_not_list_artifacts_to_download_junit():
+    client = MagicMock()
+    client.bucket.return_value.blob.return_value.download_as_string.side_effect = (
+        exceptions.NotFound("test")
+    )
+    step_extractor = step.StepExtractor(
+        client,
+        "origin-ci-test",
+        discovery=artifacts.ArtifactDiscovery(client, "origin-ci-test"),
+    )
+
+    assert step_extractor.parse_prow_jobs(_jobs()) == []
+    client.list_blobs.assert_not_called()
+    client.bucket.return_value.blob.assert_called_once_with(
+        f"{_BASE_PATH}/artifacts/junit_operator.xml"
+    )
@@ -1,3 +1,5 @@
+import threading
+import time
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
@@ -8,22 +10,36 @@ import pytest
 from providers.aws import ProviderAWS
 from providers.equinix import ProviderEquinix
 from providers.ibm_cloud import ProviderIBMCloud
+from providers.provider import get_provider_by_id
+from prowjobsscraper import fetch
+from prowjobsscraper.artifacts import ArtifactDiscovery
 from prowjobsscraper.cir_metadata import CIResourceMetadataExtractor
 
 
 def make_prow_job(
-    packet_profile=None, url="gs://bucket/path", context="ctx", job_name="job1"
+    packet_profile=None,
+    url="gs://bucket/path",
+    context="ctx",
+    job_name="job1",
+    gcs_base_path="base-path",
 ):
     labels = SimpleNamespace(cloudClusterProfile=packet_profile)
     metadata = SimpleNamespace(labels=labels)
     status = SimpleNamespace(url=url)
     spec = SimpleNamespace(job=job_name)
-    return SimpleNamespace(metadata=metadata, status=status, context=context, spec=spec)
+    return SimpleNamespace(
+        metadata=metadata,
+        status=status,
+        context=context,
+        spec=spec,
+        gcs_base_path=gcs_base_path,
+    )
 
 
 class DummyProvider:
     def __init__(self, region, hostname, os_):
         self.id = "dummy"
+        self.batches = []
         self._region = region
         self._hostname = hostname
         self._os = os_
@@ -33,6 +49,15 @@ class DummyProvider:
             region=self._region, hostname=self._hostname, os=self._os
         )
 
+    def get_provider_metadata_batch(
+        self, prowjobs, gcs_client, gcs_bucket_name, fetcher
+    ):
+        self.batches.append(prowjobs)
+        return [
+            self.get_provider_metadata_from_prowjob(j, gcs_client, gcs_bucket_name)
+            for j in prowjobs
+        ]
+
 
 def test_get_metadata_success(monkeypatch):
     extractor = CIResourceMetadataExtractor(
@@ -122,9 +147,6 @@ def test_set_cir_metadata_assigns(monkeypatch):
     job = make_prow_job(packet_profile="packet-group", url="gs://b/p", context="ctx1")
 
     monkeypatch.setattr(extractor, "_should_job_have_metadata", lambda job: True)
-    monkeypatch.setattr(
-        "prowjobsscraper.utils.get_gcs_base_path_from_job_url", lambda url: "base-path"
-    )
 
     dummy_cir = SimpleNamespace(provider="dummy", region=None, hostname=None, os=None)
     monkeypatch.setattr(extractor, "_get_cir_metadata", lambda base, job: dummy_cir)
@@ -170,10 +192,6 @@ def test_set_cir_metadata_skips_unknown_provider(monkeypatch):
     job = make_prow_job(packet_profile="packet", url="gs://b/p", context="ctx")
 
     monkeypatch.setattr(extractor, "_should_job_have_metadata", lambda job: True)
-    monkeypatch.setattr(
-        "prowjobsscraper.utils.get_gcs_base_path_from_job_url",
-        lambda url: "base-path",
-    )
     dummy_cir = SimpleNamespace(
         provider="no-such-provider", region=None, hostname=None, os=None
     )
@@ -188,19 +206,59 @@ def test_set_cir_metadata_skips_unknown_provider(monkeypatch):
     assert not hasattr(job, "cirMetadata")
 
 
-def test_hydrate_calls_set_for_each_job(monkeypatch):
+def test_hydrate_with_prefetch_fetches_provider_metadata_in_bulk(monkeypatch):
     extractor = CIResourceMetadataExtractor(
-        client=MagicMock(), gcs_bucket_name="bucket"
+        client=MagicMock(), gcs_bucket_name="bucket", prefetch=True
     )
     job1 = make_prow_job(packet_profile="packet", url="gs://b1", context="ctx1")
-    job2 = make_prow_job(packet_profile="packet", url="gs://b2", context="ctx2")
-    jobs = SimpleNamespace(items=[job1, job2])
-    calls = []
-    monkeypatch.setattr(extractor, "_set_cir_metadata", lambda job: calls.append(job))
+    job2 = make_prow_job(packet_profile=None, url="gs://b2", context="ctx2")
+    job3 = make_prow_job(packet_profile="packet", url="gs://b3", context="ctx3")
+    monkeypatch.setattr(
+        extractor,
+        "_get_cir_metadata",
+        lambda base, job: SimpleNamespace(
+            provider="dummy", region=None, hostname=None, os=None
+        ),
+    )
+    provider = DummyProvider(region="r1", hostname="h1", os_="o1")
+    monkeypatch.setattr("prowjobsscraper.cir_metadata.SUPPORTED_PROVIDERS", [provider])
+    monkeypatch.setattr(
+        "prowjobsscraper.cir_metadata.get_provider_by_id",
+        lambda id: provider if id == "dummy" else None,
+    )
 
-    extractor.hydrate(jobs)
+    extractor.hydrate(SimpleNamespace(items=[job1, job2, job3]))
 
-    assert calls == [job1, job2]
+    assert provider.batches == [[job1, job3]]
+    assert job1.cirMetadata.region == job3.cirMetadata.region == "r1"
+    assert not hasattr(job2, "cirMetadata")
+
+
+def test_hydrate_resolves_provider_metadata_in_bulk(monkeypatch):
+    extractor = CIResourceMetadataExtractor(
+        client=MagicMock(), gcs_bucket_name="bucket"
+    )
+    job1 = make_prow_job(packet_profile="packet", context="ctx1")
+    job2 = make_prow_job(packet_profile="packet", context="ctx2")
+    job3 = make_prow_job(packet_profile=None, context="ctx3")
+    monkeypatch.setattr(
+        extractor,
+        "_get_cir_metadata",
+        lambda base, job: SimpleNamespace(
+            provider="dummy", region=None, hostname=None, os=None
+        ),
+    )
+    provider = DummyProvider(region="r1", hostname="h1", os_="o1")
+    monkeypatch.setattr(
+        "prowjobsscraper.cir_metadata.get_provider_by_id",
+        lambda id: provider if id == "dummy" else None,
+    )
+
+    extractor.hydrate(SimpleNamespace(items=[job1, job2, job3]))
+
+    assert provider.batches == [[job1, job2]]
+    assert job1.cirMetadata.region == job2.cirMetadata.region == "r1"
+    assert not hasattr(job3, "cirMetadata")
 
 
 def test_hydrate_integration_with_providers(monkeypatch):
@@ -293,3 +351,178 @@ def test_hydrate_integration_with_providers(monkeypatch):
     assert job_aws.cirMetadata.region == "us-east-1"
     assert job_aws.cirMetadata.hostname == "i-03c9cfc7f80c31c90"
     assert job_aws.cirMetadata.os == "ami-0a73e96a849c232cc"
+
+
+def test_get_cir_metadata_should_not_download_missing_metadata(monkeypatch):
+    discovery = MagicMock()
+    discovery.has_artifact.return_value = False
+    extractor = CIResourceMetadataExtractor(
+        client=MagicMock(), gcs_bucket_name="bucket", discovery=discovery
+    )
+    download = MagicMock()
+    monkeypatch.setattr("prowjobsscraper.utils.download_from_gcs_as_string", download)
+
+    job = make_prow_job(packet_profile="packet", context="ctx")
+    assert extractor._get_cir_metadata("base-path", job) is None
+
+    discovery.has_artifact.assert_called_once_with(
+        job, "base-path/artifacts/ctx/ofcir-gather/artifacts/cir.json"
+    )
+    download.assert_not_called()
+
+
+def _list_blobs(paths):
+    """Fake list_blobs listing the paths of the base path of each request."""
+
+    def list_blobs(bucket, prefix, match_glob):
+        time.sleep(0.02)
+        return [SimpleNamespace(name=p) for p in paths if p.startswith(prefix)]
+
+    return list_blobs
+
+
+def test_prefetch_should_fetch_provider_metadata_with_cir_metadata(monkeypatch):
+    cir_json = pkg_resources.resource_string(
+        __name__, "cir_metadata_assets/cir_equinix_metadata.json"
+    ).decode()
+    equinix_json = pkg_resources.resource_string(
+        __name__, "cir_metadata_assets/equinix_metadata.json"
+    ).decode()
+    provider_metadata_requested = threading.Event()
+    downloads = []
+
+    def download(client, bucket, path):
+        downloads.append(path)
+        if path.endswith("cir.json"):
+            # only returns once the provider metadata are being fetched
+            assert provider_metadata_requested.wait(timeout=5)
+            return cir_json
+        provider_metadata_requested.set()
+        return equinix_json
+
+    monkeypatch.setattr("prowjobsscraper.utils.download_from_gcs_as_string", download)
+    client = MagicMock()
+    client.list_blobs.side_effect = _list_blobs(
+        [
+            "base-path/artifacts/ctx/ofcir-gather/artifacts/cir.json",
+            "base-path/artifacts/ctx/ofcir-gather/artifacts/equinix-metadata.json",
+        ]
+    )
+    extractor = CIResourceMetadataExtractor(
+        client=client,
+        gcs_bucket_name="bucket",
+        fetcher=fetch.Fetcher(concurrency=2),
+        discovery=ArtifactDiscovery(client, "bucket"),
+        prefetch=True,
+    )
+    job = make_prow_job(packet_profile="packet")
+
+    extractor.hydrate(SimpleNamespace(items=[job]))
+    extractor.close()
+
+    assert job.cirMetadata.region == "da"
+    assert sorted(downloads) == [
+        "base-path/artifacts/ctx/ofcir-gather/artifacts/cir.json",
+        "base-path/artifacts/ctx/ofcir-gather/artifacts/equinix-metadata.json",
+    ]
+
+
+def test_prefetch_should_list_the_artifacts_of_each_job_once(monkeypatch):
+    monkeypatch.setattr(
+        "prowjobsscraper.utils.download_from_gcs_as_string",
+        lambda client, bucket, path: None,
+    )
+    jobs = [
+        make_prow_job(packet_profile="packet", gcs_base_path=f"base-path-{i}")
+        for i in range(20)
+    ]
+    client = MagicMock()
+    client.list_blobs.side_effect = _list_blobs(
+        [
+            f"base-path-{i}/artifacts/ctx/ofcir-gather/artifacts/{name}"
+            for i in range(20)
+            for name in ("cir.json", "equinix-metadata.json")
+        ]
+    )
+    fetcher = fetch.Fetcher(concurrency=4)
+    in_flight, max_in_flight = 0, 0
+    lock = threading.Lock()
+    acquire_slot, release_slot = fetcher._acquire_slot, fetcher._release_slot
+
+    def count_acquire():
+        nonlocal in_flight, max_in_flight
+        acquire_slot()
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+
+    def count_release():
+        nonlocal in_flight
+        with lock:
+            in_flight -= 1
+        release_slot()
+
+    monkeypatch.setattr(fetcher, "_acquire_slot", count_acquire)
+    monkeypatch.setattr(fetcher, "_release_slot", count_release)
+    extractor = CIResourceMetadataExtractor(
+        client=client,
+        gcs_bucket_name="bucket",
+        fetcher=fetcher,
+        discovery=ArtifactDiscovery(client, "bucket"),
+        prefetch=True,
+    )
+
+    extractor.hydrate(SimpleNamespace(items=jobs))
+    extractor.close()
+
+    assert client.list_blobs.call_count == len(jobs)
+    # the prefetches and the CIR metadata share the concurrency of the fetcher
+    assert max_in_flight <= 4
+
+
+def test_prefetch_should_skip_jobs_without_metadata(monkeypatch):
+    download = MagicMock()
+    monkeypatch.setattr("prowjobsscraper.utils.download_from_gcs_as_string", download)
+    discovery = MagicMock()
+    extractor = CIResourceMetadataExtractor(
+        client=MagicMock(), gcs_bucket_name="bucket", discovery=discovery, prefetch=True
+    )
+
+    extractor.hydrate(SimpleNamespace(items=[make_prow_job(packet_profile="aws")]))
+
+    discovery.has_artifact.assert_not_called()
+    download.assert_not_called()
+
+
+def test_provider_metadata_batch_should_keep_jobs_order(monkeypatch):
+    aws_json = pkg_resources.resource_string(
+        __name__, "cir_metadata_assets/aws_metadata.json"
+    ).decode()
+    monkeypatch.setattr(
+        "prowjobsscraper.utils.download_from_gcs_as_string",
+        lambda client, bucket, path: aws_json if "ctx1" in path else "{}",
+    )
+    provider = get_provider_by_id("aws")
+
+    metadata = provider.get_provider_metadata_batch(
+        [make_prow_job(context="ctx1"), make_prow_job(context="ctx2")],
+        gcs_client=MagicMock(),
+        gcs_bucket_name="bucket",
+        fetcher=fetch.Fetcher(concurrency=2),
+    )
+
+    assert metadata[0].region == "us-east-1"
+    assert metadata[1] is None
+    assert get_provider_by_id("no-such-provider") is None
+
+
+def test_close_should_stop_the_prefetch_threads():
+    extractor = CIResourceMetadataExtractor(
+        client=MagicMock(), gcs_bucket_name="bucket", prefetch=True
+    )
+    executor = extractor._prefetch_executor
+
+    extractor.close()
+
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
@@ -0,0 +1,49 @@
+import pytest
+
+from prowjobsscraper.classifier import JobClass, JobClassifier
+
+
+@pytest.mark.parametrize(
+    "job_name, expected",
+    [
+        (
+            "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws",
+            JobClass.ASSISTED | JobClass.SUBSYSTEM,
+        ),
+        (
+            "periodic-ci-openshift-assisted-test-infra-master-e2e-metal-assisted",
+            JobClass.ASSISTED | JobClass.E2E,
+        ),
+        (
+            "periodic-openshift-release-fast-forward-assisted-service",
+            JobClass.ASSISTED | JobClass.FAST_FORWARD,
+        ),
+        (
+            "rehearse-4121-pull-ci-openshift-assisted-service-master-e2e-metal-assisted",
+            JobClass.ASSISTED | JobClass.REHEARSAL | JobClass.E2E,
+        ),
+        ("pull-ci-openshift-origin-master-unit", JobClass.NONE),
+    ],
+)
+def test_job_names_should_be_classified(job_name, expected):
+    assert JobClassifier().classify(job_name) == expected
+
+
+def test_classification_should_be_memoized_by_job_name():
+    job_classifier = JobClassifier()
+    job_name = "pull-ci-openshift-assisted-service-master-e2e-metal-assisted"
+
+    for _ in range(3):
+        job_classifier.classify(job_name)
+
+    cache_info = job_classifier.classify.cache_info()
+    assert cache_info.hits == 2
+    assert cache_info.misses == 1
+
+
+def test_rules_should_be_overridden_from_json():
+    job_classifier = JobClassifier.create_from_json('{"E2E": "^e2e-|-e2e-"}')
+
+    assert job_classifier.classify("pull-ci-openshift-origin-e2e-aws") == JobClass.E2E
+    assert job_classifier.classify("pull-ci-openshift-origin-pe2e") == JobClass.NONE
+    assert JobClassifier.create_from_json(None).classify("foo-e2e") == JobClass.E2E
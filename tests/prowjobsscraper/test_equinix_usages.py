@@ -2,7 +2,10 @@ from datetime import datetime, timezone
 from typing import Any
 from unittest.mock import MagicMock, patch
 
-from prowjobsscraper.equinix_usages import EquinixUsagesExtractor
+from prowjobsscraper.equinix_usages import (
+    EquinixUsageIdentifier,
+    EquinixUsagesExtractor,
+)
 
 
 @patch("prowjobsscraper.equinix_usages.requests")
@@ -111,3 +114,21 @@ def test_get_project_usages(requests: MagicMock):
         )
         == 3
     )
+
+
+def test_usage_identifiers_should_differ_by_plan():
+    name = "ipi-ci-op-wyxmd7pq-21be9-1646436741441130496"
+
+    assert EquinixUsageIdentifier(name, "m3.large.x86") != EquinixUsageIdentifier(
+        name, "Outbound Bandwidth"
+    )
+    assert (
+        len(
+            {
+                EquinixUsageIdentifier(name, "m3.large.x86"),
+                EquinixUsageIdentifier(name, "Outbound Bandwidth"),
+                EquinixUsageIdentifier(name=name, plan="m3.large.x86"),
+            }
+        )
+        == 2
+    )
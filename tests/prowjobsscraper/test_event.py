@@ -1,3 +1,5 @@
+import dataclasses
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, call, patch
 
 import pkg_resources
@@ -20,9 +22,9 @@ _EXPECTED_PREVIOUS_INDEX_SUFFIX = "2022.51"
 def test_indices_should_be_created_when_required():
     def exists_side_effect(index: str, **kwargs):
         """
-        Side effect to simulate that jobs and usages indices already exists while steps index need to be created.
+        Side effect to simulate that all indices already exist but the steps index, which needs to be created.
         """
-        return index.startswith("jobs") or index.startswith("usages")
+        return not index.startswith("steps-")
 
     es_client = MagicMock()
     es_client.indices.exists.side_effect = exists_side_effect
@@ -37,9 +39,11 @@ def test_indices_should_be_created_when_required():
     expected_calls_exists = [
         call(index=f"jobs-{_EXPECTED_CURRENT_INDEX_SUFFIX}"),
         call(index=f"steps-{_EXPECTED_CURRENT_INDEX_SUFFIX}"),
+        call(index=f"steps_failure_details-{_EXPECTED_CURRENT_INDEX_SUFFIX}"),
         call(index=f"usages-{_EXPECTED_CURRENT_INDEX_SUFFIX}"),
+        call(index="jobs_build_ids"),
     ]
-    assert es_client.indices.exists.call_count == 3
+    assert es_client.indices.exists.call_count == 5
     es_client.indices.exists.assert_has_calls(expected_calls_exists, any_order=True)
 
     es_client.indices.create.assert_called_once()
@@ -50,46 +54,103 @@ def test_indices_should_be_created_when_required():
     )
 
 
+@patch("opensearchpy.helpers.bulk")
+def test_indices_should_follow_the_current_week(bulk):
+    es_client = MagicMock()
+    es_client.indices.exists.return_value = False
+
+    with freeze_time(_FREEZE_TIME) as frozen_time:
+        event_store = event.EventStoreElastic(
+            client=es_client,
+            job_index_basename="jobs",
+            step_index_basename="steps",
+            usage_index_basename="usages",
+        )
+        event_store.index_prow_jobs([])
+        assert es_client.indices.create.call_count == 5
+
+        frozen_time.tick(delta=timedelta(weeks=1))
+        event_store.index_prow_jobs([])
+
+    assert es_client.indices.create.call_count == 6
+    assert es_client.indices.create.call_args.kwargs["index"] == "jobs-2023.01"
+    assert bulk.call_count == 4
+
+
 @freeze_time(_FREEZE_TIME)
-@patch("opensearchpy.helpers.scan")
-def test_scan_build_id_from_jobs_index_when_results_are_expected(scan):
+@patch("opensearchpy.helpers.bulk")
+@patch("opensearchpy.helpers.scan", return_value=[])
+def test_known_build_ids_should_be_looked_up_in_the_build_ids_index(scan, bulk):
     es_client = MagicMock()
-    scan.return_value = [
-        {"_source": {"job": {"build_id": 1}}},
-        {"_source": {"job": {"build_id": 2}}},
-        {"_source": {"job": {"build_id": 3}}},
-    ]
+    es_client.mget.return_value = {
+        "docs": [
+            {"_id": "1", "found": True},
+            {"_id": "2", "found": False},
+        ]
+    }
     event_store = event.EventStoreElastic(
         client=es_client,
         job_index_basename="jobs",
         step_index_basename="steps",
         usage_index_basename="usages",
     )
-    build_ids = event_store.scan_build_ids()
 
-    expected_search_indices = (
-        f"jobs-{_EXPECTED_CURRENT_INDEX_SUFFIX},jobs-{_EXPECTED_PREVIOUS_INDEX_SUFFIX}"
-    )
+    build_ids = event_store.get_known_build_ids(["2", "1", "1"])
 
+    es_client.mget.assert_called_once_with(
+        index="jobs_build_ids", body={"ids": ["1", "2"]}, _source=False
+    )
+    # only the build id missing from the build ids index is searched, in the
+    # jobs indices of the current and previous weeks
     scan.assert_called_once()
-    assert scan.call_args.kwargs["index"] == expected_search_indices
-    assert build_ids == {1, 2, 3}
+    assert scan.call_args.kwargs["index"] == (
+        f"jobs-{_EXPECTED_CURRENT_INDEX_SUFFIX},jobs-{_EXPECTED_PREVIOUS_INDEX_SUFFIX}"
+    )
+    assert scan.call_args.kwargs["query"]["query"] == {"terms": {"job.build_id": ["2"]}}
+    bulk.assert_not_called()
+    assert build_ids == {"1"}
 
 
-@patch("opensearchpy.helpers.scan", return_value=[])
-def test_scan_build_id_from_jobs_index_when_no_results(scan):
+@patch("opensearchpy.helpers.bulk")
+@patch("opensearchpy.helpers.scan")
+def test_known_build_ids_found_in_jobs_indices_should_be_registered(scan, bulk):
     es_client = MagicMock()
+    es_client.mget.return_value = {"docs": [{"_id": "1", "found": False}]}
+    scan.return_value = [{"_source": {"job": {"build_id": "1"}}}]
+    event_store = event.EventStoreElastic(
+        client=es_client,
+        job_index_basename="jobs",
+        step_index_basename="steps",
+        usage_index_basename="usages",
+    )
+
+    build_ids = event_store.get_known_build_ids(["1"])
+
+    assert build_ids == {"1"}
+    bulk.assert_called_once()
+    assert list(bulk.call_args.args[1]) == [
+        {
+            "_index": "jobs_build_ids",
+            "_op_type": "index",
+            "_id": "1",
+            "_source": {"build_id": "1"},
+        }
+    ]
 
+
+@patch("opensearchpy.helpers.scan")
+def test_known_build_ids_should_not_be_looked_up_when_there_is_no_candidate(scan):
+    es_client = MagicMock()
     event_store = event.EventStoreElastic(
         client=es_client,
         job_index_basename="jobs",
         step_index_basename="steps",
         usage_index_basename="usages",
     )
-    build_ids = event_store.scan_build_ids()
 
-    scan.assert_called_once()
-    assert len(build_ids) == 0
+    assert event_store.get_known_build_ids([]) == set()
+    es_client.mget.assert_not_called()
+    scan.assert_not_called()
 
 
 @freeze_time(_FREEZE_TIME)
@@ -167,13 +228,26 @@ def test_scan_usage_identifiers_from_usages_index_when_results_are_expected(scan
         step_index_basename="steps",
         usage_index_basename="usages",
     )
-    usage_identifiers = event_store.scan_usages_identifiers()
-
-    expected_search_indices = f"usages-{_EXPECTED_CURRENT_INDEX_SUFFIX},usages-{_EXPECTED_PREVIOUS_INDEX_SUFFIX}"
+    start_time = datetime(2023, 4, 6, tzinfo=timezone.utc)
+    end_time = datetime(2023, 4, 13, 12, tzinfo=timezone.utc)
+    usage_identifiers = event_store.scan_usages_identifiers(
+        start_time=start_time, end_time=end_time
+    )
 
     scan.assert_called_once()
 
-    assert scan.call_args.kwargs["index"] == expected_search_indices
+    assert scan.call_args.kwargs["index"] == "usages-*"
+    assert scan.call_args.kwargs["query"] == {
+        "_source": ["usage.name", "usage.plan"],
+        "query": {
+            "bool": {
+                "filter": [
+                    {"range": {"usage.start_date": {"lte": end_time}}},
+                    {"range": {"usage.end_date": {"gte": start_time}}},
+                ]
+            }
+        },
+    }
     assert usage_identifiers == {
         EquinixUsageIdentifier(
             name="ipi-ci-op-w7y9z2qq-34a4a-1646469006330171392", plan="c3.medium.x86"
@@ -188,12 +262,88 @@ def test_scan_usage_identifiers_from_usages_index_when_results_are_expected(scan
     }
 
 
+@freeze_time(_FREEZE_TIME)
+@patch("opensearchpy.helpers.bulk", return_value=[])
+def test_index_job_steps_should_build_job_details_once_per_job(bulk):
+    job_step = step.JobStep.create_from_string(
+        pkg_resources.resource_string(__name__, f"event_assets/jobstep.json")
+    )
+    other_step = dataclasses.replace(job_step, name="other-step")
+
+    event_store = event.EventStoreElastic(
+        client=MagicMock(),
+        job_index_basename="jobs",
+        step_index_basename="steps",
+        usage_index_basename="usages",
+    )
+
+    with patch.object(
+        event.JobEvent,
+        "create_from_prow_job",
+        wraps=event.JobEvent.create_from_prow_job,
+    ) as create_from_prow_job, patch(
+        "prowjobsscraper.event.get_details_hash", wraps=event.get_details_hash
+    ) as get_details_hash:
+        event_store.index_job_steps(steps=[job_step, other_step])
+        docs = list(bulk.call_args_list[0].args[1])
+        failures_details = list(bulk.call_args_list[1].args[1])
+
+    create_from_prow_job.assert_called_once()
+    # the details of each step are hashed once
+    assert get_details_hash.call_count == 2
+    assert [d["doc"]["step"]["name"] for d in docs] == [job_step.name, "other-step"]
+    assert docs[0]["doc"]["job"] == docs[1]["doc"]["job"]
+    assert docs[0]["doc"] == event.StepEvent.create_from_job_step(job_step).dict()
+    # both steps share the same failure details
+    assert [d["_id"] for d in failures_details] == [
+        event.get_details_hash(job_step.details)
+    ]
+
+
+@freeze_time(_FREEZE_TIME)
+@patch("opensearchpy.helpers.bulk", return_value=[])
+def test_index_slim_job_steps_should_only_embed_the_step_job_details(bulk):
+    job_step = step.JobStep.create_from_string(
+        pkg_resources.resource_string(__name__, f"event_assets/jobstep.json")
+    )
+
+    es_client = MagicMock()
+    es_client.indices.exists.return_value = False
+    event_store = event.EventStoreElastic(
+        client=es_client,
+        job_index_basename="jobs",
+        step_index_basename="steps",
+        usage_index_basename="usages",
+        slim_steps=True,
+    )
+    event_store.index_job_steps(steps=[job_step])
+    docs = list(bulk.call_args_list[0].args[1])
+
+    assert docs[0]["doc"] == event.SlimStepEvent.create_from_job_step(job_step).dict()
+    assert docs[0]["doc"]["job"] == {
+        "build_id": job_step.job.status.build_id,
+        "name": job_step.job.spec.job,
+        "start_time": job_step.job.status.startTime,
+        "type": job_step.job.spec.type,
+    }
+    # the full steps are kept apart, their mapping differs
+    assert docs[0]["_index"] == f"steps_slim-{_EXPECTED_CURRENT_INDEX_SUFFIX}"
+    steps_schema = next(
+        c.kwargs["body"]
+        for c in es_client.indices.create.call_args_list
+        if c.kwargs["index"].startswith("steps_slim-")
+    )
+    assert steps_schema == pkg_resources.resource_string(
+        "prowjobsscraper.event", "indices/slim_steps_schema.json"
+    )
+
+
 @freeze_time(_FREEZE_TIME)
 @patch("opensearchpy.helpers.bulk", return_value=[])
 def test_index_job_step_when_successful(bulk):
     expected_step_index = f"steps-{_EXPECTED_CURRENT_INDEX_SUFFIX}"
 
-    job_step = step.JobStep.parse_raw(
+    job_step = step.JobStep.create_from_string(
         pkg_resources.resource_string(__name__, f"event_assets/jobstep.json")
     )
 
@@ -206,8 +356,8 @@ def test_index_job_step_when_successful(bulk):
     )
 
     event_store.index_job_steps(steps=[job_step])
-    bulk.assert_called_once()
-    assert bulk.call_args.args[0] == es_client
+    assert bulk.call_count == 2
+    assert bulk.call_args_list[0].args[0] == es_client
 
     step_event = event.StepEvent.create_from_job_step(job_step)
     expected_job_step = dict()
@@ -219,11 +369,24 @@ def test_index_job_step_when_successful(bulk):
     expected_job_step["doc_as_upsert"] = True
     expected_job_step["doc"] = step_event.dict()
 
-    indexed_job_step = list(bulk.call_args.args[1])
+    indexed_job_step = list(bulk.call_args_list[0].args[1])
 
     assert indexed_job_step[0] == expected_job_step
+    assert len(step_event.step.details) == 1024
+    assert step_event.step.details_hash == event.get_details_hash(job_step.details)
+
+    details_hash = step_event.step.details_hash
+    assert list(bulk.call_args_list[1].args[1]) == [
+        {
+            "_index": f"steps_failure_details-{_EXPECTED_CURRENT_INDEX_SUFFIX}",
+            "_op_type": "update",
+            "_id": details_hash,
+            "doc_as_upsert": True,
+            "doc": {"failure": {"hash": details_hash, "details": job_step.details}},
+        }
+    ]
 
-    es_client.indices.refresh.assert_called_once_with(index=expected_step_index)
+    es_client.indices.refresh.assert_any_call(index=expected_step_index)
 
 
 @freeze_time(_FREEZE_TIME)
@@ -282,7 +445,7 @@ def test_index_equinix_usages_when_successful(bulk):
 def test_index_prow_job_when_successful(bulk):
     expected_job_index = f"jobs-{_EXPECTED_CURRENT_INDEX_SUFFIX}"
 
-    job_step = step.JobStep.parse_raw(
+    job_step = step.JobStep.create_from_string(
         pkg_resources.resource_string(__name__, f"event_assets/jobstep.json")
     )
     prow_job = job_step.job
@@ -298,8 +461,8 @@ def test_index_prow_job_when_successful(bulk):
     event_store.index_prow_jobs(jobs=[prow_job])
 
     # check that bulk was called with the client and that "_index" key was appended to the document
-    bulk.assert_called_once()
-    assert bulk.call_args.args[0] == es_client
+    assert bulk.call_count == 2
+    assert bulk.call_args_list[0].args[0] == es_client
 
     job_event = event.JobEvent.create_from_prow_job(prow_job)
     expected_prow_job = dict()
@@ -309,15 +472,25 @@ def test_index_prow_job_when_successful(bulk):
     expected_prow_job["doc_as_upsert"] = True
     expected_prow_job["doc"] = job_event.dict()
 
-    indexed_prow_job = list(bulk.call_args.args[1])
+    indexed_prow_job = list(bulk.call_args_list[0].args[1])
 
     assert indexed_prow_job[0] == expected_prow_job
 
     es_client.indices.refresh.assert_called_once_with(index=expected_job_index)
 
+    # the build id is registered for the next lookups
+    assert list(bulk.call_args_list[1].args[1]) == [
+        {
+            "_index": "jobs_build_ids",
+            "_op_type": "index",
+            "_id": prow_job.status.build_id,
+            "_source": {"build_id": prow_job.status.build_id},
+        }
+    ]
+
 
 def test_job_step_successfully_parse_into_step_event():
-    job_step = step.JobStep.parse_raw(
+    job_step = step.JobStep.create_from_string(
         pkg_resources.resource_string(__name__, f"event_assets/jobstep.json")
     )
     step_event = event.StepEvent.create_from_job_step(job_step)
@@ -0,0 +1,154 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from prowjobsscraper import fetch, utils
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetcher_should_return_results_in_items_order(concurrency):
+    fetcher = fetch.Fetcher(concurrency=concurrency)
+
+    assert fetcher.map(lambda i: i * 2, range(10)) == [i * 2 for i in range(10)]
+    assert fetcher.map(lambda i: i, []) == []
+
+
+def test_fetcher_should_run_fetches_concurrently():
+    # each fetch waits for the two others: this only completes when the three
+    # of them run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_others(i: int) -> int:
+        barrier.wait()
+        return i
+
+    assert fetch.Fetcher(concurrency=3).map(wait_for_others, [1, 2, 3]) == [1, 2, 3]
+
+
+def test_concurrent_maps_should_share_the_concurrency():
+    fetcher = fetch.Fetcher(concurrency=2)
+    lock = threading.Lock()
+    in_flight, max_in_flight = 0, 0
+
+    def count(i: int) -> int:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.001)
+        with lock:
+            in_flight -= 1
+        return i
+
+    threads = [
+        threading.Thread(target=fetcher.map, args=(count, range(50))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max_in_flight == 2
+
+
+def test_fetcher_should_propagate_exceptions():
+    def fail(i: int) -> int:
+        raise RuntimeError(f"failed to fetch {i}")
+
+    with pytest.raises(RuntimeError):
+        fetch.Fetcher(concurrency=2).map(fail, [1, 2])
+
+
+def test_fetcher_should_reject_invalid_concurrency():
+    with pytest.raises(ValueError):
+        fetch.Fetcher(concurrency=0)
+
+
+def _request(i: int) -> int:
+    fetch.report_latency(0.01)
+    return i
+
+
+def test_fetcher_should_increase_concurrency_while_requests_are_healthy():
+    fetcher = fetch.Fetcher(concurrency=1, max_concurrency=4)
+
+    assert fetcher.map(_request, range(100)) == list(range(100))
+    assert fetcher.concurrency == 4
+
+
+def test_fetcher_should_decrease_concurrency_when_throttled():
+    fetcher = fetch.Fetcher(concurrency=1, max_concurrency=8)
+    fetcher.map(_request, range(100))
+    assert fetcher.concurrency == 8
+
+    def throttled(i: int) -> int:
+        if i == 0:
+            fetch.report_throttling()
+        return i
+
+    fetcher.map(throttled, range(2))
+    assert fetcher.concurrency == 4
+
+
+def test_fetches_without_requests_should_not_change_concurrency():
+    fetcher = fetch.Fetcher(concurrency=2, max_concurrency=4)
+
+    fetcher.map(lambda i: i, range(100))
+    assert fetcher.concurrency == 2
+
+
+def test_gcs_downloads_should_report_their_latency():
+    client = MagicMock()
+    client.bucket.return_value.blob.return_value.download_as_string.return_value = (
+        b"junit"
+    )
+    fetcher = fetch.Fetcher(concurrency=1, max_concurrency=4)
+
+    fetcher.map(
+        lambda i: utils.download_from_gcs_as_string(client, "bucket", str(i)),
+        range(100),
+    )
+    assert fetcher.concurrency == 4
+
+
+def test_controller_should_decrease_concurrency_when_latency_rises():
+    controller = fetch._AimdController(initial=8, maximum=8)
+    for _ in range(10):
+        controller.on_success(0.1)
+    controller.on_success(10)
+
+    assert controller.limit == 4
+    # requests started before the decrease do not decrease it again
+    controller.on_success(10)
+    assert controller.limit == 4
+
+
+def test_controller_should_recover_from_a_sustained_latency_change():
+    controller = fetch._AimdController(initial=10, maximum=10)
+    for _ in range(20):
+        controller.on_success(0.06)
+    for _ in range(2000):
+        controller.on_success(0.15)
+
+    assert controller.limit == 10
+
+
+def test_controller_baseline_should_be_reset_between_batches():
+    controller = fetch._AimdController(initial=4, maximum=4)
+    for _ in range(10):
+        controller.on_success(0.01)
+
+    controller.reset_latency()
+    for _ in range(10):
+        controller.on_success(1)
+    assert controller.limit == 4
+
+
+def test_report_throttling_outside_fetcher_should_be_ignored():
+    fetch.report_throttling()
+
+
+def test_fetcher_should_reject_max_concurrency_below_concurrency():
+    with pytest.raises(ValueError):
+        fetch.Fetcher(concurrency=4, max_concurrency=2)
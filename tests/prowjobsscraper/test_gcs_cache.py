@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from freezegun import freeze_time
+from google.api_core import exceptions
+
+from prowjobsscraper import utils
+from prowjobsscraper.gcs_cache import GcsCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GcsCache(directory=str(tmp_path), max_size=10, missing_ttl=60)
+    utils.set_gcs_cache(cache)
+    yield cache
+    utils.set_gcs_cache(None)
+
+
+def test_unchanged_download_should_be_served_from_cache(cache):
+    client = MagicMock()
+    blob = client.bucket.return_value.blob.return_value
+    blob.download_as_string.side_effect = [b"junit", exceptions.NotModified("same")]
+    blob.generation = 1
+
+    assert utils.download_from_gcs_as_string(client, "bucket", "path") == b"junit"
+    assert utils.download_from_gcs_as_string(client, "bucket", "path") == b"junit"
+    assert blob.download_as_string.call_args.kwargs["if_generation_not_match"] == 1
+
+
+def test_overwritten_download_should_replace_the_cached_artifact(cache):
+    client = MagicMock()
+    blob = client.bucket.return_value.blob.return_value
+    blob.download_as_string.return_value = b"junit2"
+    blob.generation = 2
+    cache.put("bucket", "path", b"junit", generation=1)
+
+    assert utils.download_from_gcs_as_string(client, "bucket", "path") == b"junit2"
+    assert cache.get("bucket", "path") == (b"junit2", 2)
+    assert cache.get("bucket", "path", generation=1) is None
+
+
+def test_cache_should_persist_across_instances(cache, tmp_path):
+    cache.put("bucket", "path", b"junit", generation=1)
+
+    assert GcsCache(str(tmp_path), 10, 60).get("bucket", "path") == (b"junit", 1)
+
+
+def test_missing_path_should_not_be_downloaded_again_until_ttl(cache):
+    client = MagicMock()
+    blob = client.bucket.return_value.blob.return_value
+    blob.download_as_string.side_effect = exceptions.NotFound("missing")
+
+    with freeze_time("2023-03-27 10:00:00"):
+        for _ in range(2):
+            with pytest.raises(exceptions.NotFound):
+                utils.download_from_gcs_as_string(client, "bucket", "path")
+        assert blob.download_as_string.call_count == 1
+
+    with freeze_time(datetime(2023, 3, 27, 10) + timedelta(seconds=61)):
+        with pytest.raises(exceptions.NotFound):
+            utils.download_from_gcs_as_string(client, "bucket", "path")
+        assert blob.download_as_string.call_count == 2
+
+
+def test_least_recently_used_artifacts_should_be_evicted(cache):
+    with freeze_time("2023-03-27 10:00:00"):
+        cache.put("bucket", "a", b"aaaa")
+    with freeze_time("2023-03-27 10:00:01"):
+        cache.put("bucket", "b", b"bbbb")
+    with freeze_time("2023-03-27 10:00:02"):
+        assert cache.get("bucket", "a").data == b"aaaa"
+    with freeze_time("2023-03-27 10:00:03"):
+        cache.put("bucket", "c", b"cccc")
+
+    assert cache.get("bucket", "a").data == b"aaaa"
+    assert cache.get("bucket", "b") is None
+    assert cache.get("bucket", "c").data == b"cccc"
+
+
+def test_identical_contents_should_be_stored_once(cache):
+    cache.put("bucket", "a", b"aaaa")
+    cache.put("bucket", "b", b"aaaa")
+    cache.put("bucket", "c", b"cc")
+
+    assert cache.get("bucket", "a").data == b"aaaa"
+    assert cache.get("bucket", "b").data == b"aaaa"
+    assert cache.get("bucket", "c").data == b"cc"
+
+
+def test_size_should_follow_replaced_and_evicted_contents(cache, tmp_path):
+    with freeze_time("2023-03-27 10:00:00"):
+        cache.put("bucket", "a", b"aaaa")
+        cache.put("bucket", "a", b"aaaaaa")
+        assert cache._size == 6
+    with freeze_time("2023-03-27 10:00:01"):
+        cache.put("bucket", "b", b"bbbbb")
+
+    # a was replaced, then evicted to make room for b
+    assert cache.get("bucket", "a") is None
+    assert cache._size == 5
+    assert GcsCache(str(tmp_path), 10, 60)._size == 5
@@ -1,5 +1,7 @@
+import gzip
 import json
 from typing import Final
+from unittest.mock import patch
 
 import pkg_resources
 import pytest
@@ -82,3 +84,207 @@ def test_context_should_be_successfully_parsed(job_name, job_type, job_variant):
     jobs.items[0].metadata.labels.variant = job_variant
 
     assert jobs.items[0].context == "e2e-metal-assisted"
+
+
+def test_derived_fields_should_be_computed_once_and_kept_by_copies():
+    job = prowjob.ProwJobs.create_from_string(
+        pkg_resources.resource_string(
+            __name__, "prowjob_assets/valid_prow_response.json"
+        )
+    ).items[0]
+
+    with patch(
+        "prowjobsscraper.utils.get_gcs_base_path_from_job_url",
+        return_value="base-path",
+    ) as get_gcs_base_path:
+        assert job.gcs_base_path == "base-path"
+        assert job.gcs_base_path == "base-path"
+        assert job.copy().gcs_base_path == "base-path"
+    get_gcs_base_path.assert_called_once()
+
+    context = job.context
+    job.spec.job = "periodic-ci-openshift-assisted-service-master-other-context"
+    assert job.copy().context == context
+
+
+def test_streamed_json_from_prow_should_be_successfully_parsed(
+    httpserver: HTTPServer,
+):
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+    expected = json.loads(
+        pkg_resources.resource_string(
+            __name__, f"prowjob_assets/expected_prowjobs.json"
+        )
+    )
+    httpserver.expect_request("/jobs").respond_with_data(response)
+    jobs = prowjob.ProwJobs.stream_from_url(
+        httpserver.url_for("/jobs"), item_filter=lambda item: True
+    )
+
+    assert jobs.json() == json.dumps(expected)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_streamed_items_should_not_depend_on_chunk_boundaries(chunk_size):
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+    chunks = [response[i : i + chunk_size] for i in range(0, len(response), chunk_size)]
+
+    jobs = prowjob.ProwJobs.create_from_chunks(chunks, item_filter=lambda item: True)
+
+    assert jobs == prowjob.ProwJobs.create_from_string(response)
+
+
+def test_streamed_items_rejected_by_filter_should_not_be_parsed():
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+    seen = []
+
+    def item_filter(item):
+        seen.append(item["status"]["build_id"])
+        return False
+
+    jobs = prowjob.ProwJobs.create_from_chunks([response], item_filter=item_filter)
+
+    assert seen == ["1549300279667593216"]
+    assert jobs.items == []
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b'"not an object"',
+        b'{"invalid": "value"}',
+        b'{"items": [{"spec": {}}',
+    ],
+)
+def test_invalid_streamed_json_from_prow_should_throw_an_exception(data):
+    with pytest.raises(ValueError):
+        prowjob.ProwJobs.create_from_chunks([data], item_filter=lambda item: True)
+
+
+@pytest.mark.parametrize("keep", [True, False])
+def test_prefiltered_json_from_prow_should_only_parse_kept_items(keep):
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+
+    jobs = prowjob.ProwJobs.create_from_string(response, item_filter=lambda i: keep)
+
+    if keep:
+        assert jobs == prowjob.ProwJobs.create_from_string(response)
+    else:
+        assert jobs.items == []
+
+
+def test_invalid_prefiltered_json_from_prow_should_throw_an_exception(
+    httpserver: HTTPServer,
+):
+    httpserver.expect_request("/jobs").respond_with_json(INVALID_RESPONSE_FROM_PROW)
+    with pytest.raises(ValidationError):
+        prowjob.ProwJobs.create_from_url(
+            httpserver.url_for("/jobs"), item_filter=lambda i: True
+        )
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_snapshot_should_skip_unchanged_job_list(
+    httpserver: HTTPServer, tmp_path, streaming
+):
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+
+    def fetch(snapshot):
+        if streaming:
+            return prowjob.ProwJobs.stream_from_url(
+                httpserver.url_for("/jobs"), lambda i: True, snapshot=snapshot
+            )
+        return prowjob.ProwJobs.create_from_url(
+            httpserver.url_for("/jobs"), lambda i: True, snapshot=snapshot
+        )
+
+    httpserver.expect_oneshot_request("/jobs").respond_with_data(
+        response, headers={"ETag": '"v1"'}
+    )
+    snapshot = prowjob.ProwJobsSnapshot(str(tmp_path))
+    jobs = fetch(snapshot)
+    snapshot.commit()
+
+    assert len(jobs.items) == 1
+    with gzip.open(snapshot.payload_path) as f:
+        assert f.read() == response
+
+    httpserver.expect_oneshot_request(
+        "/jobs", headers={"If-None-Match": '"v1"'}
+    ).respond_with_data(status=304)
+    jobs = fetch(prowjob.ProwJobsSnapshot(str(tmp_path)))
+
+    assert jobs.items == []
+    httpserver.check_assertions()
+
+
+def test_snapshot_should_only_keep_new_build_id_and_state_pairs(
+    httpserver: HTTPServer, tmp_path
+):
+    response = json.loads(
+        pkg_resources.resource_string(
+            __name__, f"prowjob_assets/valid_prow_response.json"
+        )
+    )
+    pending_job = response["items"][0]
+    pending_job["status"]["state"] = "pending"
+    other_job = json.loads(json.dumps(pending_job))
+    other_job["status"]["build_id"] = "1549300279667593217"
+    response["items"] = [pending_job, other_job]
+
+    httpserver.expect_oneshot_request("/jobs").respond_with_json(
+        response, headers={"ETag": '"v1"'}
+    )
+    snapshot = prowjob.ProwJobsSnapshot(str(tmp_path))
+    jobs = prowjob.ProwJobs.stream_from_url(
+        httpserver.url_for("/jobs"), lambda i: True, snapshot=snapshot
+    )
+    snapshot.commit()
+    assert len(jobs.items) == 2
+
+    pending_job["status"]["state"] = "success"
+    httpserver.expect_oneshot_request(
+        "/jobs", headers={"If-None-Match": '"v1"'}
+    ).respond_with_json(response, headers={"ETag": '"v2"'})
+    snapshot = prowjob.ProwJobsSnapshot(str(tmp_path))
+    jobs = prowjob.ProwJobs.stream_from_url(
+        httpserver.url_for("/jobs"), lambda i: True, snapshot=snapshot
+    )
+
+    assert [(j.status.build_id, j.status.state) for j in jobs.items] == [
+        ("1549300279667593216", "success")
+    ]
+    assert snapshot.conditional_headers() == {"If-None-Match": '"v1"'}
+    snapshot.commit()
+    assert snapshot.conditional_headers() == {"If-None-Match": '"v2"'}
+
+
+def test_uncommitted_snapshot_should_not_be_persisted(httpserver: HTTPServer, tmp_path):
+    response = pkg_resources.resource_string(
+        __name__, f"prowjob_assets/valid_prow_response.json"
+    )
+    httpserver.expect_request("/jobs").respond_with_data(
+        response, headers={"ETag": '"v1"'}
+    )
+    prowjob.ProwJobs.stream_from_url(
+        httpserver.url_for("/jobs"),
+        lambda i: True,
+        snapshot=prowjob.ProwJobsSnapshot(str(tmp_path)),
+    )
+
+    snapshot = prowjob.ProwJobsSnapshot(str(tmp_path))
+    assert snapshot.conditional_headers() == {}
+    jobs = prowjob.ProwJobs.stream_from_url(
+        httpserver.url_for("/jobs"), lambda i: True, snapshot=snapshot
+    )
+    assert len(jobs.items) == 1
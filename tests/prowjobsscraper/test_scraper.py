@@ -1,3 +1,6 @@
+import json
+import threading
+import time
 from datetime import datetime, timezone
 from typing import Literal
 from unittest.mock import MagicMock
@@ -85,12 +88,79 @@ def test_job_filtering(
     jobs.items[0].status.description = job_description
     scrape.execute(jobs)
 
-    cir_metadata_extractor.hydrate.assert_called_once()
-
     if is_valid_job:
+        cir_metadata_extractor.hydrate.assert_called_once()
         event_store.index_prow_jobs.assert_called_once_with(jobs.items)
     else:
-        event_store.index_prow_jobs.assert_called_once_with([])
+        # no job is left to process
+        cir_metadata_extractor.hydrate.assert_not_called()
+        event_store.index_prow_jobs.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "job_name, job_hidden, job_state, job_description, is_valid_job",
+    [
+        (
+            "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws",
+            False,
+            "success",
+            "",
+            True,
+        ),
+        (
+            "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws",
+            True,
+            "success",
+            "",
+            False,
+        ),
+        (
+            "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws",
+            False,
+            "pending",
+            "",
+            False,
+        ),
+        (
+            "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws",
+            False,
+            "failure",
+            "Overridden by Batman",
+            False,
+        ),
+        (
+            "periodic-openshift-release-fast-forward-assisted-service",
+            False,
+            "success",
+            "",
+            False,
+        ),
+        (
+            "pull-ci-openshift-origin-master-e2e-aws",
+            False,
+            "success",
+            "",
+            False,
+        ),
+    ],
+)
+def test_raw_job_item_filtering_matches_job_filtering(
+    job_name, job_hidden, job_state, job_description, is_valid_job
+):
+    item = json.loads(
+        pkg_resources.resource_string(__name__, f"scraper_assets/prowjob.json")
+    )["items"][0]
+    item["spec"]["job"] = job_name
+    item["spec"]["hidden"] = job_hidden
+    item["status"]["state"] = job_state
+    item["status"]["description"] = job_description
+
+    job = prowjob.ProwJob.parse_obj(item)
+
+    scrape = scraper.Scraper(MagicMock(), MagicMock(), MagicMock(), MagicMock())
+
+    assert scrape.is_assisted_job_item(item) == is_valid_job
+    assert scrape._is_assisted_job(job) == is_valid_job
 
 
 def test_existing_jobs_in_event_store_are_filtered_out():
@@ -116,8 +186,8 @@ def test_existing_jobs_in_event_store_are_filtered_out():
     jobs.items[0].spec.job = "e2e-blala-assisted"
     jobs.items[0].status.state = "success"
     scrape.execute(jobs.copy(deep=True))
-    cir_metadata_extractor.hydrate.assert_called_once()
-    event_store.index_prow_jobs.assert_called_once_with([])
+    cir_metadata_extractor.hydrate.assert_not_called()
+    event_store.index_prow_jobs.assert_not_called()
 
 
 def test_should_index_usage():
@@ -223,6 +293,8 @@ def test_should_index_usage():
     equinix_usages_extractor.get_project_usages.return_value = [
         equinix_usages.EquinixUsage.parse_obj(usage) for usage in usages
     ]
+    equinix_usages_extractor.start_time = datetime(2023, 3, 16, tzinfo=timezone.utc)
+    equinix_usages_extractor.end_time = datetime(2023, 3, 23, tzinfo=timezone.utc)
 
     scrape = scraper.Scraper(
         event_store,
@@ -235,12 +307,16 @@ def test_should_index_usage():
     prow_jobs.items = []
 
     scrape.execute(prow_jobs)
-    cir_metadata_extractor.hydrate.assert_called_once()
+    cir_metadata_extractor.hydrate.assert_not_called()
     assert len(event_store.index_equinix_usages.call_args[0][0]) == 2
+    event_store.scan_usages_identifiers.assert_called_once_with(
+        start_time=datetime(2023, 3, 16, tzinfo=timezone.utc),
+        end_time=datetime(2023, 3, 23, tzinfo=timezone.utc),
+    )
 
 
 def test_jobs_and_steps_are_indexed():
-    jobstep = step.JobStep.parse_raw(
+    jobstep = step.JobStep.create_from_string(
         pkg_resources.resource_string(__name__, f"scraper_assets/jobstep.json")
     )
     jobs = prowjob.ProwJobs(items=[jobstep.job])
@@ -264,3 +340,149 @@ def test_jobs_and_steps_are_indexed():
     cir_metadata_extractor.hydrate.assert_called_once()
     event_store.index_prow_jobs.assert_called_once_with(jobs.items)
     event_store.index_job_steps.assert_called_once_with([jobstep])
+
+
+def test_known_build_ids_are_kept_in_memory_between_executions():
+    jobs = prowjob.ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"scraper_assets/prowjob.json")
+    )
+    jobs.items[0].spec.job = (
+        "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws"
+    )
+    jobs.items[0].status.state = "success"
+
+    event_store = MagicMock()
+    event_store.get_known_build_ids.return_value = set()
+
+    step_extractor = MagicMock()
+    step_extractor.parse_prow_jobs.return_value = []
+
+    scrape = scraper.Scraper(event_store, step_extractor, MagicMock(), MagicMock())
+
+    scrape.execute_jobs(jobs.copy(deep=True))
+    event_store.index_prow_jobs.assert_called_once_with(jobs.items)
+    event_store.get_known_build_ids.assert_called_once_with(
+        [jobs.items[0].status.build_id]
+    )
+
+    scrape.execute_jobs(jobs.copy(deep=True))
+    event_store.index_prow_jobs.assert_called_once()
+    event_store.get_known_build_ids.assert_called_once()
+
+    scrape.reset_known_build_ids()
+    scrape.execute_jobs(jobs.copy(deep=True))
+    assert event_store.get_known_build_ids.call_count == 2
+
+
+def _create_assisted_jobs(count: int) -> prowjob.ProwJobs:
+    job = prowjob.ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"scraper_assets/prowjob.json")
+    ).items[0]
+    job.spec.job = (
+        "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws"
+    )
+    job.status.state = "success"
+    items = []
+    for i in range(count):
+        items.append(job.copy(deep=True))
+        items[-1].status.build_id = str(i)
+    return prowjob.ProwJobs(items=items)
+
+
+def test_batches_are_indexed_while_the_next_ones_are_fetched():
+    jobs = _create_assisted_jobs(5)
+
+    event_store = MagicMock()
+    event_store.get_known_build_ids.return_value = set()
+    indexing = threading.Event()
+    resume_indexing = threading.Event()
+
+    def index_prow_jobs(batch):
+        indexing.set()
+        assert resume_indexing.wait(timeout=5)
+
+    event_store.index_prow_jobs.side_effect = index_prow_jobs
+
+    cir_metadata_extractor = MagicMock()
+    step_extractor = MagicMock()
+    step_extractor.parse_prow_jobs.side_effect = lambda batch: [
+        MagicMock(job=j) for j in batch.items
+    ]
+
+    scrape = scraper.Scraper(
+        event_store,
+        step_extractor,
+        cir_metadata_extractor,
+        MagicMock(),
+        batch_size=2,
+        index_queue_size=1,
+    )
+    thread = threading.Thread(target=scrape.execute_jobs, args=(jobs,))
+    thread.start()
+
+    # the first batch is indexed while the second one is fetched, the third
+    # one waits for the first batch to be stored
+    assert indexing.wait(timeout=5)
+    deadline = time.monotonic() + 5
+    while cir_metadata_extractor.hydrate.call_count < 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert cir_metadata_extractor.hydrate.call_count == 2
+
+    resume_indexing.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+    indexed_batches = [c.args[0] for c in event_store.index_prow_jobs.call_args_list]
+    assert [[j.status.build_id for j in b] for b in indexed_batches] == [
+        ["0", "1"],
+        ["2", "3"],
+        ["4"],
+    ]
+    assert [len(c.args[0]) for c in event_store.index_job_steps.call_args_list] == [
+        2,
+        2,
+        1,
+    ]
+    assert scrape._known_build_ids == {"0", "1", "2", "3", "4"}
+
+
+def test_indexing_errors_stop_the_fetches():
+    jobs = _create_assisted_jobs(4)
+
+    event_store = MagicMock()
+    event_store.get_known_build_ids.return_value = set()
+    event_store.index_prow_jobs.side_effect = RuntimeError("ES is down")
+
+    cir_metadata_extractor = MagicMock()
+    step_extractor = MagicMock()
+    step_extractor.parse_prow_jobs.return_value = []
+
+    scrape = scraper.Scraper(
+        event_store,
+        step_extractor,
+        cir_metadata_extractor,
+        MagicMock(),
+        batch_size=1,
+        index_queue_size=1,
+    )
+    with pytest.raises(RuntimeError):
+        scrape.execute_jobs(jobs)
+
+    assert cir_metadata_extractor.hydrate.call_count <= 2
+    event_store.index_prow_jobs.assert_called_once()
+    assert scrape._known_build_ids == set()
+
+
+def test_close_should_close_the_extractors():
+    step_extractor = MagicMock()
+    cir_metadata_extractor = MagicMock()
+    scrape = scraper.Scraper(
+        MagicMock(), step_extractor, cir_metadata_extractor, MagicMock()
+    )
+
+    scrape.close()
+
+    step_extractor.close.assert_called_once()
+    cir_metadata_extractor.close.assert_called_once()
@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pkg_resources
+import pytest
+from freezegun import freeze_time
+from opensearchpy.exceptions import ConflictError, NotFoundError
+
+from prowjobsscraper import prowjob, scraper, shard
+
+
+def test_each_build_id_should_belong_to_exactly_one_shard():
+    shards = [shard.Shard(index=i, count=3) for i in range(3)]
+    build_ids = [str(1549300279667593216 + i) for i in range(300)]
+
+    owners = [[s.index for s in shards if s.owns(b)] for b in build_ids]
+
+    assert all(len(o) == 1 for o in owners)
+    assert {o[0] for o in owners} == {0, 1, 2}
+    assert owners == [[s.index for s in shards if s.owns(b)] for b in build_ids]
+
+
+@pytest.mark.parametrize("index, count", [(3, 3), (-1, 3), (0, 0)])
+def test_shard_out_of_range_should_be_rejected(index, count):
+    with pytest.raises(ValueError):
+        shard.Shard(index=index, count=count)
+
+
+def _make_lease(es_client: MagicMock, owner: str = "me") -> shard.ShardLease:
+    return shard.ShardLease(
+        client=es_client,
+        index_name="jobs_leases",
+        shard=shard.Shard(index=1, count=3),
+        ttl=timedelta(hours=1),
+        owner=owner,
+    )
+
+
+def _lease_document(owner: str, expires_at: datetime) -> dict:
+    return {
+        "_seq_no": 4,
+        "_primary_term": 2,
+        "_source": {
+            "owner": owner,
+            "shard_index": 1,
+            "shard_count": 3,
+            "expires_at": expires_at.isoformat(),
+        },
+    }
+
+
+def test_free_lease_should_be_acquired():
+    es_client = MagicMock()
+    es_client.get.side_effect = NotFoundError(404, "not_found")
+
+    assert _make_lease(es_client).acquire()
+    es_client.create.assert_called_once()
+    assert es_client.create.call_args.kwargs["id"] == "1-of-3"
+    assert es_client.create.call_args.kwargs["body"]["owner"] == "me"
+
+
+def test_lease_held_by_another_worker_should_not_be_acquired():
+    es_client = MagicMock()
+    es_client.get.return_value = _lease_document(
+        "someone-else", datetime.now(tz=timezone.utc) + timedelta(minutes=5)
+    )
+
+    assert not _make_lease(es_client).acquire()
+    es_client.index.assert_not_called()
+    es_client.create.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "owner, expires_in",
+    [
+        ("someone-else", timedelta(minutes=-5)),
+        ("me", timedelta(minutes=5)),
+    ],
+)
+def test_expired_or_owned_lease_should_be_acquired(owner, expires_in):
+    es_client = MagicMock()
+    es_client.get.return_value = _lease_document(
+        owner, datetime.now(tz=timezone.utc) + expires_in
+    )
+
+    assert _make_lease(es_client).acquire()
+    es_client.index.assert_called_once()
+    assert es_client.index.call_args.kwargs["if_seq_no"] == 4
+    assert es_client.index.call_args.kwargs["if_primary_term"] == 2
+
+
+def test_lease_race_should_not_be_acquired():
+    es_client = MagicMock()
+    es_client.get.return_value = _lease_document(
+        "someone-else", datetime.now(tz=timezone.utc) - timedelta(minutes=5)
+    )
+    es_client.index.side_effect = ConflictError(409, "version_conflict")
+
+    assert not _make_lease(es_client).acquire()
+
+
+def test_lease_should_be_renewed_once_a_quarter_of_its_ttl_elapsed():
+    es_client = MagicMock()
+    es_client.get.side_effect = NotFoundError(404, "not_found")
+    lease = _make_lease(es_client)
+
+    with freeze_time("2023-03-27 10:00:00") as frozen_time:
+        assert lease.acquire()
+        frozen_time.tick(timedelta(minutes=10))
+        lease.renew()
+        assert es_client.create.call_count == 1
+
+        frozen_time.tick(timedelta(minutes=6))
+        lease.renew()
+        assert es_client.create.call_count == 2
+
+
+def test_lease_taken_over_should_stop_the_renewal():
+    es_client = MagicMock()
+    es_client.get.return_value = _lease_document(
+        "someone-else", datetime.now(tz=timezone.utc) + timedelta(minutes=5)
+    )
+
+    with pytest.raises(shard.LeaseLostError):
+        _make_lease(es_client).renew()
+
+
+@pytest.mark.parametrize("owner, deleted", [("me", True), ("someone-else", False)])
+def test_lease_should_only_be_released_by_its_owner(owner, deleted):
+    es_client = MagicMock()
+    es_client.get.return_value = _lease_document(
+        owner, datetime.now(tz=timezone.utc) + timedelta(minutes=5)
+    )
+
+    _make_lease(es_client).release()
+
+    assert es_client.delete.called == deleted
+
+
+@pytest.mark.parametrize("shard_index", [0, 1])
+def test_scraper_should_only_process_jobs_of_its_shard(shard_index):
+    jobs = prowjob.ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"scraper_assets/prowjob.json")
+    )
+    jobs.items[0].spec.job = (
+        "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws"
+    )
+    jobs.items[0].status.state = "success"
+    job_shard = shard.Shard(index=shard_index, count=2)
+    is_owned = job_shard.owns(jobs.items[0].status.build_id)
+
+    event_store = MagicMock()
+    event_store.get_known_build_ids.return_value = set()
+    step_extractor = MagicMock()
+    step_extractor.parse_prow_jobs.return_value = []
+    equinix_usages_extractor = MagicMock()
+    equinix_usages_extractor.get_project_usages.return_value = []
+
+    scrape = scraper.Scraper(
+        event_store,
+        step_extractor,
+        MagicMock(),
+        equinix_usages_extractor,
+        job_shard,
+    )
+    scrape.execute(jobs.copy(deep=True))
+
+    if is_owned:
+        event_store.index_prow_jobs.assert_called_once_with(jobs.items)
+    else:
+        event_store.index_prow_jobs.assert_not_called()
+    assert equinix_usages_extractor.get_project_usages.called == (shard_index == 0)
+
+
+def test_scraper_should_stop_when_the_lease_is_lost():
+    jobs = prowjob.ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"scraper_assets/prowjob.json")
+    )
+    jobs.items[0].spec.job = (
+        "pull-ci-openshift-assisted-service-master-edge-subsystem-kubeapi-aws"
+    )
+    jobs.items[0].status.state = "success"
+    jobs.items.append(jobs.items[0].copy(deep=True))
+    jobs.items[1].status.build_id = "1"
+
+    event_store = MagicMock()
+    event_store.get_known_build_ids.return_value = set()
+    step_extractor = MagicMock()
+    step_extractor.parse_prow_jobs.return_value = []
+    lease = MagicMock()
+    lease.renew.side_effect = [None, shard.LeaseLostError("lost")]
+
+    scrape = scraper.Scraper(
+        event_store,
+        step_extractor,
+        MagicMock(),
+        MagicMock(),
+        batch_size=1,
+        job_lease=lease,
+    )
+    with pytest.raises(shard.LeaseLostError):
+        scrape.execute_jobs(jobs)
+
+    assert lease.renew.call_count == 2
+    step_extractor.parse_prow_jobs.assert_called_once()
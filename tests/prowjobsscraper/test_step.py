@@ -3,9 +3,10 @@ from datetime import timedelta
 from unittest.mock import MagicMock
 
 import pkg_resources
+import pytest
 from google.cloud import exceptions
 
-from prowjobsscraper import step
+from prowjobsscraper import event, step
 from prowjobsscraper.prowjob import ProwJobs
 
 
@@ -58,7 +59,14 @@ def test_step_extractor_with_valid_junit_should_return_steps():
                 __name__, f"step_assets/expected_{s.name}.json"
             )
         )
-        assert s.json(exclude_unset=True) == json.dumps(expected)
+        assert s.job is jobs.items[0]
+        assert json.loads(s.job.json(exclude_unset=True)) == expected.pop("job")
+        assert {
+            "name": s.name,
+            "state": s.state,
+            "duration": s.duration.total_seconds(),
+            "details": s.details,
+        } == expected
 
 
 def test_step_extractor_with_malformed_junit_should_return_steps():
@@ -86,3 +94,117 @@ def test_step_extractor_with_malformed_junit_should_return_steps():
     assert len(steps) == 1
     assert steps[0].duration == timedelta(0)
     assert steps[0].name == "step1"
+
+
+def test_step_extractor_with_oversized_junit_should_skip_job():
+    jobs = ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"step_assets/prowjobs.json")
+    )
+    junit = pkg_resources.resource_string(__name__, f"step_assets/junit_operator.xml")
+
+    storage_client = MagicMock()
+    blob = storage_client.bucket.return_value.blob.return_value
+    # the range read returns max size + 1 bytes of an oversized file
+    blob.download_as_string.side_effect = lambda end: junit[: end + 1]
+
+    step_extractor = step.StepExtractor(
+        storage_client, "origin-ci-test", junit_max_size=len(junit) - 1
+    )
+    assert step_extractor.parse_prow_jobs(jobs) == []
+    blob.download_as_string.assert_called_once_with(end=len(junit) - 1)
+    assert jobs.items[0].junitTruncated
+    assert event.JobEvent.create_from_prow_job(jobs.items[0]).job.junit_truncated
+
+    jobs.items[0].junitTruncated = False
+    step_extractor = step.StepExtractor(
+        storage_client, "origin-ci-test", junit_max_size=len(junit)
+    )
+    assert len(step_extractor.parse_prow_jobs(jobs)) == 3
+    assert not jobs.items[0].junitTruncated
+
+
+def test_iter_junit_steps_should_parse_testcases_across_chunks():
+    jobs = ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"step_assets/prowjobs.json")
+    )
+    details = "x" * (3 * step._JUNIT_CHUNK_SIZE)
+    junit = (
+        '<testsuite name="step graph">'
+        '<testcase name="step1" time="1"/>'
+        f'<testcase name="step2" time="2"><failure message="">{details}</failure>'
+        '</testcase><testcase name="step3"><system-out>out</system-out></testcase>'
+        "</testsuite>"
+    )
+
+    for data in (junit, junit.encode()):
+        steps = list(step.iter_junit_steps(jobs.items[0], data))
+        assert [(s.name, s.state, s.duration) for s in steps] == [
+            ("step1", "success", timedelta(seconds=1)),
+            ("step2", "failure", timedelta(seconds=2)),
+            ("step3", "success", timedelta(0)),
+        ]
+        assert steps[1].details == details
+
+
+def test_step_extractor_with_parse_workers_should_return_same_steps():
+    jobs = ProwJobs.create_from_string(
+        pkg_resources.resource_string(__name__, f"step_assets/prowjobs.json")
+    )
+    junit = pkg_resources.resource_string(__name__, f"step_assets/junit_operator.xml")
+    storage_client = MagicMock()
+    blob = storage_client.bucket.return_value.blob.return_value
+    blob.download_as_string.return_value = junit
+
+    steps = step.StepExtractor(storage_client, "origin-ci-test").parse_prow_jobs(jobs)
+    step_extractor = step.StepExtractor(
+        storage_client, "origin-ci-test", parse_workers=2
+    )
+    executor = step_extractor._parse_executor
+    pooled_steps = step_extractor.parse_prow_jobs(jobs)
+    step_extractor.close()
+
+    assert pooled_steps == steps
+    assert all(s.job is jobs.items[0] for s in pooled_steps)
+    with pytest.raises(RuntimeError):
+        executor.submit(len, "")
+
+
+def test_failure_signature_should_not_depend_on_run_specific_values():
+    template = (
+        "\x1b[91m[Fail]\x1b[0m {ts} cluster {uuid} of build {build_id} "
+        "unreachable at {ip}:6443 ({ipv6})\r\n\r\n  see logs"
+    )
+    first = template.format(
+        ts="2022-04-20T22:54:01Z",
+        uuid="0cdb4a5e-8a1f-4c0b-9d2e-3f4a5b6c7d8e",
+        build_id="1549300279667593216",
+        ip="192.168.45.123",
+        ipv6="fd2e:6f44:5dd8:c956::16",
+    )
+    second = template.format(
+        ts="2023-03-27 10:30:12.123+00:00",
+        uuid="F1E2D3C4-B5A6-4978-8695-A4B3C2D1E0F9",
+        build_id="1640315275049963520",
+        ip="10.0.0.1",
+        ipv6="fe80::1:2:3",
+    )
+
+    signature = step.get_failure_signature(first)
+    assert signature == step.get_failure_signature(second)
+    assert signature == (
+        "[Fail] <timestamp> cluster <uuid> of build <id> unreachable at <ip>:6443 "
+        "(<ip>) see logs"
+    )
+    assert len(step.get_failure_signature("failure " * 1000)) == 512
+
+
+def test_failure_signature_should_not_mistake_clock_times_for_ips():
+    assert (
+        step.get_failure_signature("timeout at 22:54:01 waiting for node")
+        == "timeout at <time> waiting for node"
+    )
+    assert (
+        step.get_failure_signature("timeout at 22:54:01.123, 10:20:30 steps")
+        == "timeout at <time>, <time> steps"
+    )
+    assert step.get_failure_signature("node fe80::10:20:30 down") == "node <ip> down"